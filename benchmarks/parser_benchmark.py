@@ -0,0 +1,140 @@
+"""
+Benchmark the HTML parser backends on saved product pages
+
+Usage:
+    python benchmarks/parser_benchmark.py [PAGES_DIR] [--repeat N] [--full-parse]
+
+PAGES_DIR holds raw pages saved as <Retailer>_<anything>.html, e.g.
+Amazon_B0DGHZ1MC2.html or Walmart_5689919121.html. It defaults to
+benchmarks/pages, a small fixture set of ~300 KB synthetic pages (product
+block plus navigation, inline CSS/JS and a recommendations carousel) that
+every extractor can read. Each page is parsed and
+run through its retailer's extractor with every available backend, and the
+mean time per page is reported relative to html.parser, together with the
+peak memory of a single parse. Pages are parsed region-scoped like the
+scrapers do, unless --full-parse is given. As in the scrapers, a page
+whose partial parse misses a required field is parsed again in full (the
+share of such pages is reported); the periodic audit parses are turned off
+while timing.
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapers import AmazonScraper, WalmartScraper, NeweggScraper, TargetScraper
+from scrapers.amazon_scraper import AMAZON_REGIONS
+from scrapers.walmart_scraper import WALMART_REGIONS
+from scrapers.newegg_scraper import NEWEGG_REGIONS
+from scrapers.target_scraper import TARGET_REGIONS
+from scrapers import parsers
+from scrapers.parsers import PartialParseStats, available_backends, parse_and_extract
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+
+RETAILERS = {
+    'Amazon': (lambda backend: AmazonScraper(parser_backend=backend), AMAZON_REGIONS),
+    'Walmart': (lambda backend: WalmartScraper(None, parser_backend=backend), WALMART_REGIONS),
+    'Newegg': (lambda backend: NeweggScraper(None, parser_backend=backend), NEWEGG_REGIONS),
+    'Target': (lambda backend: TargetScraper(None, parser_backend=backend), TARGET_REGIONS),
+}
+
+
+def make_extractor(retailer, backend, full_parse=False):
+    """Build a function running the parse + extract path for one retailer"""
+    make_scraper, regions = RETAILERS[retailer]
+    scraper = make_scraper(backend)
+    regions = None if full_parse else regions
+    return lambda content, url: parse_and_extract(
+        content,
+        url,
+        scraper.extract_product_data,
+        backend=backend,
+        regions=regions,
+        required_fields=scraper.required_fields,
+        retailer=retailer
+    )
+
+
+def load_pages(directory):
+    """Load saved pages grouped by retailer"""
+    pages = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.html'):
+            continue
+        retailer = filename.split('_')[0]
+        with open(os.path.join(directory, filename), 'rb') as f:
+            pages.setdefault(retailer, []).append((filename, f.read()))
+    return pages
+
+
+def benchmark(pages, repeat, full_parse=False):
+    """
+    Time every backend on every page
+
+    Returns:
+        dict: {retailer: {backend: (seconds per page, peak bytes of one parse,
+        share of timed pages re-parsed in full for a missing required field)}}
+    """
+    shared_stats = parsers.partial_parse_stats
+    try:
+        return _benchmark(pages, repeat, full_parse)
+    finally:
+        parsers.partial_parse_stats = shared_stats
+
+
+def _benchmark(pages, repeat, full_parse):
+    results = {}
+    for retailer, retailer_pages in pages.items():
+        results[retailer] = {}
+        for backend in available_backends():
+            extract = make_extractor(retailer, backend, full_parse)
+
+            tracemalloc.start()
+            for filename, content in retailer_pages:
+                extract(content, f"https://example.com/{filename}")
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            # Fresh counters without audits, so only required-field fallbacks re-parse
+            parsers.partial_parse_stats = PartialParseStats(audit_interval=0)
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for filename, content in retailer_pages:
+                    extract(content, f"https://example.com/{filename}")
+            elapsed = time.perf_counter() - started
+
+            parses = repeat * len(retailer_pages)
+            fallbacks = parsers.partial_parse_stats.summary().get(retailer, {}).get('fallbacks', 0)
+            results[retailer][backend] = (elapsed / parses, peak, fallbacks / parses)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages_dir', nargs='?', default=PAGES_DIR, help="Directory of saved <Retailer>_*.html pages")
+    parser.add_argument('--repeat', type=int, default=5, help="Passes over every page per backend")
+    parser.add_argument('--full-parse', action='store_true', help="Build the whole DOM instead of only the needed regions")
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages_dir)
+    if not pages:
+        print(f"No .html pages found in {args.pages_dir}")
+        return
+
+    results = benchmark(pages, args.repeat, args.full_parse)
+    for retailer, timings in results.items():
+        baseline = timings['html.parser'][0]
+        print(f"\n{retailer} ({len(pages[retailer])} pages)")
+        for backend, (seconds, peak, fallbacks) in sorted(timings.items(), key=lambda item: item[1][0]):
+            print(
+                f"  {backend:<12} {seconds * 1000:8.2f} ms/page  {baseline / seconds:5.1f}x  "
+                f"peak {peak / 1024:8.0f} KB  full re-parses {fallbacks:4.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
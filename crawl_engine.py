@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("CrawlEngine")
+
+
+class RetailerJob:
+    """A retailer's URL list together with its politeness budget"""
+
+    def __init__(self, name, fetch, urls, concurrency=1):
+        """
+        Args:
+            name (str): Retailer name, used as the key in the crawl results
+            fetch (callable): Blocking function taking a URL and returning a
+                product dict or None (e.g. ``scraper.get_product``)
+            urls (list): Product URLs to crawl
+            concurrency (int): Maximum number of in-flight requests for this retailer
+        """
+        self.name = name
+        self.fetch = fetch
+        self.urls = list(urls)
+        self.concurrency = max(1, int(concurrency))
+
+
+class CrawlEngine:
+    """Runs several retailers at the same time on an asyncio event loop.
+
+    Scrapers stay synchronous: every fetch runs on a worker thread, and each
+    retailer gets its own semaphore so it never exceeds its concurrency cap.
+    The scraper's own delay still applies between its requests, so a cycle
+    takes as long as the slowest retailer rather than the sum of all of them.
+    """
+
+    def __init__(self, jobs):
+        """
+        Args:
+            jobs (list): RetailerJob instances to crawl
+        """
+        self.jobs = list(jobs)
+
+    def run(self):
+        """
+        Crawl every job to completion
+
+        Returns:
+            dict: Retailer name -> list of product dicts, in URL order
+        """
+        return asyncio.run(self.crawl())
+
+    async def crawl(self):
+        """Coroutine version of run() for callers that already own an event loop"""
+        started = time.monotonic()
+        max_workers = sum(job.concurrency for job in self.jobs) or 1
+        loop = asyncio.get_running_loop()
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crawl") as executor:
+            results = await asyncio.gather(
+                *(self._crawl_job(loop, executor, job) for job in self.jobs)
+            )
+
+        logger.info(f"Crawl cycle finished in {time.monotonic() - started:.1f}s")
+        return {job.name: products for job, products in zip(self.jobs, results)}
+
+    async def _crawl_job(self, loop, executor, job):
+        """Crawl one retailer's URLs under its own concurrency cap"""
+        semaphore = asyncio.Semaphore(job.concurrency)
+        started = time.monotonic()
+
+        async def fetch_one(url):
+            async with semaphore:
+                try:
+                    return await loop.run_in_executor(executor, job.fetch, url)
+                except Exception as e:
+                    logger.error(f"{job.name}: error fetching {url}: {str(e)}")
+                    return None
+
+        results = await asyncio.gather(*(fetch_one(url) for url in job.urls))
+        products = [product for product in results if product]
+
+        logger.info(
+            f"{job.name}: {len(products)}/{len(job.urls)} products in "
+            f"{time.monotonic() - started:.1f}s"
+        )
+        return products
@@ -1,7 +1,12 @@
+import re
 import sqlite3
 import logging
 import os
-from datetime import datetime
+import queue
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from matching import update_matches, rebuild_matches
 
 # Configure logging
 logging.basicConfig(
@@ -18,45 +23,193 @@ logger = logging.getLogger("Database")
 DB_DIR = os.path.join(os.getcwd(), "database")
 DB_PATH = os.path.join(DB_DIR, "amazon_products.db")
 
+# Products are keyed by the retailer's id *per retailer*
+PRODUCTS_TABLE_SQL = '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id TEXT,
+            retailer TEXT,
+            name TEXT,
+            brand TEXT,
+            category TEXT,
+            url TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (product_id, retailer)
+        )
+        '''
+
+# Full-text index over products; prefix indexes make short "term*" queries cheap
+PRODUCTS_FTS_SQL = '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            name, brand, category,
+            content='products', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        '''
+
+# bm25 weights of the indexed columns: a match in the name counts most
+SEARCH_WEIGHTS = (10.0, 5.0, 2.0)
+
+# Applied to every connection: WAL lets readers run while the writer commits
+CONNECTION_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),      # Durable across application crashes; fsyncs only at checkpoints
+    ('cache_size', -64000),         # 64 MB page cache
+    ('mmap_size', 256 * 1024 * 1024),
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),         # Wait for a lock instead of failing with "database is locked"
+)
+
+# Database files whose schema has been created/migrated by this process
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+def _connect(path, check_same_thread=True):
+    """Open a connection with the tuned pragmas and sqlite3.Row rows"""
+    db_dir = os.path.dirname(path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+        
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    for pragma, value in CONNECTION_PRAGMAS:
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+def _ensure_schema(conn, path):
+    """Create and migrate the schema once per database file and process, retrying after a failure"""
+    with _schema_lock:
+        if path not in _schema_ready and create_tables(conn):
+            _schema_ready.add(path)
+
 def get_db_connection():
     """Establish connection to SQLite database"""
     try:
-        # Create directory if it doesn't exist
-        db_dir = os.path.dirname(DB_PATH)
-        if db_dir and not os.path.exists(db_dir):
-            os.makedirs(db_dir)
-            
-        # Connect to database
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        
-        # Create tables if they don't exist
-        create_tables(conn)
-        
+        conn = _connect(DB_PATH)
+        _ensure_schema(conn, DB_PATH)
         return conn
     except Exception as e:
         logger.error(f"Error connecting to database: {str(e)}")
         return None
 
+class ConnectionManager:
+    """Shares one database between threads without lock contention.
+    
+    Every thread reads through its own (query_only) connection, which WAL mode
+    lets run alongside writes. All writes go through a queue to a single writer
+    thread that owns the only write connection, so writers never compete for
+    the database lock.
+    """
+    
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): SQLite file, defaults to DB_PATH
+        """
+        self.path = path or DB_PATH
+        self.local = threading.local()
+        self.readers = []
+        self.lock = threading.Lock()
+        self.write_queue = queue.Queue()
+        self.writer_thread = None
+        
+        # The writer connection is only used by the writer thread once it starts
+        self.writer_conn = _connect(self.path, check_same_thread=False)
+        _ensure_schema(self.writer_conn, self.path)
+    
+    def reader(self):
+        """Get the calling thread's read-only connection, opening it on first use"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            # Only this thread uses it; check_same_thread is off so close() can close it
+            conn = _connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            self.local.conn = conn
+            with self.lock:
+                self.readers.append(conn)
+        return conn
+    
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue a write to run on the writer connection
+        
+        Args:
+            func (callable): Called as func(conn, *args, **kwargs) on the writer
+                thread, e.g. insert_product or a function doing several inserts
+                
+        Returns:
+            Future: Resolves to func's return value
+        """
+        future = Future()
+        with self.lock:
+            if self.writer_thread is None:
+                self.writer_thread = threading.Thread(target=self._write_loop, name='DatabaseWriter', daemon=True)
+                self.writer_thread.start()
+        self.write_queue.put((func, args, kwargs, future))
+        return future
+    
+    def write(self, func, *args, **kwargs):
+        """Run a write on the writer thread and wait for its result"""
+        return self.submit(func, *args, **kwargs).result()
+    
+    def _write_loop(self):
+        """Writer thread: run queued writes one at a time until close() sends None"""
+        while True:
+            task = self.write_queue.get()
+            if task is None:
+                break
+                
+            func, args, kwargs, future = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(self.writer_conn, *args, **kwargs))
+            except Exception as e:
+                logger.error(f"Database write failed: {str(e)}")
+                if self.writer_conn.in_transaction:
+                    self.writer_conn.rollback()
+                future.set_exception(e)
+    
+    def close(self):
+        """Finish queued writes, then close every connection"""
+        with self.lock:
+            writer_thread, self.writer_thread = self.writer_thread, None
+        if writer_thread is not None:
+            self.write_queue.put(None)
+            writer_thread.join()
+        self.writer_conn.close()
+        
+        with self.lock:
+            readers, self.readers = self.readers, []
+        for conn in readers:
+            conn.close()
+        self.local = threading.local()
+
+
+_connection_manager = None
+_connection_manager_lock = threading.Lock()
+
+def get_connection_manager():
+    """Get the process-wide ConnectionManager for DB_PATH, opening it on first use"""
+    global _connection_manager
+    with _connection_manager_lock:
+        if _connection_manager is None:
+            _connection_manager = ConnectionManager()
+        return _connection_manager
+
 def create_tables(conn):
-    """Create necessary database tables if they don't exist"""
+    """
+    Create necessary database tables if they don't exist and run pending migrations
+    
+    Returns:
+        bool: True if the schema is complete and up to date
+    """
     try:
         cursor = conn.cursor()
         
         # Products table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            product_id TEXT UNIQUE,
-            retailer TEXT,
-            name TEXT,
-            brand TEXT,
-            category TEXT,
-            url TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
+        cursor.execute(PRODUCTS_TABLE_SQL.format(table='products'))
         
         # Prices table
         cursor.execute('''
@@ -68,6 +221,7 @@ def create_tables(conn):
             discount_percentage REAL,
             in_stock BOOLEAN,
             timestamp TIMESTAMP,
+            last_seen TIMESTAMP,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (product_id) REFERENCES products (id)
         )
@@ -81,17 +235,263 @@ def create_tables(conn):
             rating REAL,
             review_count INTEGER,
             timestamp TIMESTAMP,
+            last_seen TIMESTAMP,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (product_id) REFERENCES products (id)
         )
         ''')
         
+        # Files already loaded by the ETL, for incremental runs
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS etl_manifest (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime REAL,
+            content_hash TEXT,
+            processed_at TIMESTAMP
+        )
+        ''')
+        
+        # Newest file modification time fully loaded from each directory
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS etl_watermark (
+            directory TEXT PRIMARY KEY,
+            max_mtime REAL,
+            file_count INTEGER,
+            updated_at TIMESTAMP
+        )
+        ''')
+        
+        # Daily and weekly price rollups, maintained as prices are written
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_rollups (
+            product_id INTEGER,
+            resolution TEXT,
+            bucket_start TEXT,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            min_discount REAL,
+            max_discount REAL,
+            in_stock_ratio REAL,
+            row_count INTEGER,
+            PRIMARY KEY (product_id, resolution, bucket_start)
+        ) WITHOUT ROWID
+        ''')
+        
+        # Latest price and review state of each product, maintained as history is written
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_latest (
+            product_id INTEGER PRIMARY KEY,
+            current_price REAL,
+            original_price REAL,
+            discount_percentage REAL,
+            in_stock BOOLEAN,
+            rating REAL,
+            review_count INTEGER,
+            last_seen TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+        ''')
+        
+        # Cross-retailer matching: normalized tokens and MinHash signature of each product
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_signatures (
+            product_id INTEGER PRIMARY KEY,
+            brand TEXT,
+            tokens TEXT,
+            signature BLOB,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+        ''')
+        
+        # LSH index over the signatures: products sharing a (band, bucket) are match candidates
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_lsh (
+            band INTEGER,
+            bucket INTEGER,
+            product_id INTEGER,
+            PRIMARY KEY (band, bucket, product_id)
+        ) WITHOUT ROWID
+        ''')
+        
+        # Match group of each product, named after its smallest product row id
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_matches (
+            product_id INTEGER PRIMARY KEY,
+            group_id INTEGER,
+            similarity REAL,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_product_matches_group ON product_matches (group_id)")
+        
         conn.commit()
         logger.info("Database tables created successfully")
         
+        migrate(conn)
+        return True
+        
     except Exception as e:
         logger.error(f"Error creating tables: {str(e)}")
         conn.rollback()
+        return False
+
+def _migrate_product_key(conn):
+    """
+    Key products on (product_id, retailer) and index the history tables
+    
+    Databases created before this migration declare `product_id TEXT UNIQUE`,
+    which SQLite cannot alter in place, so the table is rebuilt with its row
+    ids preserved (prices and reviews keep pointing at the same products).
+    """
+    unique_columns = []
+    for index in conn.execute("PRAGMA index_list(products)").fetchall():
+        if index[2]:  # unique
+            unique_columns.append([column[2] for column in conn.execute(f"PRAGMA index_info('{index[1]}')")])
+    
+    if ['product_id', 'retailer'] not in unique_columns:
+        logger.info("Rebuilding products table with a (product_id, retailer) key")
+        conn.execute(PRODUCTS_TABLE_SQL.format(table='products_migrated'))
+        conn.execute(
+            """
+            INSERT INTO products_migrated
+            (id, product_id, retailer, name, brand, category, url, created_at, updated_at)
+            SELECT id, product_id, retailer, name, brand, category, url, created_at, updated_at
+            FROM products
+            """
+        )
+        conn.execute("DROP TABLE products")
+        conn.execute("ALTER TABLE products_migrated RENAME TO products")
+    
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_prices_product_timestamp ON prices (product_id, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reviews_product_timestamp ON reviews (product_id, timestamp)")
+
+def _migrate_last_seen(conn):
+    """Add last_seen to the history tables, so unchanged snapshots can extend a row instead of adding one"""
+    for table in ('prices', 'reviews'):
+        columns = [column[1] for column in conn.execute(f"PRAGMA table_info({table})")]
+        if 'last_seen' not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN last_seen TIMESTAMP")
+            conn.execute(f"UPDATE {table} SET last_seen = timestamp")
+
+def _migrate_price_rollups(conn):
+    """Fill price_rollups from the price history already in the database"""
+    _rebuild_price_rollups(conn)
+
+def _migrate_product_latest(conn):
+    """Fill product_latest from the history already in the database"""
+    update_product_latest(conn)
+
+def _migrate_products_fts(conn):
+    """
+    Index product name, brand and category for full-text search
+    
+    products_fts is an external-content FTS5 table over products, kept in sync
+    by triggers. SQLite builds without FTS5 skip it; search_products then
+    falls back to LIKE.
+    """
+    try:
+        conn.execute(PRODUCTS_FTS_SQL)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Full-text search unavailable, product search will use LIKE: {str(e)}")
+        return
+    
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, name, brand, category)
+            VALUES (new.id, new.name, new.brand, new.category);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, brand, category)
+            VALUES ('delete', old.id, old.name, old.brand, old.category);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, brand, category ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, brand, category)
+            VALUES ('delete', old.id, old.name, old.brand, old.category);
+            INSERT INTO products_fts (rowid, name, brand, category)
+            VALUES (new.id, new.name, new.brand, new.category);
+        END
+    ''')
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+def _migrate_product_matching(conn):
+    """Match the products already in the database across retailers"""
+    rebuild_matches(conn)
+
+def _migrate_rematch_products(conn):
+    """Recompute match groups with brand wrappers stripped and conflicting groups kept apart"""
+    rebuild_matches(conn)
+
+def _migrate_timestamp_format(conn):
+    """
+    Rewrite history timestamps stored with a ' ' separator in the 'T' form normalize_timestamp writes
+    
+    The rollups and latest state built by the earlier migrations compared those
+    timestamps as text against 'T' bounds, so they are rebuilt if any changed.
+    """
+    columns = {
+        'prices': ('timestamp', 'last_seen'),
+        'reviews': ('timestamp', 'last_seen'),
+    }
+    rewritten = 0
+    for table, table_columns in columns.items():
+        for column in table_columns:
+            rewritten += conn.execute(
+                f"UPDATE {table} SET {column} = substr({column}, 1, 10) || 'T' || substr({column}, 12) "
+                f"WHERE {column} LIKE '____-__-__ %'"
+            ).rowcount
+    
+    if rewritten:
+        _rebuild_price_rollups(conn)
+        update_product_latest(conn)
+
+# Schema migrations in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _migrate_product_key,
+    _migrate_last_seen,
+    _migrate_price_rollups,
+    _migrate_product_latest,
+    _migrate_products_fts,
+    _migrate_product_matching,
+    _migrate_timestamp_format,
+    _migrate_rematch_products,
+]
+
+# Values whose change starts a new history row; otherwise the latest row's last_seen is extended
+TRACKED_COLUMNS = {
+    'prices': ('current_price', 'original_price', 'discount_percentage', 'in_stock'),
+    'reviews': ('rating', 'review_count'),
+}
+
+def migrate(conn):
+    """
+    Bring an existing database up to the current schema
+    
+    Each pending migration runs in its own transaction together with the
+    user_version bump, so a failed migration leaves the database as it was.
+    
+    Args:
+        conn: Database connection
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            conn.execute("BEGIN")
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+            logger.info(f"Applied database migration {number}: {migration.__name__}")
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Database migration {number} failed: {str(e)}")
+            raise
 
 def insert_product(conn, product_data):
     """
@@ -107,52 +507,34 @@ def insert_product(conn, product_data):
     try:
         cursor = conn.cursor()
         
-        # Check if product already exists
         cursor.execute(
-            "SELECT id FROM products WHERE product_id = ? AND retailer = ?",
-            (product_data.get('product_id'), product_data.get('retailer'))
-        )
-        result = cursor.fetchone()
-        
-        if result:
-            # Update existing product
-            product_id = result[0]
-            cursor.execute(
-                """
-                UPDATE products
-                SET name = ?, brand = ?, category = ?, url = ?, updated_at = ?
-                WHERE id = ?
-                """,
-                (
-                    product_data.get('name'),
-                    product_data.get('brand'),
-                    product_data.get('category'),
-                    product_data.get('url'),
-                    datetime.now().isoformat(),
-                    product_id
-                )
-            )
-        else:
-            # Insert new product
-            cursor.execute(
-                """
-                INSERT INTO products
-                (product_id, retailer, name, brand, category, url)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    product_data.get('product_id'),
-                    product_data.get('retailer'),
-                    product_data.get('name'),
-                    product_data.get('brand'),
-                    product_data.get('category'),
-                    product_data.get('url')
-                )
+            """
+            INSERT INTO products
+            (product_id, retailer, name, brand, category, url)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (product_id, retailer) DO UPDATE SET
+                name = excluded.name,
+                brand = excluded.brand,
+                category = excluded.category,
+                url = excluded.url,
+                updated_at = ?
+            RETURNING id
+            """,
+            (
+                product_data.get('product_id'),
+                product_data.get('retailer'),
+                product_data.get('name'),
+                product_data.get('brand'),
+                product_data.get('category'),
+                product_data.get('url'),
+                datetime.now().isoformat()
             )
-            product_id = cursor.lastrowid
+        )
+        product_id = cursor.fetchone()[0]
+        update_matches(cursor, [product_id])
             
         conn.commit()
-        logger.info(f"Product {'updated' if result else 'inserted'} successfully: {product_data.get('name')}")
+        logger.info(f"Product upserted successfully: {product_data.get('name')}")
         return product_id
         
     except Exception as e:
@@ -160,37 +542,129 @@ def insert_product(conn, product_data):
         conn.rollback()
         return None
 
-def insert_price(conn, price_data):
+def normalize_timestamp(value):
+    """
+    Bring a snapshot timestamp to the one ISO 8601 form history is stored in
+    
+    History rows are compared and ordered as strings, which only works when
+    every timestamp is written the same way: 'YYYY-MM-DDTHH:MM:SS[.ffffff]',
+    naive local time like datetime.now(). A ' ' separator, a trailing 'Z' or
+    a UTC offset would otherwise sort wrongly against the other rows.
+    
+    Args:
+        value (str or datetime): Timestamp, or None for now
+        
+    Returns:
+        str: Normalized timestamp (now if the value cannot be parsed, like a
+        snapshot without a timestamp)
+    """
+    if value is None:
+        return datetime.now().isoformat()
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value).strip())
+        except ValueError:
+            logger.warning(f"Unrecognized timestamp {value!r}, using the current time")
+            return datetime.now().isoformat()
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.isoformat()
+
+def _extend_latest(cursor, table, product_id, values, timestamp):
+    """
+    Extend the product's latest history row to timestamp if its tracked values are unchanged
+    
+    Returns:
+        int: Id of the extended row, or None if a new row is needed
+    """
+    conditions = " AND ".join(f"{column} IS ?" for column in TRACKED_COLUMNS[table])
+    cursor.execute(
+        f"""
+        UPDATE {table} SET last_seen = max(coalesce(last_seen, timestamp), ?)
+        WHERE id = (
+            SELECT id FROM {table} WHERE product_id = ?
+            ORDER BY timestamp DESC, id DESC LIMIT 1
+        )
+        AND timestamp <= ? AND {conditions}
+        RETURNING id
+        """,
+        (timestamp, product_id, timestamp, *values)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def _covering_row(cursor, table, product_id, values, timestamp):
+    """
+    Find a history row that already records these values at timestamp (e.g. a re-loaded snapshot)
+    
+    Returns:
+        int: Id of the row whose timestamp..last_seen span covers timestamp with the same values, or None
+    """
+    conditions = " AND ".join(f"{column} IS ?" for column in TRACKED_COLUMNS[table])
+    cursor.execute(
+        f"""
+        SELECT id FROM {table}
+        WHERE product_id = ? AND timestamp <= ? AND coalesce(last_seen, timestamp) >= ? AND {conditions}
+        LIMIT 1
+        """,
+        (product_id, timestamp, timestamp, *values)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def insert_price(conn, price_data, change_only=False):
     """
     Insert price into database
     
     Args:
         conn: Database connection
         price_data (dict): Price data
+        change_only (bool): If price and stock match the latest row, extend that
+            row's last_seen instead of inserting a duplicate
         
     Returns:
         int: Price ID or None if failed
     """
     try:
         cursor = conn.cursor()
+        timestamp = normalize_timestamp(price_data.get('timestamp'))
+        values = (
+            price_data.get('current_price'),
+            price_data.get('original_price'),
+            price_data.get('discount_percentage'),
+            price_data.get('in_stock', 0)
+        )
+        
+        if change_only:
+            # Where the latest row ended before this snapshot; an extension fills in the time since
+            previous = cursor.execute(
+                "SELECT max(coalesce(last_seen, timestamp)) FROM prices WHERE product_id = ? AND timestamp <= ?",
+                (price_data.get('product_id'), timestamp)
+            ).fetchone()[0]
+            
+            price_id = _extend_latest(cursor, 'prices', price_data.get('product_id'), values, timestamp)
+            if price_id:
+                update_price_rollups(cursor, {price_data.get('product_id'): (min(previous, timestamp), timestamp)})
+                update_product_latest(cursor, [price_data.get('product_id')])
+            else:
+                price_id = _covering_row(cursor, 'prices', price_data.get('product_id'), values, timestamp)
+            if price_id:
+                conn.commit()
+                logger.info(f"Price unchanged for product ID: {price_data.get('product_id')}")
+                return price_id
         
         cursor.execute(
             """
             INSERT INTO prices
-            (product_id, current_price, original_price, discount_percentage, in_stock, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
+            (product_id, current_price, original_price, discount_percentage, in_stock, timestamp, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
             """,
-            (
-                price_data.get('product_id'),
-                price_data.get('current_price'),
-                price_data.get('original_price'),
-                price_data.get('discount_percentage'),
-                price_data.get('in_stock', 0),
-                price_data.get('timestamp', datetime.now().isoformat())
-            )
+            (price_data.get('product_id'), *values, timestamp, timestamp)
         )
         
         price_id = cursor.lastrowid
+        update_price_rollups(cursor, {price_data.get('product_id'): (timestamp, timestamp)})
+        update_product_latest(cursor, [price_data.get('product_id')])
         conn.commit()
         logger.info(f"Price inserted successfully for product ID: {price_data.get('product_id')}")
         return price_id
@@ -200,35 +674,46 @@ def insert_price(conn, price_data):
         conn.rollback()
         return None
 
-def insert_reviews(conn, review_data):
+def insert_reviews(conn, review_data, change_only=False):
     """
     Insert review statistics into database
     
     Args:
         conn: Database connection
         review_data (dict): Review data
+        change_only (bool): If rating and review count match the latest row,
+            extend that row's last_seen instead of inserting a duplicate
         
     Returns:
         int: Review ID or None if failed
     """
     try:
         cursor = conn.cursor()
+        timestamp = normalize_timestamp(review_data.get('timestamp'))
+        values = (review_data.get('rating'), review_data.get('review_count'))
+        
+        if change_only:
+            review_id = (
+                _extend_latest(cursor, 'reviews', review_data.get('product_id'), values, timestamp)
+                or _covering_row(cursor, 'reviews', review_data.get('product_id'), values, timestamp)
+            )
+            if review_id:
+                update_product_latest(cursor, [review_data.get('product_id')])
+                conn.commit()
+                logger.info(f"Review stats unchanged for product ID: {review_data.get('product_id')}")
+                return review_id
         
         cursor.execute(
             """
             INSERT INTO reviews
-            (product_id, rating, review_count, timestamp)
-            VALUES (?, ?, ?, ?)
+            (product_id, rating, review_count, timestamp, last_seen)
+            VALUES (?, ?, ?, ?, ?)
             """,
-            (
-                review_data.get('product_id'),
-                review_data.get('rating'),
-                review_data.get('review_count'),
-                review_data.get('timestamp', datetime.now().isoformat())
-            )
+            (review_data.get('product_id'), *values, timestamp, timestamp)
         )
         
         review_id = cursor.lastrowid
+        update_product_latest(cursor, [review_data.get('product_id')])
         conn.commit()
         logger.info(f"Review stats inserted successfully for product ID: {review_data.get('product_id')}")
         return review_id
@@ -238,9 +723,486 @@ def insert_reviews(conn, review_data):
         conn.rollback()
         return None
 
+def _latest_history_rows(cursor, table, row_ids):
+    """
+    Get the latest history row of each product
+    
+    Returns:
+        dict: Product row id -> [history row id, tracked values, timestamp, last_seen]
+    """
+    columns = ", ".join(TRACKED_COLUMNS[table])
+    latest = {}
+    row_ids = list(row_ids)
+    for start in range(0, len(row_ids), 500):
+        chunk = row_ids[start:start + 500]
+        cursor.execute(
+            f"""
+            SELECT id, product_id, {columns}, timestamp, coalesce(last_seen, timestamp) FROM (
+                SELECT *, row_number() OVER (PARTITION BY product_id ORDER BY timestamp DESC, id DESC) AS position
+                FROM {table}
+                WHERE product_id IN ({", ".join("?" for _ in chunk)})
+            )
+            WHERE position = 1
+            """,
+            chunk
+        )
+        for row in cursor.fetchall():
+            latest[row[1]] = [row[0], tuple(row[2:-2]), row[-2], row[-1]]
+    return latest
+
+def _change_only_rows(cursor, table, rows):
+    """
+    Collapse history rows whose tracked values did not change into last_seen extensions
+    
+    Args:
+        cursor: Database cursor
+        table (str): 'prices' or 'reviews'
+        rows (list): (product row id, tracked values tuple, timestamp) in any order
+        
+    Returns:
+        tuple: (rows to insert as (product row id, *values, timestamp, last_seen),
+        {existing history row id: new last_seen})
+    """
+    latest = _latest_history_rows(cursor, table, {row[0] for row in rows})
+    new_rows = []
+    extended = {}
+    
+    for row_id, values, timestamp in sorted(rows, key=lambda row: row[2]):
+        current = latest.get(row_id)
+        if current and current[1] == values and current[2] <= timestamp:
+            current[3] = max(current[3], timestamp)
+            if isinstance(current[0], int):
+                extended[current[0]] = current[3]
+            else:
+                current[0][-1] = current[3]  # Row still to be inserted in this batch
+            continue
+        if current and timestamp < current[2] and _covering_row(cursor, table, row_id, values, timestamp):
+            continue  # Older snapshot that an existing row already accounts for
+        
+        new_row = [row_id, *values, timestamp, timestamp]
+        new_rows.append(new_row)
+        latest[row_id] = [new_row, values, timestamp, timestamp]
+    
+    return [tuple(row) for row in new_rows], extended
+
+def insert_batch(conn, records, change_only=False):
+    """
+    Insert a batch of transformed records into products, prices and reviews
+    
+    Uses executemany for every table and does not commit, so the caller
+    decides the transaction (and savepoint) boundaries.
+    
+    Args:
+        conn: Database connection
+        records (list): Transformed product dicts, as produced by ProductETL
+        change_only (bool): Only add history rows when tracked values change,
+            extending the latest row's last_seen otherwise
+        
+    Returns:
+        int: Number of records written
+    """
+    cursor = conn.cursor()
+    now = datetime.now().isoformat()
+    
+    # One products row per (product_id, retailer); the last record wins, like repeated insert_product calls
+    products = {}
+    for record in records:
+        if record.get('product_id') is not None:
+            products[(record['product_id'], record.get('retailer'))] = record
+    
+    cursor.executemany(
+        """
+        INSERT INTO products
+        (product_id, retailer, name, brand, category, url)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (product_id, retailer) DO UPDATE SET
+            name = excluded.name,
+            brand = excluded.brand,
+            category = excluded.category,
+            url = excluded.url,
+            updated_at = ?
+        """,
+        [
+            (product_id, retailer, r.get('name'), r.get('brand'), r.get('category'), r.get('url'), now)
+            for (product_id, retailer), r in products.items()
+        ]
+    )
+    
+    # Map (product_id, retailer) to row ids, a chunk of keys at a time
+    row_ids = {}
+    keys = list(products)
+    for start in range(0, len(keys), 400):
+        chunk = keys[start:start + 400]
+        placeholders = ", ".join("(?, ?)" for _ in chunk)
+        params = [value for key in chunk for value in key]
+        cursor.execute(
+            f"""
+            SELECT id, product_id, retailer FROM products
+            WHERE (product_id, retailer) IN (VALUES {placeholders})
+            """,
+            params
+        )
+        for row_id, product_id, retailer in cursor.fetchall():
+            row_ids[(product_id, retailer)] = row_id
+    
+    price_rows = []
+    review_rows = []
+    for record in records:
+        key = (record.get('product_id'), record.get('retailer'))
+        if key[0] is None:
+            # No natural key to look up - insert on its own, as insert_product would
+            cursor.execute(
+                "INSERT INTO products (product_id, retailer, name, brand, category, url) VALUES (?, ?, ?, ?, ?, ?)",
+                (None, record.get('retailer'), record.get('name'), record.get('brand'), record.get('category'), record.get('url'))
+            )
+            row_id = cursor.lastrowid
+        else:
+            row_id = row_ids.get(key)
+        
+        if row_id is None:
+            logger.warning(f"Skipping {key}: product row could not be created")
+            continue
+        
+        timestamp = normalize_timestamp(record.get('timestamp') or now)
+        price_rows.append((
+            row_id,
+            (
+                record.get('current_price'),
+                record.get('original_price'),
+                record.get('discount_percentage'),
+                record.get('in_stock')
+            ),
+            timestamp
+        ))
+        review_rows.append((row_id, (record.get('rating'), record.get('review_count')), timestamp))
+    
+    loaded = len(price_rows)
+    touched = {row[0] for row in price_rows}
+    rollup_ranges = {}  # Product row id -> (start, end) of the price history this batch changes
+    if change_only:
+        price_rows, price_extensions = _change_only_rows(cursor, 'prices', price_rows)
+        review_rows, review_extensions = _change_only_rows(cursor, 'reviews', review_rows)
+        
+        # An extended row now also covers the time between its old last_seen and the new one
+        extended_ids = list(price_extensions)
+        for start in range(0, len(extended_ids), 500):
+            chunk = extended_ids[start:start + 500]
+            cursor.execute(
+                f"SELECT id, product_id, coalesce(last_seen, timestamp) FROM prices WHERE id IN ({', '.join('?' for _ in chunk)})",
+                chunk
+            )
+            for history_id, row_id, last_seen in cursor.fetchall():
+                _widen(rollup_ranges, row_id, last_seen, price_extensions[history_id])
+        
+        cursor.executemany(
+            "UPDATE prices SET last_seen = ? WHERE id = ?",
+            [(last_seen, history_id) for history_id, last_seen in price_extensions.items()]
+        )
+        cursor.executemany(
+            "UPDATE reviews SET last_seen = ? WHERE id = ?",
+            [(last_seen, history_id) for history_id, last_seen in review_extensions.items()]
+        )
+    else:
+        price_rows = [(row_id, *values, timestamp, timestamp) for row_id, values, timestamp in price_rows]
+        review_rows = [(row_id, *values, timestamp, timestamp) for row_id, values, timestamp in review_rows]
+    
+    cursor.executemany(
+        """
+        INSERT INTO prices
+        (product_id, current_price, original_price, discount_percentage, in_stock, timestamp, last_seen)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        price_rows
+    )
+    cursor.executemany(
+        """
+        INSERT INTO reviews
+        (product_id, rating, review_count, timestamp, last_seen)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        review_rows
+    )
+    
+    for row in price_rows:
+        _widen(rollup_ranges, row[0], row[-2], row[-1])
+    update_price_rollups(cursor, rollup_ranges)
+    update_product_latest(cursor, touched)
+    update_matches(cursor, touched)
+    
+    logger.info(
+        f"Batch inserted: {loaded} records, {len(products)} products, "
+        f"{len(price_rows)} price and {len(review_rows)} review rows"
+    )
+    return loaded
+
+# Price rollup resolutions and the length of their buckets
+ROLLUP_RESOLUTIONS = {
+    'day': timedelta(days=1),
+    'week': timedelta(days=7),
+}
+
+# get_price_series(resolution='auto') serves ranges up to this many days from raw rows, then from daily rollups
+RAW_SERIES_MAX_DAYS = 7
+DAILY_SERIES_MAX_DAYS = 180
+
+def _widen(ranges, product_id, start, end):
+    """Grow a product's (start, end) range in place to include start..end"""
+    current = ranges.get(product_id)
+    ranges[product_id] = (min(current[0], start), max(current[1], end)) if current else (start, end)
+
+def _bucket_start(moment, resolution):
+    """Midnight starting the day (or the Monday starting the week) that contains moment"""
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday()) if resolution == 'week' else day
+
+def _rollup_buckets(rows, resolution, first, last):
+    """
+    Compute the rollups of the buckets from first to last
+    
+    A history row holds its values from its timestamp to its last_seen, so a
+    row counts towards every bucket that span overlaps. The in-stock ratio is
+    weighted by how long each row was observed within the bucket.
+    
+    Args:
+        rows (list): (timestamp, last_seen, current_price, discount_percentage, in_stock), oldest first
+        resolution (str): 'day' or 'week'
+        first (datetime): Start of the first bucket
+        last (datetime): Start of the last bucket
+        
+    Returns:
+        list: (bucket_start, open, high, low, close, min_discount, max_discount,
+        in_stock_ratio, row_count) for each bucket with data
+    """
+    length = ROLLUP_RESOLUTIONS[resolution]
+    spans = [
+        (datetime.fromisoformat(timestamp), datetime.fromisoformat(last_seen or timestamp), price, discount, in_stock)
+        for timestamp, last_seen, price, discount, in_stock in rows
+    ]
+    
+    buckets = []
+    position = 0
+    begin = first
+    while begin <= last:
+        end = begin + length
+        while position < len(spans) and spans[position][1] < begin:
+            position += 1
+        inside = []
+        for span in spans[position:]:
+            if span[0] >= end:
+                break
+            if span[1] >= begin:
+                inside.append(span)
+        
+        if inside:
+            prices = [span[2] for span in inside if span[2] is not None]
+            discounts = [span[3] for span in inside if span[3] is not None]
+            stock = [
+                ((min(span[1], end) - max(span[0], begin)).total_seconds(), bool(span[4]))
+                for span in inside if span[4] is not None
+            ]
+            observed = sum(seconds for seconds, _ in stock)
+            if observed:
+                in_stock_ratio = sum(seconds for seconds, in_stock in stock if in_stock) / observed
+            else:
+                # Only single snapshots in this bucket - count them instead
+                in_stock_ratio = sum(in_stock for _, in_stock in stock) / len(stock) if stock else None
+            
+            buckets.append((
+                begin.date().isoformat(),
+                prices[0] if prices else None,
+                max(prices) if prices else None,
+                min(prices) if prices else None,
+                prices[-1] if prices else None,
+                min(discounts) if discounts else None,
+                max(discounts) if discounts else None,
+                in_stock_ratio,
+                len(inside)
+            ))
+        begin = end
+    return buckets
+
+def update_price_rollups(conn, ranges):
+    """
+    Recompute the daily and weekly rollups covering changed price history
+    
+    Called by insert_price and insert_batch with the time span their writes
+    touched, so only the buckets of that span are rebuilt. Does not commit.
+    
+    Args:
+        conn: Database connection (or cursor)
+        ranges (dict): Product row id -> (start, end) ISO timestamps of the changed history
+    """
+    for product_id, (start, end) in ranges.items():
+        start, end = datetime.fromisoformat(start), datetime.fromisoformat(end)
+        window_start = _bucket_start(start, 'week')
+        window_end = _bucket_start(end, 'week') + ROLLUP_RESOLUTIONS['week']
+        rows = conn.execute(
+            """
+            SELECT timestamp, last_seen, current_price, discount_percentage, in_stock FROM prices
+            WHERE product_id = ? AND timestamp < ? AND coalesce(last_seen, timestamp) >= ?
+            ORDER BY timestamp, id
+            """,
+            (product_id, window_end.isoformat(), window_start.isoformat())
+        ).fetchall()
+        
+        for resolution in ROLLUP_RESOLUTIONS:
+            first, last = _bucket_start(start, resolution), _bucket_start(end, resolution)
+            conn.execute(
+                "DELETE FROM price_rollups WHERE product_id = ? AND resolution = ? AND bucket_start BETWEEN ? AND ?",
+                (product_id, resolution, first.date().isoformat(), last.date().isoformat())
+            )
+            conn.executemany(
+                """
+                INSERT INTO price_rollups
+                (product_id, resolution, bucket_start, open, high, low, close,
+                 min_discount, max_discount, in_stock_ratio, row_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(product_id, resolution, *bucket) for bucket in _rollup_buckets(rows, resolution, first, last)]
+            )
+
+def _rebuild_price_rollups(conn, product_id=None):
+    """Recompute the rollups of one product (or all) from their whole price history, without committing"""
+    query = "SELECT product_id, min(timestamp), max(coalesce(last_seen, timestamp)) FROM prices"
+    params = ()
+    if product_id is not None:
+        query += " WHERE product_id = ?"
+        params = (product_id,)
+    ranges = {row[0]: (row[1], row[2]) for row in conn.execute(query + " GROUP BY product_id", params) if row[1]}
+    
+    if product_id is None:
+        conn.execute("DELETE FROM price_rollups")
+    else:
+        conn.execute("DELETE FROM price_rollups WHERE product_id = ?", (product_id,))
+    update_price_rollups(conn, ranges)
+
+def rebuild_price_rollups(conn, product_id=None):
+    """
+    Recompute price rollups from scratch, e.g. after editing the prices table by hand
+    
+    Args:
+        conn: Database connection
+        product_id (int): Only this product row id, or None for every product
+        
+    Returns:
+        bool: Success or failure
+    """
+    try:
+        _rebuild_price_rollups(conn, product_id)
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error rebuilding price rollups: {str(e)}")
+        conn.rollback()
+        return False
+
+def update_product_latest(conn, product_ids=None):
+    """
+    Refresh product_latest from the newest price and review rows of some products
+    
+    Called by the insert functions with the products they wrote, inside their
+    transaction. Each product costs two index lookups on (product_id, timestamp),
+    whatever the size of the history. Does not commit.
+    
+    Args:
+        conn: Database connection (or cursor)
+        product_ids (iterable): Product row ids, or None for every product
+    """
+    query = """
+        INSERT OR REPLACE INTO product_latest
+        (product_id, current_price, original_price, discount_percentage, in_stock, rating, review_count, last_seen)
+        SELECT p.id, pr.current_price, pr.original_price, pr.discount_percentage, pr.in_stock,
+               rv.rating, rv.review_count,
+               max(coalesce(pr.last_seen, pr.timestamp, rv.last_seen, rv.timestamp),
+                   coalesce(rv.last_seen, rv.timestamp, pr.last_seen, pr.timestamp))
+        FROM products p
+        LEFT JOIN prices pr ON pr.id = (
+            SELECT id FROM prices WHERE product_id = p.id ORDER BY timestamp DESC, id DESC LIMIT 1
+        )
+        LEFT JOIN reviews rv ON rv.id = (
+            SELECT id FROM reviews WHERE product_id = p.id ORDER BY timestamp DESC, id DESC LIMIT 1
+        )
+        WHERE (pr.id IS NOT NULL OR rv.id IS NOT NULL)
+    """
+    if product_ids is None:
+        conn.execute(query)
+        return
+    
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), 500):
+        chunk = product_ids[start:start + 500]
+        conn.execute(query + f" AND p.id IN ({', '.join('?' for _ in chunk)})", chunk)
+
+def get_manifest(conn, directory):
+    """
+    Get the manifest entries of the files loaded from a directory
+    
+    Args:
+        conn: Database connection
+        directory (str): Directory the files were loaded from
+        
+    Returns:
+        dict: Absolute file path -> (size, mtime, content_hash)
+    """
+    prefix = os.path.join(os.path.abspath(directory), '')
+    cursor = conn.execute(
+        "SELECT path, size, mtime, content_hash FROM etl_manifest WHERE substr(path, 1, ?) = ?",
+        (len(prefix), prefix)
+    )
+    return {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+
+def record_manifest(conn, entries):
+    """
+    Mark files as loaded, without committing (so it can share the data's transaction)
+    
+    Args:
+        conn: Database connection
+        entries (list): (path, size, mtime, content_hash) tuples
+    """
+    now = datetime.now().isoformat()
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO etl_manifest (path, size, mtime, content_hash, processed_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [(path, size, mtime, content_hash, now) for path, size, mtime, content_hash in entries]
+    )
+
+def get_watermark(conn, directory):
+    """
+    Get a directory's high-water mark
+    
+    Returns:
+        tuple: (max_mtime, file_count) - every file with an mtime up to max_mtime
+        was loaded, and file_count files had such an mtime - or None
+    """
+    row = conn.execute(
+        "SELECT max_mtime, file_count FROM etl_watermark WHERE directory = ?",
+        (os.path.abspath(directory),)
+    ).fetchone()
+    return (row[0], row[1]) if row else None
+
+def set_watermark(conn, directory, max_mtime, file_count):
+    """Set a directory's high-water mark, without committing"""
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO etl_watermark (directory, max_mtime, file_count, updated_at)
+        VALUES (?, ?, ?, ?)
+        """,
+        (os.path.abspath(directory), max_mtime, file_count, datetime.now().isoformat())
+    )
+
 # Function to get product data by ID or other criteria
 def get_product(conn, product_id=None, retailer=None, name=None):
-    """Get product data from database"""
+    """
+    Get product data from database
+    
+    name is looked up in the name column of the full-text index: every word
+    of it must start a word of the product name ('sams gal' finds 'Samsung
+    Galaxy S24'). Matches inside a word ('hone' in 'Smartphone') are not
+    found; databases without FTS5 still use LIKE '%name%'. To search brand
+    and category as well, ranked by relevance, use search_products.
+    """
     try:
         cursor = conn.cursor()
         
@@ -256,8 +1218,13 @@ def get_product(conn, product_id=None, retailer=None, name=None):
             params.append(retailer)
             
         if name:
-            query += " AND name LIKE ?"
-            params.append(f"%{name}%")
+            match = _fts_query(name)
+            if _has_fts(conn) and match:
+                query += " AND id IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?)"
+                params.append(f"name : ({match})")
+            else:
+                query += " AND name LIKE ?"
+                params.append(f"%{name}%")
             
         cursor.execute(query, params)
         return cursor.fetchall()
@@ -266,9 +1233,134 @@ def get_product(conn, product_id=None, retailer=None, name=None):
         logger.error(f"Error getting product: {str(e)}")
         return []
 
+def _has_fts(conn):
+    """Whether the database has the products_fts index"""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'").fetchone() is not None
+
+def _fts_query(text):
+    """
+    Turn free text into an FTS5 query that matches every word as a prefix
+    
+    Each word is quoted, so FTS5 operators and punctuation in the text are
+    searched for literally: 'sony wh-1000' becomes '"sony"* "wh"* "1000"*'.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+def search_products(conn, query, retailer=None, limit=20):
+    """
+    Full-text search over product name, brand and category, best matches first
+    
+    Every word of the query must match the start of a word in one of the
+    columns, so partial input ("sams gala") already finds products. Results are
+    ranked with bm25, weighting name matches above brand and category ones.
+    
+    Args:
+        conn: Database connection
+        query (str): Search text
+        retailer (str): Only this retailer's products
+        limit (int): Maximum number of results
+        
+    Returns:
+        list: products rows, with an extra `rank` column (lower is better)
+    """
+    try:
+        match = _fts_query(query or '')
+        if not match:
+            return []
+        
+        if not _has_fts(conn):
+            sql = "SELECT *, 0 AS rank FROM products WHERE name LIKE ?"
+            params = [f"%{query}%"]
+            if retailer:
+                sql += " AND retailer = ?"
+                params.append(retailer)
+            return conn.execute(sql + " LIMIT ?", params + [limit]).fetchall()
+        
+        sql = f"""
+            SELECT p.*, bm25(products_fts, {", ".join(str(weight) for weight in SEARCH_WEIGHTS)}) AS rank
+            FROM products_fts JOIN products p ON p.id = products_fts.rowid
+            WHERE products_fts MATCH ?
+        """
+        params = [match]
+        if retailer:
+            sql += " AND p.retailer = ?"
+            params.append(retailer)
+        return conn.execute(sql + " ORDER BY rank LIMIT ?", params + [limit]).fetchall()
+        
+    except Exception as e:
+        logger.error(f"Error searching products: {str(e)}")
+        return []
+
+# Current state of the catalogue, from the product_latest table
+LATEST_COLUMNS = "l.current_price, l.original_price, l.discount_percentage, l.in_stock, l.rating, l.review_count, l.last_seen"
+
+def get_product_latest(conn, product_id):
+    """
+    Get a product's current price, stock and review state
+    
+    Args:
+        conn: Database connection
+        product_id (int): Product row id
+        
+    Returns:
+        Row with current_price, original_price, discount_percentage, in_stock,
+        rating, review_count and last_seen, or None if the product has no history
+    """
+    try:
+        return conn.execute(
+            f"SELECT {LATEST_COLUMNS} FROM product_latest l WHERE l.product_id = ?",
+            (product_id,)
+        ).fetchone()
+        
+    except Exception as e:
+        logger.error(f"Error getting latest product state: {str(e)}")
+        return None
+
+def get_catalogue(conn, retailer=None, in_stock_only=False):
+    """
+    Get the current state of every tracked product in one pass over product_latest
+    
+    Args:
+        conn: Database connection
+        retailer (str): Only this retailer's products
+        in_stock_only (bool): Only products whose latest snapshot was in stock
+        
+    Returns:
+        list: Rows with the products columns followed by current_price, original_price,
+        discount_percentage, in_stock, rating, review_count and last_seen
+    """
+    try:
+        query = f"SELECT p.*, {LATEST_COLUMNS} FROM product_latest l JOIN products p ON p.id = l.product_id WHERE 1=1"
+        params = []
+        
+        if retailer:
+            query += " AND p.retailer = ?"
+            params.append(retailer)
+            
+        if in_stock_only:
+            query += " AND l.in_stock"
+            
+        return conn.execute(query + " ORDER BY l.product_id", params).fetchall()
+        
+    except Exception as e:
+        logger.error(f"Error getting catalogue: {str(e)}")
+        return []
+
 # Function to get price history for a product
-def get_price_history(conn, product_id):
-    """Get price history for a product"""
+def get_price_history(conn, product_id, expand=False, step=3600):
+    """
+    Get price history for a product
+    
+    Args:
+        conn: Database connection
+        product_id (int): Product row id
+        expand (bool): Expand change-only rows back into a point-in-time series,
+            one point every `step` seconds from each row's timestamp to its last_seen
+        step (int): Seconds between expanded points
+        
+    Returns:
+        list: Price rows, newest first (dicts when expanded)
+    """
     try:
         cursor = conn.cursor()
         
@@ -280,9 +1372,138 @@ def get_price_history(conn, product_id):
             """,
             (product_id,)
         )
+        rows = cursor.fetchall()
         
-        return cursor.fetchall()
+        if not expand:
+            return rows
+        
+        series = []
+        for row in rows:
+            row = dict(row)
+            start = datetime.fromisoformat(row['timestamp'])
+            end = datetime.fromisoformat(row['last_seen'] or row['timestamp'])
+            points = []
+            point = start
+            while point <= end:
+                points.append(dict(row, timestamp=point.isoformat()))
+                point += timedelta(seconds=step)
+            series.extend(reversed(points))
+        return series
         
     except Exception as e:
         logger.error(f"Error getting price history: {str(e)}")
         return []
+
+def get_price_series(conn, product_id, start=None, end=None, resolution='auto'):
+    """
+    Get a product's price history over a time range at a chart-friendly resolution
+    
+    Daily and weekly series are read from price_rollups, so their cost depends on
+    the number of buckets, not on how many snapshots were scraped.
+    
+    Args:
+        conn: Database connection
+        product_id (int): Product row id
+        start (str): ISO timestamp to start from, or None for the beginning of the history
+        end (str): ISO timestamp to end at, or None for now
+        resolution (str): 'raw', 'day', 'week', or 'auto' to pick one from the length
+            of the range (raw up to RAW_SERIES_MAX_DAYS, daily up to DAILY_SERIES_MAX_DAYS)
+        
+    Returns:
+        list: Oldest first. Raw rows are dicts of the prices columns; rollup rows are
+        dicts with bucket_start, open, high, low, close, min_discount, max_discount,
+        in_stock_ratio and row_count
+    """
+    try:
+        if start is None:
+            start = conn.execute("SELECT min(timestamp) FROM prices WHERE product_id = ?", (product_id,)).fetchone()[0]
+            if start is None:
+                return []
+        start, end = normalize_timestamp(start), normalize_timestamp(end)
+        
+        if resolution == 'auto':
+            days = (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds() / 86400
+            resolution = 'raw' if days <= RAW_SERIES_MAX_DAYS else 'day' if days <= DAILY_SERIES_MAX_DAYS else 'week'
+        
+        if resolution == 'raw':
+            cursor = conn.execute(
+                """
+                SELECT timestamp, last_seen, current_price, original_price, discount_percentage, in_stock
+                FROM prices
+                WHERE product_id = ? AND timestamp <= ? AND coalesce(last_seen, timestamp) >= ?
+                ORDER BY timestamp, id
+                """,
+                (product_id, end, start)
+            )
+        elif resolution in ROLLUP_RESOLUTIONS:
+            cursor = conn.execute(
+                """
+                SELECT bucket_start, open, high, low, close, min_discount, max_discount, in_stock_ratio, row_count
+                FROM price_rollups
+                WHERE product_id = ? AND resolution = ? AND bucket_start BETWEEN ? AND ?
+                ORDER BY bucket_start
+                """,
+                (
+                    product_id,
+                    resolution,
+                    _bucket_start(datetime.fromisoformat(start), resolution).date().isoformat(),
+                    end[:10]
+                )
+            )
+        else:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        
+    except Exception as e:
+        logger.error(f"Error getting price series: {str(e)}")
+        return []
+
+def compact_history(conn, table='prices'):
+    """
+    Collapse runs of identical history rows written before change-only loading
+    
+    Each run of consecutive rows with the same tracked values is merged into
+    its first row, whose last_seen becomes the last row's timestamp.
+    
+    Args:
+        conn: Database connection
+        table (str): 'prices' or 'reviews'
+        
+    Returns:
+        int: Number of rows removed
+    """
+    columns = ", ".join(TRACKED_COLUMNS[table])
+    cursor = conn.execute(
+        f"SELECT id, product_id, {columns}, timestamp, coalesce(last_seen, timestamp) FROM {table} "
+        f"ORDER BY product_id, timestamp, id"
+    )
+    
+    extended = {}
+    removed = []
+    run = None  # [first row id, product id, values, last_seen]
+    for row in cursor:
+        row_id, product_id, values, timestamp, last_seen = row[0], row[1], tuple(row[2:-2]), row[-2], row[-1]
+        if run and run[1] == product_id and run[2] == values:
+            run[3] = max(run[3], last_seen)
+            extended[run[0]] = run[3]
+            removed.append((row_id,))
+        else:
+            run = [row_id, product_id, values, last_seen]
+    
+    try:
+        conn.executemany(f"UPDATE {table} SET last_seen = ? WHERE id = ?", [(v, k) for k, v in extended.items()])
+        conn.executemany(f"DELETE FROM {table} WHERE id = ?", removed)
+        if table == 'prices':
+            # Merged rows now span the gaps between the rows they replaced
+            _rebuild_price_rollups(conn)
+        update_product_latest(conn)
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Error compacting {table}: {str(e)}")
+        conn.rollback()
+        return 0
+    
+    logger.info(f"Compacted {table}: removed {len(removed)} duplicate rows")
+    return len(removed)
@@ -5,7 +5,15 @@ import logging
 from datetime import datetime
 import json
 import os
-from database import get_db_connection, insert_product, insert_price, insert_reviews
+import hashlib
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from segment_store import list_segments, read_segment
+from database import (
+    get_db_connection, insert_product, insert_price, insert_reviews, insert_batch,
+    get_manifest, record_manifest, get_watermark, set_watermark
+)
 
 # Configure logging
 logging.basicConfig(
@@ -18,12 +26,73 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ETL")
 
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # orjson is optional, the standard library works too
+    _loads = json.loads
+
+
 class ProductETL:
     """ETL pipeline for product data"""
     
-    def __init__(self, db_connection=None):
-        """Initialize ETL pipeline"""
+    # Fields every raw record must have (product_id might be generated later)
+    REQUIRED_FIELDS = ['name', 'product_id', 'retailer', 'url']
+    
+    # Alternative field names used by the scrapers -> standard field name
+    FIELD_MAPPING = {
+        'title': 'name',
+        'productName': 'name',
+        'price': 'current_price',
+        'currentPrice': 'current_price',
+        'sale_price': 'current_price',
+        'listPrice': 'original_price',
+        'regular_price': 'original_price',
+        'list_price': 'original_price',
+        'msrp': 'original_price',
+        'availability': 'in_stock',
+        'inStock': 'in_stock',
+        'is_available': 'in_stock',
+        'productId': 'product_id',
+        'asin': 'product_id',
+        'sku': 'product_id',
+        'store': 'retailer',
+        'vendor': 'retailer',
+        'link': 'url',
+        'productUrl': 'url',
+        'stars': 'rating',
+        'averageRating': 'rating',
+        'reviewCount': 'review_count',
+        'numReviews': 'review_count',
+        'brand_name': 'brand',
+        'manufacturer': 'brand'
+    }
+    
+    # in_stock strings that mean the product is available
+    IN_STOCK_VALUES = ['true', 'yes', 'y', 'in stock', 'instock', '1']
+    
+    # Records read from a segment and transformed at a time by process_segments
+    TRANSFORM_CHUNK = 10000
+    
+    def __init__(self, db_connection=None, batch_size=500, change_only=False, connection_manager=None):
+        """
+        Initialize ETL pipeline
+        
+        Args:
+            db_connection: Database connection, established lazily if not given
+            batch_size (int): Records per executemany batch in bulk mode
+            change_only (bool): Only write price/review rows when values change,
+                extending the latest row's last_seen otherwise
+            connection_manager (ConnectionManager): Run bulk loads (flush) on this
+                manager's writer thread, serialized with every other write it
+                queues, instead of on db_connection. Each flush then commits.
+        """
         self.db_connection = db_connection
+        self.batch_size = batch_size
+        self.change_only = change_only
+        self.connection_manager = connection_manager
+        self.pending = []  # (transformed record, manifest entry) pairs waiting to be bulk loaded
+        self.defer_commit = False  # True while process_directory holds one transaction open
         if not db_connection:
             logger.info("No database connection provided, will establish when needed")
             
@@ -54,8 +123,7 @@ class ProductETL:
             data = raw_data.copy()
             
             # Ensure required fields exist
-            required_fields = ['name', 'product_id', 'retailer', 'url']
-            for field in required_fields:
+            for field in self.REQUIRED_FIELDS:
                 if field not in data or not data[field]:
                     logger.warning(f"Missing required field: {field}")
                     if field != 'product_id':  # product_id might be generated later
@@ -63,36 +131,8 @@ class ProductETL:
             
             # Standardize field names if requested
             if standardize_fields:
-                field_mapping = {
-                    'title': 'name',
-                    'productName': 'name',
-                    'price': 'current_price',
-                    'currentPrice': 'current_price',
-                    'sale_price': 'current_price',
-                    'listPrice': 'original_price',
-                    'regular_price': 'original_price',
-                    'list_price': 'original_price',
-                    'msrp': 'original_price',
-                    'availability': 'in_stock',
-                    'inStock': 'in_stock',
-                    'is_available': 'in_stock',
-                    'productId': 'product_id',
-                    'asin': 'product_id',
-                    'sku': 'product_id',
-                    'store': 'retailer',
-                    'vendor': 'retailer',
-                    'link': 'url',
-                    'productUrl': 'url',
-                    'stars': 'rating',
-                    'averageRating': 'rating',
-                    'reviewCount': 'review_count',
-                    'numReviews': 'review_count',
-                    'brand_name': 'brand',
-                    'manufacturer': 'brand'
-                }
-                
                 # Apply mapping
-                for old_key, new_key in field_mapping.items():
+                for old_key, new_key in self.FIELD_MAPPING.items():
                     if old_key in data and old_key != new_key:
                         if new_key not in data or not data[new_key]:
                             data[new_key] = data[old_key]
@@ -126,7 +166,7 @@ class ProductETL:
             # Ensure boolean for in_stock
             if 'in_stock' in data:
                 if isinstance(data['in_stock'], str):
-                    data['in_stock'] = data['in_stock'].lower() in ['true', 'yes', 'y', 'in stock', 'instock', '1']
+                    data['in_stock'] = data['in_stock'].lower() in self.IN_STOCK_VALUES
             
             # Rating
             if 'rating' in data and data['rating'] is not None:
@@ -235,8 +275,8 @@ class ProductETL:
                 price_data['product_id'] = product_id
                 review_data['product_id'] = product_id
                 
-                price_id = insert_price(conn, price_data)
-                review_id = insert_reviews(conn, review_data)
+                price_id = insert_price(conn, price_data, self.change_only)
+                review_id = insert_reviews(conn, review_data, self.change_only)
                 
                 logger.info(f"Successfully loaded product {product_data['name']} to database")
                 return True
@@ -250,13 +290,123 @@ class ProductETL:
             logger.error(traceback.format_exc())
             return False
     
-    def process_raw_data(self, raw_data, save_to_db=True):
+    def load_batch(self, pending, conn=None):
+        """
+        Load a batch of (record, manifest entry) pairs with executemany
+        
+        The batch runs under its own savepoint: if it fails, only this batch is
+        rolled back and the surrounding transaction carries on. It is then
+        retried one record at a time, so a bad record only loses itself, as it
+        did when every record was inserted on its own. Manifest entries are
+        written under the same savepoint as their record, so a file is only
+        marked as loaded together with its data.
+        
+        Args:
+            pending (list): (transformed record or None, manifest entry or None) pairs,
+                as buffered by buffer(); an entry is (path, size, mtime, content_hash)
+            conn: Connection to load on, defaults to the ETL's own
+            
+        Returns:
+            int: Number of records loaded
+        """
+        if not pending:
+            return 0
+            
+        conn = conn or self._get_db_connection()
+        try:
+            return self._load_under_savepoint(conn, pending)
+        except Exception as e:
+            if len(pending) == 1:
+                logger.error(f"Error loading record, skipping it: {str(e)}")
+                return 0
+            logger.warning(f"Error loading batch of {len(pending)} records, retrying them one at a time: {str(e)}")
+        
+        loaded = 0
+        for record, manifest_entry in pending:
+            try:
+                loaded += self._load_under_savepoint(conn, [(record, manifest_entry)])
+            except Exception as e:
+                source = manifest_entry[0] if manifest_entry else (record or {}).get('product_id')
+                logger.error(f"Error loading record {source}, skipping it: {str(e)}")
+        return loaded
+    
+    def _load_under_savepoint(self, conn, pending):
+        """Load (record, manifest entry) pairs under the etl_batch savepoint, rolling it back on error"""
+        records = [record for record, _ in pending if record]
+        manifest_entries = [entry for _, entry in pending if entry]
+        
+        conn.execute("SAVEPOINT etl_batch")
+        try:
+            loaded = insert_batch(conn, records, self.change_only) if records else 0
+            if manifest_entries:
+                record_manifest(conn, manifest_entries)
+        except Exception:
+            conn.execute("ROLLBACK TO etl_batch")
+            conn.execute("RELEASE etl_batch")
+            raise
+        conn.execute("RELEASE etl_batch")
+        return loaded
+    
+    def buffer(self, transformed_data, manifest_entry=None):
+        """
+        Buffer a transformed record for the next bulk load
+        
+        Args:
+            transformed_data (dict): Transformed product data, or None to only record manifest_entry
+            manifest_entry (tuple): (path, size, mtime, content_hash) of the source file, or None
+            
+        Returns:
+            bool: True once batch_size records are buffered and flush() should be called
+        """
+        self.pending.append((transformed_data, manifest_entry))
+        return len(self.pending) >= self.batch_size
+    
+    def flush(self, commit=True):
+        """
+        Bulk load every buffered record, batch_size records at a time
+        
+        Args:
+            commit (bool): Whether to commit once the buffer is written
+            
+        Returns:
+            int: Number of records loaded
+        """
+        if self.connection_manager is not None:
+            pending, self.pending = self.pending, []
+            return self.connection_manager.write(self._load_pending, pending, True) if pending else 0
+            
+        if not self.pending:
+            # Earlier batches may have been written without committing
+            if commit and self.db_connection is not None and self.db_connection.in_transaction:
+                self.db_connection.commit()
+            return 0
+            
+        pending, self.pending = self.pending, []
+        return self._load_pending(self._get_db_connection(), pending, commit)
+    
+    def _load_pending(self, conn, pending, commit):
+        """Load (record, manifest entry) pairs on conn, batch_size records at a time"""
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+            
+        loaded = 0
+        for start in range(0, len(pending), self.batch_size):
+            loaded += self.load_batch(pending[start:start + self.batch_size], conn)
+        
+        if commit:
+            conn.commit()
+        logger.info(f"Bulk loaded {loaded} records")
+        return loaded
+    
+    def process_raw_data(self, raw_data, save_to_db=True, bulk=False):
         """
         Process raw data through the ETL pipeline
         
         Args:
             raw_data (dict): Raw product data from scraper
             save_to_db (bool): Whether to save to database
+            bulk (bool): Buffer the record and load it with the next batch
+                instead of writing it right away (call flush() when done)
             
         Returns:
             dict: Transformed data
@@ -264,17 +414,45 @@ class ProductETL:
         transformed_data = self.transform_product_data(raw_data)
         
         if transformed_data and save_to_db:
-            self.load_to_database(transformed_data)
+            if bulk:
+                if self.buffer(transformed_data):
+                    self.flush(commit=not self.defer_commit)
+            else:
+                self.load_to_database(transformed_data)
             
         return transformed_data
     
-    def process_file(self, filename, save_to_db=True):
+    def process_raw_batch(self, raw_records, save_to_db=True):
+        """
+        Process many raw records through the ETL pipeline
+        
+        The records are buffered and bulk loaded like process_raw_data(bulk=True)
+        does (call flush() when done).
+        
+        Args:
+            raw_records (list): Raw product data from scrapers
+            save_to_db (bool): Whether to save to database
+            
+        Returns:
+            list: Transformed data for each record, None where it was rejected
+        """
+        transformed_records = [self.transform_product_data(record) for record in raw_records]
+        
+        if save_to_db:
+            self.pending.extend((record, None) for record in transformed_records if record)
+            if len(self.pending) >= self.batch_size:
+                self.flush(commit=not self.defer_commit)
+                
+        return transformed_records
+    
+    def process_file(self, filename, save_to_db=True, bulk=False):
         """
         Process raw data from JSON file
         
         Args:
             filename (str): JSON file path
             save_to_db (bool): Whether to save to database
+            bulk (bool): Buffer the record for a batched load
             
         Returns:
             dict: Transformed data
@@ -283,19 +461,29 @@ class ProductETL:
             with open(filename, 'r') as f:
                 raw_data = json.load(f)
             
-            return self.process_raw_data(raw_data, save_to_db)
+            return self.process_raw_data(raw_data, save_to_db, bulk)
             
         except Exception as e:
             logger.error(f"Error processing file {filename}: {str(e)}")
             return None
     
-    def process_directory(self, directory, save_to_db=True):
+    def process_directory(self, directory, save_to_db=True, bulk=False, workers=None, chunk_size=50,
+                          max_in_flight=None, incremental=False):
         """
         Process all JSON files in directory
         
         Args:
             directory (str): Directory path
             save_to_db (bool): Whether to save to database
+            bulk (bool): Load records in batches of batch_size inside a single
+                transaction instead of committing every insert
+            workers (int): Read and transform files in this many worker processes,
+                with this process as the single (bulk) database writer
+            chunk_size (int): Files handed to a worker per task
+            max_in_flight (int): Tasks queued or running at once before the reader
+                waits for the writer to catch up (defaults to 2 per worker)
+            incremental (bool): Only load files that are new or changed since they
+                were last loaded, according to the etl_manifest table. Implies bulk.
             
         Returns:
             int: Number of successfully processed files
@@ -303,19 +491,311 @@ class ProductETL:
         if not os.path.isdir(directory):
             logger.error(f"Not a valid directory: {directory}")
             return 0
+        
+        all_files = self._scan_directory(directory)
+        files = all_files
+        incremental = incremental and save_to_db
+        
+        if incremental:
+            bulk = True
+            files = self._select_changed_files(directory, all_files)
+        
+        success_count = 0
+        if not files:
+            logger.info(f"No new or changed files in {directory}")
+        elif workers and workers > 1:
+            success_count = self._process_files_parallel(
+                files, save_to_db, incremental, workers, chunk_size, max_in_flight
+            )
+        else:
+            success_count = self._process_files(files, save_to_db, bulk, incremental)
+        
+        if incremental:
+            self._update_watermark(directory, all_files)
+        
+        if files:
+            logger.info(f"Processed {success_count} files from {directory}")
+        return success_count
+    
+    def _scan_directory(self, directory):
+        """
+        List the JSON files of a directory with their size and mtime, oldest first
+        
+        Returns:
+            list: (absolute path, size, mtime, None) tuples - the last slot holds
+            the previously loaded content hash once the manifest has been checked
+        """
+        files = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json') and entry.is_file():
+                    stat = entry.stat()
+                    files.append((os.path.abspath(entry.path), stat.st_size, stat.st_mtime, None))
+        
+        # Oldest first, so snapshots reach change-only history in the order they were scraped
+        files.sort(key=lambda file: (file[2], file[0]))
+        return files
+    
+    def _select_changed_files(self, directory, files):
+        """
+        Drop the files that were already loaded
+        
+        Files up to the directory's high-water mark are skipped with no further
+        check, as long as their number still matches the one recorded with it
+        (otherwise a file was added with an old mtime and every file is checked).
+        The remaining files are compared with the manifest on size and mtime;
+        those that look changed are kept together with their previous content
+        hash, so ones that were only touched can be skipped after hashing.
+        
+        Returns:
+            list: (path, size, mtime, previous content hash or None) of files to process
+        """
+        conn = self._get_db_connection()
+        watermark = get_watermark(conn, directory)
+        
+        candidates = files
+        if watermark is not None:
+            max_mtime, file_count = watermark
+            older = sum(1 for _, _, mtime, _ in files if mtime <= max_mtime)
+            if older == file_count:
+                candidates = [file for file in files if file[2] > max_mtime]
+            else:
+                logger.info(
+                    f"{older} files in {directory} are older than the high-water mark, "
+                    f"{file_count} were recorded with it: checking every file"
+                )
+        if not candidates:
+            return []
+        
+        manifest = get_manifest(conn, directory)
+        changed = []
+        for path, size, mtime, _ in candidates:
+            previous = manifest.get(path)
+            if previous and previous[0] == size and previous[1] == mtime:
+                continue
+            changed.append((path, size, mtime, previous[2] if previous else None))
+        
+        logger.info(
+            f"{len(changed)} of {len(files)} files in {directory} to check "
+            f"({len(files) - len(candidates)} skipped by the high-water mark)"
+        )
+        return changed
+    
+    def _update_watermark(self, directory, files):
+        """
+        Move a directory's high-water mark to the newest mtime up to which every file is loaded
+        
+        Files that failed to load stay out of the manifest and hold the mark
+        back, so the next run still finds them.
+        """
+        if not files:
+            return
+        conn = self._get_db_connection()
+        if get_watermark(conn, directory) == (files[-1][2], len(files)):
+            return  # Already covers every file
+        
+        manifest = get_manifest(conn, directory)
+        missing = [
+            mtime for path, size, mtime, _ in files
+            if manifest.get(path, (None, None))[:2] != (size, mtime)
+        ]
+        limit = min(missing) if missing else float('inf')
+        loaded = [mtime for _, _, mtime, _ in files if mtime < limit]
+        if loaded:
+            set_watermark(conn, directory, max(loaded), len(loaded))
+            conn.commit()
+    
+    def _process_files(self, files, save_to_db, bulk, incremental):
+        """Read, transform and load files one by one in this process"""
+        success_count = 0
+        self.defer_commit = bulk
+        
+        try:
+            for path, size, mtime, previous_hash in files:
+                if incremental:
+                    record, content_hash = _read_and_transform(self, path)
+                    if self._queue_file(record, (path, size, mtime, content_hash), previous_hash):
+                        success_count += 1
+                elif self.process_file(path, save_to_db, bulk):
+                    success_count += 1
+        finally:
+            if bulk:
+                self.defer_commit = False
+                self.flush()
+        
+        return success_count
+    
+    def _queue_file(self, record, manifest_entry, previous_hash):
+        """
+        Buffer a file's record with its manifest entry for the next bulk batch
+        
+        Returns:
+            bool: Whether the file produced a record to load
+        """
+        if manifest_entry[3] is None:
+            return False  # Unreadable - leave it out of the manifest so the next run retries it
+        if manifest_entry[3] == previous_hash:
+            record = None  # Touched but not changed - only refresh its manifest entry
             
+        if self.buffer(record, manifest_entry):
+            # Each batch commits with its manifest entries, so an interrupted run resumes where it stopped
+            self.flush()
+        return record is not None
+    
+    def _process_files_parallel(self, files, save_to_db, incremental, workers, chunk_size, max_in_flight):
+        """
+        Transform files in a process pool and bulk load the results from this process
+        
+        At most max_in_flight chunks are submitted at a time, so a slow database
+        holds the workers back instead of letting transformed records pile up.
+        
+        Returns:
+            int: Number of successfully processed files
+        """
+        max_in_flight = max_in_flight or workers * 2
+        chunks = [files[start:start + chunk_size] for start in range(0, len(files), chunk_size)]
+        
         success_count = 0
+        self.defer_commit = True
         
-        for filename in os.listdir(directory):
-            if filename.endswith('.json'):
-                filepath = os.path.join(directory, filename)
-                result = self.process_file(filepath, save_to_db)
-                if result:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                # Results are loaded in submission order, keeping the files' chronological order
+                in_flight = deque()  # (future, chunk of files)
+                for chunk in chunks:
+                    if len(in_flight) >= max_in_flight:
+                        success_count += self._load_results(*in_flight.popleft(), save_to_db, incremental)
+                    in_flight.append((pool.submit(_transform_files, [path for path, _, _, _ in chunk]), chunk))
+                
+                while in_flight:
+                    success_count += self._load_results(*in_flight.popleft(), save_to_db, incremental)
+        finally:
+            self.defer_commit = False
+            if save_to_db:
+                self.flush()
+        
+        return success_count
+    
+    def _load_results(self, future, chunk, save_to_db, incremental):
+        """Buffer the records of a worker task once it finishes, flushing full batches"""
+        try:
+            results = future.result()
+        except Exception as e:
+            logger.error(f"ETL worker task failed: {str(e)}")
+            return 0
+            
+        success_count = 0
+        for (path, size, mtime, previous_hash), (record, content_hash) in zip(chunk, results):
+            if incremental:
+                if self._queue_file(record, (path, size, mtime, content_hash), previous_hash):
                     success_count += 1
+            elif record:
+                success_count += 1
+                if save_to_db:
+                    self.pending.append((record, None))
         
-        logger.info(f"Processed {success_count} files from {directory}")
+        if save_to_db and len(self.pending) >= self.batch_size:
+            self.flush(commit=False)
         return success_count
+
+
+    def process_segments(self, directory, start=None, end=None, save_to_db=True, incremental=True):
+        """
+        Stream records out of a segment store and bulk load them
+        
+        Args:
+            directory (str): Segment store directory (see segment_store)
+            start (str): Only load records from this ISO timestamp on
+            end (str): Only load records up to this ISO timestamp
+            save_to_db (bool): Whether to save to database
+            incremental (bool): Skip sealed segments already loaded, according to
+                the etl_manifest table (sealed segments never change)
+            
+        Returns:
+            int: Number of successfully processed records
+        """
+        if not os.path.isdir(directory):
+            logger.error(f"Not a valid directory: {directory}")
+            return 0
+        
+        incremental = incremental and save_to_db
+        manifest = get_manifest(self._get_db_connection(), directory) if incremental else {}
+        
+        success_count = 0
+        self.defer_commit = True
+        
+        try:
+            for path in list_segments(directory, start, end):
+                path = os.path.abspath(path)
+                stat = os.stat(path)
+                entry = (path, stat.st_size, stat.st_mtime, None)
+                if path in manifest and manifest[path][:2] == entry[1:3]:
+                    continue
+                    
+                records = read_segment(path, start, end)
+                while True:
+                    chunk = list(islice(records, self.TRANSFORM_CHUNK))
+                    if not chunk:
+                        break
+                    transformed_records = self.process_raw_batch(chunk, save_to_db)
+                    success_count += sum(record is not None for record in transformed_records)
+                
+                # Marked loaded in the batch carrying the segment's last records
+                if incremental and start is None and end is None:
+                    self.pending.append((None, entry))
+        finally:
+            self.defer_commit = False
+            if save_to_db:
+                self.flush()
+        
+        logger.info(f"Processed {success_count} records from segments in {directory}")
+        return success_count
+
+
+# Transformer used by each process of the parallel ingestion pool
+_worker_etl = None
+
+
+def _init_worker():
+    """Process pool initializer: one ProductETL (without a database connection) per worker"""
+    global _worker_etl
+    _worker_etl = ProductETL()
+
+
+def _read_and_transform(etl, filepath):
+    """
+    Read and transform one JSON snapshot
     
+    Returns:
+        tuple: (transformed record or None, SHA-256 of the file or None if it could not be read)
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            content = f.read()
+    except OSError as e:
+        logger.error(f"Error reading file {filepath}: {str(e)}")
+        return None, None
+    
+    content_hash = hashlib.sha256(content).hexdigest()
+    try:
+        return etl.transform_product_data(_loads(content)), content_hash
+    except Exception as e:
+        logger.error(f"Error processing file {filepath}: {str(e)}")
+        return None, content_hash
+
+
+def _transform_files(filepaths):
+    """
+    Read and transform a chunk of JSON snapshots in a worker process
+    
+    Args:
+        filepaths (list): JSON file paths
+        
+    Returns:
+        list: (transformed record or None, content hash) for each file
+    """
+    return [_read_and_transform(_worker_etl, filepath) for filepath in filepaths]
+
 if __name__ == "__main__":
-    etl = ProductETL()
+    etl = ProductETL(change_only=True)
     etl.process_directory("C:/Users/adeda/OneDrive/Desktop/Ecommerce_Scraping/data")
\ No newline at end of file
@@ -0,0 +1,227 @@
+import os
+import json
+import logging
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from database import get_db_connection
+
+logger = logging.getLogger("Export")
+
+# Export configuration
+EXPORT_DIR = os.path.join(os.getcwd(), "exports")
+STATE_FILE = "_export_state.json"
+
+# Column types of the exported files; strings are dictionary encoded
+PRODUCTS_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('product_id', pa.string()),
+    ('name', pa.string()),
+    ('brand', pa.dictionary(pa.int32(), pa.string())),
+    ('category', pa.dictionary(pa.int32(), pa.string())),
+    ('url', pa.string()),
+    ('created_at', pa.timestamp('us')),
+    ('updated_at', pa.timestamp('us')),
+])
+
+HISTORY_SCHEMAS = {
+    'prices': pa.schema([
+        ('id', pa.int64()),
+        ('product_row_id', pa.int64()),
+        ('product_id', pa.dictionary(pa.int32(), pa.string())),
+        ('current_price', pa.float64()),
+        ('original_price', pa.float64()),
+        ('discount_percentage', pa.float64()),
+        ('in_stock', pa.bool_()),
+        ('timestamp', pa.timestamp('us')),
+        ('last_seen', pa.timestamp('us')),
+    ]),
+    'reviews': pa.schema([
+        ('id', pa.int64()),
+        ('product_row_id', pa.int64()),
+        ('product_id', pa.dictionary(pa.int32(), pa.string())),
+        ('rating', pa.float64()),
+        ('review_count', pa.int64()),
+        ('timestamp', pa.timestamp('us')),
+        ('last_seen', pa.timestamp('us')),
+    ]),
+}
+
+
+class ParquetExporter:
+    """Incremental export of the database to partitioned Parquet files.
+
+    Products are written to products/retailer=<retailer>/ and the price and
+    review history to <table>/retailer=<retailer>/date=<YYYY-MM-DD>/, one file
+    per partition, in the hive layout pandas and Arrow datasets understand.
+    A state file remembers how far the history was exported, so each run only
+    rewrites the partitions that received new rows (or whose change-only rows
+    had their last_seen extended).
+    """
+
+    def __init__(self, db_connection=None, output_dir=EXPORT_DIR, compression='zstd'):
+        """
+        Args:
+            db_connection: Database connection, established lazily if not given
+            output_dir (str): Root directory of the dataset
+            compression (str): Parquet compression codec
+        """
+        self.db_connection = db_connection
+        self.output_dir = output_dir
+        self.compression = compression
+        self.state_path = os.path.join(output_dir, STATE_FILE)
+
+    def _get_db_connection(self):
+        if not self.db_connection:
+            self.db_connection = get_db_connection()
+        return self.db_connection
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def _save_state(self, state):
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    def _write_partition(self, frame, schema, *partition):
+        """
+        Write one partition file, replacing the previous one atomically
+
+        Args:
+            frame (DataFrame): Rows of the partition, without the partition columns
+            schema (pyarrow.Schema): Column types
+            partition (str): Path parts, e.g. 'prices', 'retailer=Amazon', 'date=2024-05-01'
+        """
+        directory = os.path.join(self.output_dir, *partition)
+        os.makedirs(directory, exist_ok=True)
+
+        table = pa.Table.from_pandas(frame[schema.names], schema=schema, preserve_index=False)
+        path = os.path.join(directory, 'part-0.parquet')
+        temp_path = path + '.tmp'
+        pq.write_table(table, temp_path, compression=self.compression, use_dictionary=True)
+        os.replace(temp_path, path)
+
+    def export(self):
+        """
+        Export everything that changed since the last run
+
+        Returns:
+            dict: Table name -> number of partitions written
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        state = self._load_state()
+
+        written = {'products': self.export_products(state)}
+        for table in HISTORY_SCHEMAS:
+            written[table] = self.export_history(table, state)
+
+        self._save_state(state)
+        logger.info(f"Exported to {self.output_dir}: {written}")
+        return written
+
+    def export_products(self, state):
+        """
+        Rewrite the products partition of every retailer whose products changed
+
+        Args:
+            state (dict): Export state, updated in place
+
+        Returns:
+            int: Number of partitions written
+        """
+        conn = self._get_db_connection()
+        signatures = state.setdefault('products', {})
+
+        changed = []
+        for retailer, count, max_id, max_updated in conn.execute(
+            "SELECT coalesce(retailer, 'unknown'), count(*), max(id), max(updated_at) FROM products GROUP BY 1"
+        ).fetchall():
+            signature = [count, max_id, max_updated]
+            if signatures.get(retailer) != signature:
+                changed.append(retailer)
+                signatures[retailer] = signature
+
+        for retailer in changed:
+            frame = pd.read_sql_query(
+                "SELECT * FROM products WHERE coalesce(retailer, 'unknown') = ? ORDER BY id",
+                conn,
+                params=(retailer,)
+            )
+            for column in ('created_at', 'updated_at'):
+                frame[column] = pd.to_datetime(frame[column], format='ISO8601')
+            self._write_partition(frame, PRODUCTS_SCHEMA, 'products', f'retailer={retailer}')
+
+        return len(changed)
+
+    def export_history(self, table, state):
+        """
+        Rewrite the retailer/date partitions of a history table that received changes
+
+        A partition is dirty when it holds rows added since the last export, or
+        rows whose last_seen moved past the newest last_seen exported before.
+
+        Args:
+            table (str): 'prices' or 'reviews'
+            state (dict): Export state, updated in place
+
+        Returns:
+            int: Number of partitions written
+        """
+        conn = self._get_db_connection()
+        table_state = state.setdefault(table, {'last_id': 0, 'last_seen': ''})
+        schema = HISTORY_SCHEMAS[table]
+
+        # Taken first: rows written while exporting are picked up by the next run
+        max_id, max_last_seen = conn.execute(
+            f"SELECT max(id), max(coalesce(last_seen, timestamp)) FROM {table}"
+        ).fetchone()
+
+        dirty = {tuple(row) for row in conn.execute(
+            f"""
+            SELECT DISTINCT coalesce(p.retailer, 'unknown'), substr(h.timestamp, 1, 10)
+            FROM {table} h JOIN products p ON p.id = h.product_id
+            WHERE h.id > ? OR coalesce(h.last_seen, h.timestamp) > ?
+            """,
+            (table_state['last_id'], table_state['last_seen'])
+        )}
+        if not dirty:
+            return 0
+
+        dates = sorted({date for _, date in dirty})
+        value_columns = [name for name in schema.names if name not in ('id', 'product_row_id', 'product_id', 'last_seen')]
+        frame = pd.read_sql_query(
+            f"""
+            SELECT h.id, h.product_id AS product_row_id, p.product_id,
+                   {", ".join(f"h.{column}" for column in value_columns)},
+                   coalesce(h.last_seen, h.timestamp) AS last_seen,
+                   coalesce(p.retailer, 'unknown') AS retailer, substr(h.timestamp, 1, 10) AS date
+            FROM {table} h JOIN products p ON p.id = h.product_id
+            WHERE substr(h.timestamp, 1, 10) IN ({", ".join("?" for _ in dates)})
+            ORDER BY h.product_id, h.timestamp
+            """,
+            conn,
+            params=dates
+        )
+        for column in ('timestamp', 'last_seen'):
+            frame[column] = pd.to_datetime(frame[column], format='ISO8601')
+        if 'in_stock' in frame:
+            frame['in_stock'] = frame['in_stock'].astype('boolean')
+
+        written = 0
+        for (retailer, date), partition in frame.groupby(['retailer', 'date'], sort=False):
+            if (retailer, date) in dirty:
+                self._write_partition(partition, schema, table, f'retailer={retailer}', f'date={date}')
+                written += 1
+
+        table_state['last_id'] = max_id or 0
+        table_state['last_seen'] = max_last_seen or ''
+        return written
+
+
+if __name__ == "__main__":
+    ParquetExporter().export()
@@ -9,9 +9,22 @@ from scrapers.walmart_scraper import WalmartScraper
 from scrapers.newegg_scraper import NeweggScraper
 from scrapers.target_scraper import TargetScraper
 from proxy_manager import ProxyManager
+from crawl_engine import CrawlEngine, RetailerJob
+from scrapers.structured_data import fast_path_stats
+from scrapers.parsers import partial_parse_stats
+from segment_store import SegmentWriter
+from pipeline import StreamingPipeline
+from etl import ProductETL
+from database import get_connection_manager
 
 # Define where to save JSON files
 DATA_DIR = os.path.join(os.getcwd(), "data")
+# Scraped products are appended to compressed NDJSON segments here (sealed every cycle)
+SEGMENTS_DIR = os.path.join(DATA_DIR, "segments")
+# Load products into the database as they are scraped instead of leaving them for etl.py
+STREAM_TO_DB = True
+# Keep the raw records in SEGMENTS_DIR as well when streaming
+ARCHIVE_RAW = True
 
 def main():
     # Setup logging
@@ -30,8 +43,20 @@ def main():
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
 
-    # Initialize ProxyManager
+    # Initialize ProxyManager; proxies are checked in the background, give the first check a head start
     proxy_manager = ProxyManager()
+    if not proxy_manager.wait_ready(timeout=120):
+        logger.warning("Proxy check still running, starting with the proxies verified so far")
+
+    # Shared by all scrapers; each cycle's products end up in one sealed segment
+    # and, when streaming, in the database seconds after they are scraped
+    archive = SegmentWriter(SEGMENTS_DIR) if ARCHIVE_RAW or not STREAM_TO_DB else None
+    if STREAM_TO_DB:
+        # Unchanged snapshots only extend the latest history row instead of adding one
+        etl = ProductETL(change_only=True, connection_manager=get_connection_manager())
+        sink = StreamingPipeline(etl=etl, archive=archive).start()
+    else:
+        sink = archive
 
     # Product URLs
     product_urls = {
@@ -60,42 +85,53 @@ def main():
         ]
     }
 
-    while True:
-        try:
-            # ---- Amazon (Uses BaseScraper - session managed internally)
-            amazon_scraper = AmazonScraper()
-            for url in product_urls['amazon']:
-                amazon_scraper.get_product(url)  # get_product handles fetch + save
+    try:
+        while True:
+            try:
+                # ---- Amazon (Uses BaseScraper - session managed internally)
+                amazon_scraper = AmazonScraper(sink=sink)
+
+                # ---- Walmart
+                walmart_scraper = WalmartScraper(proxy_manager.get_session(), sink=sink)
 
-            # ---- Walmart
-            walmart_session = proxy_manager.get_session()
-            walmart_scraper = WalmartScraper(walmart_session)
-            for url in product_urls['walmart']:
-                walmart_scraper.fetch_product(url)
+                # ---- Newegg
+                newegg_scraper = NeweggScraper(proxy_manager.get_session(), sink=sink)
 
-            # ---- Newegg
-            newegg_session = proxy_manager.get_session()
-            newegg_scraper = NeweggScraper(newegg_session)
-            for url in product_urls['newegg']:
-                if random.random() < 0.3:
-                    newegg_session = proxy_manager.get_session()
-                    newegg_scraper.session = newegg_session
-                newegg_scraper.fetch_product(url)
+                # ---- Target
+                target_scraper = TargetScraper(proxy_manager.get_session(), sink=sink)
 
-            # ---- Target
-            target_session = proxy_manager.get_session()
-            target_scraper = TargetScraper(target_session)
-            for url in product_urls['target']:
-                target_scraper.fetch_product(url)
+                # All retailers run at the same time, each within its own concurrency cap
+                engine = CrawlEngine([
+                    RetailerJob('Amazon', amazon_scraper.fetch_product, product_urls['amazon']),
+                    RetailerJob('Walmart', walmart_scraper.fetch_product, product_urls['walmart']),
+                    RetailerJob('Newegg', newegg_scraper.fetch_product, product_urls['newegg']),
+                    RetailerJob('Target', target_scraper.fetch_product, product_urls['target']),
+                ])
+                results = engine.run()
+                for retailer, products in results.items():
+                    logger.info(f"{retailer}: scraped {len(products)} products")
+                logger.info(f"Structured data fast path: {fast_path_stats.summary()}")
+                logger.info(f"Partial parsing: {partial_parse_stats.summary()}")
+                logger.info(f"Proxy pool: {proxy_manager.summary()}")
+                sink.rotate()
+                if STREAM_TO_DB:
+                    logger.info(f"Streaming pipeline: {sink.stats()}")
 
-            # ---- Sleep before next cycle
-            sleep_time = random.uniform(3600, 4200)
-            logger.info(f"Scraping complete. Sleeping for {sleep_time/60:.1f} minutes")
-            time.sleep(sleep_time)
+                # ---- Sleep before next cycle
+                sleep_time = random.uniform(3600, 4200)
+                logger.info(f"Scraping complete. Sleeping for {sleep_time/60:.1f} minutes")
+                time.sleep(sleep_time)
 
-        except Exception as e:
-            logger.error(f"Unexpected error in main loop: {str(e)}")
-            time.sleep(300)  # wait 5 minutes before retry
+            except Exception as e:
+                logger.error(f"Unexpected error in main loop: {str(e)}")
+                time.sleep(300)  # wait 5 minutes before retry
+    finally:
+        # Load what is still queued, seal the open segment and stop the background threads
+        if sink is not None:
+            sink.close()
+        if STREAM_TO_DB:
+            get_connection_manager().close()
+        proxy_manager.close()
 
 if __name__ == "__main__":
     main()
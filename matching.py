@@ -0,0 +1,387 @@
+import re
+import zlib
+import hashlib
+import logging
+import unicodedata
+import numpy as np
+
+logger = logging.getLogger("Matching")
+
+# MinHash signature length and its split into LSH bands. Two products share a
+# band bucket with high probability once their token sets' Jaccard similarity
+# passes roughly (1 / LSH_BANDS) ** (1 / LSH_ROWS), about 0.5 here.
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+# Candidates whose estimated Jaccard similarity is below this are not matched
+MATCH_THRESHOLD = 0.5
+
+# Universal hash functions (a * x + b) mod p over 31-bit token hashes. The
+# seed is fixed: stored signatures are only comparable if it never changes.
+_PRIME = (1 << 31) - 1
+_random = np.random.RandomState(20240501)
+_A = _random.randint(1, _PRIME, size=NUM_PERM).astype(np.uint64)
+_B = _random.randint(0, _PRIME, size=NUM_PERM).astype(np.uint64)
+
+# Words that say nothing about which product a listing is
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'with', 'for', 'of', 'by', 'to', 'in', 'on',
+    'new', 'brand', 'edition', 'version', 'model', 'pack', 'count', 'ct', 'pc', 'pcs',
+}
+
+# Trailing words of company names, dropped from brands
+BRAND_SUFFIXES = {'inc', 'corp', 'corporation', 'co', 'company', 'ltd', 'llc', 'electronics', 'usa'}
+
+# Text retailers wrap brands in: Amazon's byline reads "Visit the Apple Store"
+# or "Brand: Apple", other listings "by Apple"
+BRAND_WRAPPER = re.compile(r'^(?:visit the (.+) store|brand\s*:\s*(.+)|by (.+))$')
+
+# Brands listed under different names by different retailers
+BRAND_ALIASES = {
+    'hewlett packard': 'hp',
+    'hewlett packard enterprise': 'hpe',
+}
+
+# Spellings of sizes and units that should become the same token ('65"', '65 in', '65-inch' -> '65in')
+UNIT_PATTERNS = (
+    (re.compile(r'(\d+(?:\.\d+)?)\s*(?:"|”|-?\s*inch(?:es)?\b|-?\s*in\b)'), r'\1in '),
+    (re.compile(r'(\d+(?:\.\d+)?)\s*-?\s*(gb|tb|mb|mp|hz|mah|oz|lbs?|ft|mm|cm|qt|w|v|k)\b'), r'\1\2'),
+)
+
+# Hyphenated model numbers are written both ways ('WH-1000XM5', 'WH1000XM5')
+MODEL_PATTERN = re.compile(r'\b[a-z0-9]+(?:-[a-z0-9]+)+\b')
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+
+
+def _fold(text):
+    """Lowercase text and strip accents and trademark signs"""
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+    return text.lower().replace('&', ' and ')
+
+
+def _join_model(match):
+    """Drop the hyphens of a hyphenated word that has digits in it"""
+    word = match.group()
+    return word.replace('-', '') if any(c.isdigit() for c in word) else word
+
+
+def normalize_brand(brand):
+    """
+    Reduce a brand to a comparable form: 'SAMSUNG Electronics, Inc.' -> 'samsung',
+    'Visit the Apple Store' -> 'apple'
+
+    Returns:
+        str: Normalized brand, '' when unknown
+    """
+    if not brand:
+        return ''
+    text = ' '.join(_fold(brand).split())
+    wrapped = BRAND_WRAPPER.match(text)
+    if wrapped:
+        text = next(group for group in wrapped.groups() if group)
+    tokens = TOKEN_PATTERN.findall(text)
+    while tokens and tokens[-1] in BRAND_SUFFIXES:
+        tokens.pop()
+    brand = ' '.join(tokens)
+    return BRAND_ALIASES.get(brand, brand)
+
+
+def normalize_name(name, brand=None):
+    """
+    Split a product name into the normalized tokens it is matched on
+
+    Sizes and units are written one way, stopwords are dropped and the brand's
+    tokens are added, so a listing that leaves the brand out of its title still
+    matches one that does not.
+
+    Args:
+        name (str): Product name
+        brand (str): Product brand, or None
+
+    Returns:
+        set: Tokens
+    """
+    text = _fold(name or '')
+    for pattern, replacement in UNIT_PATTERNS:
+        text = pattern.sub(replacement, text)
+    text = MODEL_PATTERN.sub(_join_model, text)
+    tokens = {token for token in TOKEN_PATTERN.findall(text) if token not in STOPWORDS}
+    brand = normalize_brand(brand)
+    if brand and tokens:
+        tokens.update(brand.split())
+    return tokens
+
+
+def minhash(tokens):
+    """
+    Compute the MinHash signature of a token set
+
+    Returns:
+        numpy.ndarray: NUM_PERM uint32 values
+    """
+    hashes = np.array([zlib.crc32(token.encode('utf-8')) & _PRIME for token in tokens], dtype=np.uint64)
+    return ((np.outer(hashes, _A) + _B) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the token sets behind two signatures"""
+    return float(np.count_nonzero(signature == other)) / NUM_PERM
+
+
+def _buckets(signature):
+    """The LSH (band, bucket) pairs of a signature"""
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes(), digest_size=8).digest(),
+            'little',
+            signed=True
+        ))
+        for band in range(LSH_BANDS)
+    ]
+
+
+def _conflicting_models(tokens, other):
+    """
+    Whether two token sets carry different model numbers or sizes
+
+    Tokens with digits ('s24', '128gb', '65in') tell variants apart, so two
+    listings that each have one the other lacks are different products even
+    when the rest of their names agree.
+    """
+    numbers = {token for token in tokens if any(c.isdigit() for c in token)}
+    other_numbers = {token for token in other if any(c.isdigit() for c in token)}
+    return bool(numbers - other_numbers) and bool(other_numbers - numbers)
+
+
+def _compatible(brand, tokens, other_brand, other_tokens):
+    """Whether two listings may be the same product: no brand or model number disagreement"""
+    if brand and other_brand and brand != other_brand:
+        return False
+    return not _conflicting_models(tokens, other_tokens)
+
+
+def _group_members(conn, group_ids):
+    """
+    Get the brand and tokens of every member of some match groups
+
+    Returns:
+        dict: Group id -> list of (brand, token set)
+    """
+    group_ids = list(group_ids)
+    members = {group_id: [] for group_id in group_ids}
+    for start in range(0, len(group_ids), 500):
+        chunk = group_ids[start:start + 500]
+        rows = conn.execute(
+            f"""
+            SELECT m.group_id, s.brand, s.tokens
+            FROM product_matches m
+            JOIN product_signatures s ON s.product_id = m.product_id
+            WHERE m.group_id IN ({', '.join('?' for _ in chunk)})
+            """,
+            chunk
+        )
+        for group_id, brand, tokens in rows:
+            members[group_id].append((brand, set(tokens.split())))
+    return members
+
+
+def _remove(conn, product_id):
+    """Take a product out of the LSH index and its match group"""
+    row = conn.execute(
+        "SELECT signature FROM product_signatures WHERE product_id = ?", (product_id,)
+    ).fetchone()
+    if row is not None and row[0] is not None:
+        conn.executemany(
+            "DELETE FROM product_lsh WHERE band = ? AND bucket = ? AND product_id = ?",
+            [(band, bucket, product_id) for band, bucket in _buckets(np.frombuffer(row[0], dtype=np.uint32))]
+        )
+    conn.execute("DELETE FROM product_signatures WHERE product_id = ?", (product_id,))
+
+    row = conn.execute("SELECT group_id FROM product_matches WHERE product_id = ?", (product_id,)).fetchone()
+    conn.execute("DELETE FROM product_matches WHERE product_id = ?", (product_id,))
+    if row is not None and row[0] == product_id:
+        # The group was named after this product: rename it after its smallest remaining member
+        conn.execute(
+            """
+            UPDATE product_matches SET group_id = (
+                SELECT min(product_id) FROM product_matches WHERE group_id = ?
+            ) WHERE group_id = ?
+            """,
+            (product_id, product_id)
+        )
+
+
+def _index(conn, product_id, brand, tokens):
+    """Add a product to the LSH index and join it to the groups of the products it matches"""
+    key = ' '.join(sorted(tokens))
+    if not tokens:
+        conn.execute(
+            "INSERT INTO product_signatures (product_id, brand, tokens, signature) VALUES (?, ?, ?, NULL)",
+            (product_id, brand, key)
+        )
+        conn.execute(
+            "INSERT INTO product_matches (product_id, group_id, similarity) VALUES (?, ?, NULL)",
+            (product_id, product_id)
+        )
+        return
+
+    signature = minhash(tokens)
+    buckets = _buckets(signature)
+
+    candidates = conn.execute(
+        f"""
+        WITH buckets (band, bucket) AS (VALUES {", ".join("(?, ?)" for _ in buckets)})
+        SELECT DISTINCT s.product_id, s.brand, s.tokens, s.signature, m.group_id, m.similarity
+        FROM buckets b
+        JOIN product_lsh l ON l.band = b.band AND l.bucket = b.bucket
+        JOIN product_signatures s ON s.product_id = l.product_id
+        JOIN product_matches m ON m.product_id = s.product_id
+        """,
+        [value for bucket in buckets for value in bucket]
+    ).fetchall()
+
+    # Matching candidates with their scores, by group
+    matched = {}
+    for other_id, other_brand, other_key, other_signature, group_id, other_best in candidates:
+        if not _compatible(brand, tokens, other_brand, set(other_key.split())):
+            continue
+        score = similarity(signature, np.frombuffer(other_signature, dtype=np.uint32))
+        if score < MATCH_THRESHOLD:
+            continue
+        matched.setdefault(group_id, []).append((score, other_id, other_best))
+
+    # Similarity is not transitive: a group is only joined, and groups are only
+    # merged, when no two of the listings that end up together conflict. Groups
+    # are taken best match first, so a conflict keeps the closest group.
+    members = _group_members(conn, matched)
+    joined = []
+    together = [(brand, tokens)]
+    for group_id in sorted(matched, key=lambda group_id: -max(match[0] for match in matched[group_id])):
+        if all(
+            _compatible(member_brand, member_tokens, other_brand, other_tokens)
+            for member_brand, member_tokens in members[group_id]
+            for other_brand, other_tokens in together
+        ):
+            joined.append(group_id)
+            together.extend(members[group_id])
+
+    best = None
+    improved = []
+    for group_id in joined:
+        for score, other_id, other_best in matched[group_id]:
+            best = score if best is None else max(best, score)
+            if other_best is None or score > other_best:
+                improved.append((score, other_id))
+
+    group_id = min([*joined, product_id])
+    if joined:
+        conn.execute(
+            f"UPDATE product_matches SET group_id = ? WHERE group_id IN ({', '.join('?' for _ in joined)})",
+            [group_id, *joined]
+        )
+        conn.executemany("UPDATE product_matches SET similarity = ? WHERE product_id = ?", improved)
+
+    conn.execute(
+        "INSERT INTO product_signatures (product_id, brand, tokens, signature) VALUES (?, ?, ?, ?)",
+        (product_id, brand, key, signature.tobytes())
+    )
+    conn.executemany(
+        "INSERT INTO product_lsh (band, bucket, product_id) VALUES (?, ?, ?)",
+        [(band, bucket, product_id) for band, bucket in buckets]
+    )
+    conn.execute(
+        "INSERT INTO product_matches (product_id, group_id, similarity) VALUES (?, ?, ?)",
+        (product_id, group_id, best)
+    )
+
+
+def update_matches(conn, product_ids):
+    """
+    Index products for matching and put them into match groups
+
+    Each product is looked up in the LSH index, so only products sharing a
+    band bucket are compared, never the whole catalogue. Products whose
+    normalized name and brand did not change since they were indexed are
+    skipped, so calling this for every product of a batch is cheap. Called by
+    the insert functions inside their transaction. Does not commit.
+
+    A product that matches products of several groups merges those groups,
+    unless that would put listings with different brands or model numbers
+    together: a product only joins groups none of whose members conflict with
+    it or with each other. A renamed product leaves its group, but the group
+    is not split: run rebuild_matches to recompute the groups from scratch.
+
+    Args:
+        conn: Database connection (or cursor)
+        product_ids (iterable): Product row ids
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    for start in range(0, len(product_ids), 500):
+        chunk = product_ids[start:start + 500]
+        placeholders = ', '.join('?' for _ in chunk)
+        products = conn.execute(
+            f"SELECT id, name, brand FROM products WHERE id IN ({placeholders})", chunk
+        ).fetchall()
+        indexed = {
+            row[0]: (row[1], row[2]) for row in conn.execute(
+                f"SELECT product_id, brand, tokens FROM product_signatures WHERE product_id IN ({placeholders})", chunk
+            )
+        }
+        names = {row[0]: (row[1], row[2]) for row in products}
+
+        for product_id in chunk:
+            if product_id not in names:
+                continue
+            name, brand = names[product_id]
+            brand = normalize_brand(brand)
+            tokens = normalize_name(name, brand)
+            if indexed.get(product_id) == (brand, ' '.join(sorted(tokens))):
+                continue
+            if product_id in indexed:
+                _remove(conn, product_id)
+            _index(conn, product_id, brand, tokens)
+
+
+def rebuild_matches(conn):
+    """
+    Recompute the matching index and every match group from the products table. Does not commit.
+
+    Args:
+        conn: Database connection
+    """
+    for table in ('product_lsh', 'product_signatures', 'product_matches'):
+        conn.execute(f"DELETE FROM {table}")
+    update_matches(conn, [row[0] for row in conn.execute("SELECT id FROM products ORDER BY id")])
+
+
+def get_matches(conn, product_id):
+    """
+    Get the other listings of the same product, cheapest first
+
+    Args:
+        conn: Database connection
+        product_id (int): Product row id
+
+    Returns:
+        list: products rows of the other group members, with similarity,
+        current_price and in_stock from product_latest
+    """
+    try:
+        return conn.execute(
+            """
+            SELECT p.*, g.similarity, l.current_price, l.in_stock
+            FROM product_matches m
+            JOIN product_matches g ON g.group_id = m.group_id AND g.product_id != m.product_id
+            JOIN products p ON p.id = g.product_id
+            LEFT JOIN product_latest l ON l.product_id = p.id
+            WHERE m.product_id = ?
+            ORDER BY l.current_price IS NULL, l.current_price
+            """,
+            (product_id,)
+        ).fetchall()
+
+    except Exception as e:
+        logger.error(f"Error getting matches: {str(e)}")
+        return []
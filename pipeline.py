@@ -0,0 +1,130 @@
+import time
+import queue
+import logging
+import threading
+from etl import ProductETL
+from database import get_connection_manager
+
+logger = logging.getLogger("Pipeline")
+
+# Queue markers for the loader thread
+_FLUSH = object()
+_STOP = object()
+
+
+class StreamingPipeline:
+    """Loads scraped products into the database as they are scraped.
+
+    The pipeline is a scraper sink: `append` puts the product dict on a
+    bounded queue (blocking the scraper when the loader falls behind) and a
+    loader thread runs it through ProductETL's transform and batched loader.
+    Buffered records are committed once a batch fills up or `flush_interval`
+    seconds after the first of them arrived, so data is in the database
+    seconds after it was scraped. Raw records can optionally be archived to
+    a SegmentWriter as well.
+    """
+
+    def __init__(self, etl=None, max_queue=1000, flush_interval=5.0, archive=None):
+        """
+        Args:
+            etl (ProductETL): Transformer/loader. Defaults to one that loads through
+                the process-wide ConnectionManager's writer thread, so streamed
+                writes never contend with other writers in the process. An ETL
+                with its own connection is used by the loader thread only, so
+                give it one opened with check_same_thread=False
+            max_queue (int): Records waiting for the loader before append blocks
+            flush_interval (float): Longest time a record waits in the batch buffer
+            archive (SegmentWriter): Also append raw records here, or None
+        """
+        self.etl = etl or ProductETL(connection_manager=get_connection_manager())
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.flush_interval = flush_interval
+        self.archive = archive
+        self.thread = None
+        self.lock = threading.Lock()
+
+        self.received = 0
+        self.loaded = 0
+        self.rejected = 0
+
+    def start(self):
+        """Start the loader thread; returns the pipeline so it can be chained"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='PipelineLoader', daemon=True)
+            self.thread.start()
+        return self
+
+    def append(self, record):
+        """Queue a scraped product for loading (scraper sink interface)"""
+        if self.archive is not None:
+            self.archive.append(record)
+        with self.lock:
+            self.received += 1
+        self.queue.put(record)
+
+    def flush(self):
+        """Ask the loader to commit whatever it has buffered"""
+        self.queue.put(_FLUSH)
+
+    def rotate(self):
+        """End of a scraping cycle: commit buffered records and seal the archive segment"""
+        self.flush()
+        if self.archive is not None:
+            self.archive.rotate()
+
+    def close(self):
+        """Load everything still queued, then stop the loader thread"""
+        if self.thread is not None:
+            self.queue.put(_STOP)
+            self.thread.join()
+            self.thread = None
+        if self.archive is not None:
+            self.archive.close()
+
+    def stats(self):
+        """
+        Returns:
+            dict: received, loaded, rejected and queued record counts
+        """
+        return {
+            'received': self.received,
+            'loaded': self.loaded,
+            'rejected': self.rejected,
+            'queued': self.queue.qsize(),
+        }
+
+    def _run(self):
+        """Loader thread: transform queued records and bulk load them"""
+        oldest = None  # When the oldest buffered record arrived
+
+        while True:
+            timeout = None if oldest is None else max(0.0, oldest + self.flush_interval - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _FLUSH
+
+            if item is _FLUSH or item is _STOP:
+                self._flush()
+                oldest = None
+                if item is _STOP:
+                    break
+                continue
+
+            transformed = self.etl.transform_product_data(item)
+            if transformed is None:
+                self.rejected += 1
+                continue
+
+            if self.etl.buffer(transformed):
+                self._flush()
+                oldest = None
+            elif oldest is None:
+                oldest = time.monotonic()
+
+    def _flush(self):
+        """Commit the buffered records (loader thread)"""
+        try:
+            self.loaded += self.etl.flush()
+        except Exception as e:
+            logger.error(f"Error flushing streamed records: {str(e)}")
@@ -1,52 +1,447 @@
+import time
+import random
 import logging
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
+
+# Responses that mean the target refused the proxy rather than the request
+BLOCK_STATUS_CODES = (403, 407, 429, 503)
+# Markers of anti-bot pages, looked for at the start of 200 responses
+BLOCK_MARKERS = (b'captcha', b'robot or human', b'are you a robot', b'access denied')
+BLOCK_SCAN_BYTES = 20000
+
+# Candidate proxies are checked by fetching this URL through them
+CHECK_URL = 'https://httpbin.org/ip'
+# Free proxy list used when no proxies or sources are given
+FREE_PROXY_LIST_URL = 'https://www.proxy-list.download/api/v1/get?type=https'
+
+# Failures that happen before the request reaches the target, so it is safe to retry on another proxy
+PROXY_ERRORS = (requests.exceptions.ProxyError, requests.exceptions.ConnectTimeout, requests.exceptions.SSLError)
+
+
+class NoProxyAvailable(requests.exceptions.ProxyError):
+    """The pool is empty or every proxy is quarantined, and direct requests are not allowed"""
+
+
+def fetch_free_proxies(timeout=15):
+    """
+    Download candidate proxies from the free proxy list
+
+    The list has HTTP proxies that tunnel HTTPS (CONNECT), so the proxy URLs
+    use the http scheme.
+
+    Returns:
+        list: Proxy URLs
+    """
+    response = requests.get(FREE_PROXY_LIST_URL, timeout=timeout)
+    response.raise_for_status()
+    return [f"http://{line.strip()}" for line in response.text.splitlines() if line.strip()]
+
+
+class ProxyHealth:
+    """Health statistics of one proxy, with a circuit breaker.
+
+    Success rate, latency and block rate are exponentially weighted moving
+    averages, so recent requests count most. After `failure_threshold`
+    failures in a row the breaker opens and the proxy is quarantined for a
+    cool-down that doubles with every trip. Once the cool-down is over the
+    proxy is half-open: it is handed out again, and its next result either
+    closes the breaker or quarantines it for longer.
+    """
+
+    def __init__(self, success_rate=0.5, latency=2.0):
+        """
+        Args:
+            success_rate (float): Prior success rate of a proxy not used yet
+            latency (float): Prior latency in seconds of a proxy not used yet
+        """
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.blocks = 0
+        self.success_rate = success_rate
+        self.latency = latency
+        self.block_rate = 0.0
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.quarantined_until = 0.0
+
+    def available(self, now):
+        return now >= self.quarantined_until
+
+    def weight(self):
+        """Selection weight: successful, unblocked requests per second of latency"""
+        return max(self.success_rate * (1.0 - self.block_rate), 0.01) / max(self.latency, 0.05)
+
+    def record(self, success, latency, blocked, now, alpha, failure_threshold, base_cooldown, max_cooldown):
+        """
+        Update the averages and the breaker with the outcome of one request
+
+        Returns:
+            bool: True when this result quarantined the proxy
+        """
+        self.requests += 1
+        ok = success and not blocked
+        self.success_rate += alpha * (float(ok) - self.success_rate)
+        self.block_rate += alpha * (float(blocked) - self.block_rate)
+        if latency is not None and success:
+            self.latency += alpha * (latency - self.latency)
+
+        if ok:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.trips = 0
+            return False
+
+        if blocked:
+            self.blocks += 1
+        else:
+            self.failures += 1
+        self.consecutive_failures += 1
+
+        # A half-open proxy (one that has been quarantined before) goes straight back on failure
+        if self.consecutive_failures >= failure_threshold or (self.trips and self.quarantined_until):
+            self.quarantined_until = now + min(max_cooldown, base_cooldown * 2 ** self.trips)
+            self.trips += 1
+            self.consecutive_failures = 0
+            return True
+        return False
+
+    def state(self, now):
+        if not self.available(now):
+            return 'quarantined'
+        return 'probing' if self.trips else 'healthy'
+
+
+class ProxySession(requests.Session):
+    """requests session that sends each request through a proxy picked from the pool.
+
+    The outcome of every request (latency, error, block) is reported back to
+    the ProxyManager, and a request whose proxy fails before reaching the
+    target is retried through another proxy.
+
+    When no proxy can be picked, the request fails with NoProxyAvailable
+    rather than going out from this machine's own IP, unless `allow_direct`
+    is set.
+    """
+
+    def __init__(self, manager, sticky=False, max_attempts=2, allow_direct=False, ready_timeout=30):
+        """
+        Args:
+            manager (ProxyManager): Pool to pick proxies from and report to
+            sticky (bool): Keep using the same proxy while it stays healthy,
+                for sites that tie cookies to an IP
+            max_attempts (int): Proxies tried per request when they fail to connect
+            allow_direct (bool): Send requests without a proxy when none is available
+            ready_timeout (float): Seconds to wait for the manager's first refresh
+                when the pool is still empty
+        """
+        super().__init__()
+        self.manager = manager
+        self.sticky = sticky
+        self.max_attempts = max(1, max_attempts)
+        self.allow_direct = allow_direct
+        self.ready_timeout = ready_timeout
+        self.proxy = None
+
+    def _pick(self, tried):
+        if self.sticky and self.proxy and self.manager.is_available(self.proxy):
+            return self.proxy
+        self.proxy = self.manager.get_proxy(exclude=tried)
+        return self.proxy
+
+    def request(self, method, url, *args, **kwargs):
+        # Callers passing their own proxies bypass the pool
+        if kwargs.get('proxies'):
+            return super().request(method, url, *args, **kwargs)
+
+        tried = set()
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            proxy = self._pick(tried)
+            if proxy is None and not tried and not self.manager.ready.is_set():
+                # The first background refresh has not promoted any proxy yet
+                self.manager.wait_ready(self.ready_timeout)
+                proxy = self._pick(tried)
+            if proxy is None:
+                if last_error is not None:
+                    raise last_error
+                if not self.allow_direct:
+                    raise NoProxyAvailable(f"No proxy available for {url}")
+                self.manager.logger.warning(f"No proxy available, sending {method} {url} without a proxy")
+                return super().request(method, url, *args, **kwargs)
+            tried.add(proxy)
+
+            kwargs['proxies'] = {'http': proxy, 'https': proxy}
+            started = self.manager.clock()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except PROXY_ERRORS as e:
+                self.manager.report(proxy, False)
+                self.proxy = None
+                if attempt == self.max_attempts:
+                    raise
+                last_error = e
+                continue
+            except requests.exceptions.RequestException:
+                self.manager.report(proxy, False)
+                self.proxy = None
+                raise
+
+            # A streamed body is left for the caller to read, so only its status is checked
+            blocked = self.manager.is_blocked(response, read_body=not kwargs.get('stream'))
+            self.manager.report(proxy, True, self.manager.clock() - started, blocked=blocked)
+            if blocked:
+                self.proxy = None
+            return response
+
+
 class ProxyManager:
-    """Handles proxy rotation to avoid IP blocks."""
-    
-    def __init__(self, proxy_list=None):
-        """Initialize with a list of proxies or use free proxy services."""
+    """Handles proxy rotation to avoid IP blocks.
+
+    Proxies are picked at random, weighted by their health (success rate and
+    block rate over latency), so fast, working proxies carry most of the
+    traffic. Proxies that keep failing are quarantined with a circuit-breaker
+    cool-down instead of being handed out again.
+
+    Candidate proxies from the sources are checked in the background: a pool
+    of threads fetches `check_url` through each of them, and only those that
+    answer are promoted into the pool. The check is repeated every
+    `refresh_interval` seconds, so construction never blocks on the network
+    and scrapers keep using the current pool while it is refreshed.
+    """
+
+    def __init__(self, proxy_list=None, sources=None, check_url=CHECK_URL, check_timeout=5, check_workers=32,
+                 refresh_interval=1800, auto_refresh=True, alpha=0.3, failure_threshold=3, base_cooldown=60,
+                 max_cooldown=1800, clock=time.monotonic):
+        """
+        Initialize with a list of proxies or use free proxy services.
+
+        Args:
+            proxy_list (list): Proxy URLs used as given, without being checked
+            sources (list): Callables returning candidate proxy URLs, defaults to
+                the free proxy list when no proxy_list is given
+            check_url (str): URL fetched through a candidate to verify it
+            check_timeout (float): Seconds a candidate has to answer the check
+            check_workers (int): Candidates checked at the same time
+            refresh_interval (float): Seconds between background refreshes
+            auto_refresh (bool): Refresh in a background thread; otherwise call refresh_proxies()
+            alpha (float): Weight of the newest result in the moving averages
+            failure_threshold (int): Failures in a row that quarantine a proxy
+            base_cooldown (float): Seconds of the first quarantine, doubled on every further trip
+            max_cooldown (float): Longest quarantine in seconds
+            clock (callable): Returns the current time in seconds, for latencies and cool-downs
+        """
         self.logger = logging.getLogger('ProxyManager')
-        
-        # Default proxy list if none provided
-        self.proxy_list = proxy_list or []
-        self.current_index = 0
-        
-        # If no proxies provided, try to fetch free proxies
-        if not self.proxy_list:
-            self.refresh_proxies()
-    
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self.check_url = check_url
+        self.check_timeout = check_timeout
+        self.check_workers = check_workers
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.health = {}
+
+        # Proxies given by the caller stay in the pool whatever the checks say
+        self.pinned = list(dict.fromkeys(proxy_list or []))
+        self.proxy_list = []
+        self.set_proxies(self.pinned)
+
+        # If no proxies provided, find free ones in the background
+        if sources is None:
+            sources = [] if self.pinned else [fetch_free_proxies]
+        self.sources = list(sources)
+
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        if not self.sources:
+            self.ready.set()
+        elif auto_refresh:
+            self.thread = threading.Thread(target=self._refresh_loop, name='ProxyRefresh', daemon=True)
+            self.thread.start()
+
+    def set_proxies(self, proxy_list):
+        """Replace the pool, keeping the statistics of proxies that stay in it."""
+        with self.lock:
+            self.proxy_list = list(dict.fromkeys(proxy_list))
+            self.health = {proxy: self.health.get(proxy) or ProxyHealth() for proxy in self.proxy_list}
+
     def refresh_proxies(self):
-        """Fetch fresh proxies from free proxy services."""
+        """
+        Fetch candidates from the sources, check them concurrently and promote the ones that work.
+
+        Proxies already in the pool are checked again with the new candidates,
+        and those that stop answering are dropped; pinned proxies always stay.
+        The health statistics of proxies that stay are kept.
+
+        Returns:
+            int: Number of verified proxies
+        """
+        candidates = []
+        for source in self.sources:
+            try:
+                candidates.extend(source())
+            except Exception as e:
+                self.logger.error(f"Error fetching proxies from {getattr(source, '__name__', source)}: {str(e)}")
+
+        with self.lock:
+            candidates = [proxy for proxy in dict.fromkeys(candidates + self.proxy_list) if proxy not in self.pinned]
+        if not candidates:
+            self.logger.warning("No candidate proxies to check")
+            return 0
+
+        with ThreadPoolExecutor(max_workers=min(self.check_workers, len(candidates)), thread_name_prefix='proxy-check') as executor:
+            latencies = dict(zip(candidates, executor.map(self.check_proxy, candidates)))
+        verified = {proxy: latency for proxy, latency in latencies.items() if latency is not None}
+
+        with self.lock:
+            self.proxy_list = self.pinned + [proxy for proxy in verified if proxy not in self.pinned]
+            self.health = {
+                proxy: self.health.get(proxy) or ProxyHealth(latency=verified.get(proxy, 2.0))
+                for proxy in self.proxy_list
+            }
+        self.logger.info(f"Verified {len(verified)} of {len(candidates)} candidate proxies")
+        return len(verified)
+
+    def check_proxy(self, proxy):
+        """
+        Fetch the check URL through a proxy.
+
+        Returns:
+            float: Seconds the check took, or None if the proxy did not answer with a 200
+        """
+        started = self.clock()
         try:
-            # This is a simple example - in a real application, 
-            # you would use a reliable proxy provider
-            response = requests.get('https://www.proxy-list.download/api/v1/get?type=https')
+            response = requests.get(
+                self.check_url,
+                proxies={'http': proxy, 'https': proxy},
+                timeout=self.check_timeout
+            )
             if response.status_code == 200:
-                self.proxy_list = [f"https://{line}" for line in response.text.split('\r\n') if line]
-                self.logger.info(f"Loaded {len(self.proxy_list)} proxies")
-            else:
-                self.logger.warning("Failed to fetch proxy list")
-        except Exception as e:
-            self.logger.error(f"Error refreshing proxies: {str(e)}")
-    
-    def get_proxy(self):
-        """Get the next proxy from the rotation."""
-        if not self.proxy_list:
-            return None
-            
-        proxy = self.proxy_list[self.current_index]
-        self.current_index = (self.current_index + 1) % len(self.proxy_list)
-        return proxy
-    
-    def get_session(self):
-        """Create a requests session with the current proxy."""
-        session = requests.Session()
-        proxy = self.get_proxy()
-        
-        if proxy:
-            session.proxies = {
-                'http': proxy,
-                'https': proxy
+                return self.clock() - started
+        except requests.exceptions.RequestException:
+            pass
+        return None
+
+    def _refresh_loop(self):
+        """Background thread: refresh the pool now and then every refresh_interval seconds"""
+        while not self.stopped.is_set():
+            try:
+                self.refresh_proxies()
+            except Exception as e:
+                self.logger.error(f"Error refreshing proxies: {str(e)}")
+            self.ready.set()
+            self.stopped.wait(self.refresh_interval)
+
+    def wait_ready(self, timeout=None):
+        """
+        Wait for the first refresh to finish.
+
+        Returns:
+            bool: True if it finished within the timeout
+        """
+        return self.ready.wait(timeout)
+
+    def close(self):
+        """Stop the background refresh."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def get_proxy(self, exclude=()):
+        """Get a proxy, chosen at random in proportion to its health, skipping those in `exclude`."""
+        now = self.clock()
+        with self.lock:
+            candidates = [
+                (proxy, health) for proxy, health in self.health.items()
+                if health.available(now) and proxy not in exclude
+            ]
+            if not candidates:
+                if self.health:
+                    self.logger.warning("All proxies are quarantined")
+                return None
+            weights = [health.weight() for _, health in candidates]
+            return random.choices(candidates, weights=weights)[0][0]
+
+    def is_available(self, proxy):
+        """Whether a proxy is in the pool and not quarantined."""
+        with self.lock:
+            health = self.health.get(proxy)
+            return health is not None and health.available(self.clock())
+
+    def is_blocked(self, response, read_body=True):
+        """Check whether a response is the target refusing the proxy (block status or CAPTCHA page)."""
+        if response.status_code in BLOCK_STATUS_CODES:
+            return True
+        if response.status_code == 200 and read_body:
+            head = response.content[:BLOCK_SCAN_BYTES].lower()
+            return any(marker in head for marker in BLOCK_MARKERS)
+        return False
+
+    def report(self, proxy, success, latency=None, blocked=False):
+        """
+        Record the outcome of a request made through a proxy.
+
+        Args:
+            proxy (str): Proxy URL
+            success (bool): False when the request failed (timeout, connection error)
+            latency (float): Seconds the request took
+            blocked (bool): The target answered with a block or CAPTCHA page
+        """
+        now = self.clock()
+        with self.lock:
+            health = self.health.get(proxy)
+            if health is None:
+                return
+            quarantined = health.record(
+                success, latency, blocked, now,
+                self.alpha, self.failure_threshold, self.base_cooldown, self.max_cooldown
+            )
+            cooldown = health.quarantined_until - now
+        if quarantined:
+            self.logger.warning(f"Quarantined proxy {proxy} for {cooldown:.0f}s")
+
+    def stats(self):
+        """
+        Returns:
+            dict: Proxy -> requests, successes, failures, blocks, success_rate,
+            latency, block_rate, weight, state and seconds left in quarantine
+        """
+        now = self.clock()
+        with self.lock:
+            return {
+                proxy: {
+                    'requests': health.requests,
+                    'successes': health.successes,
+                    'failures': health.failures,
+                    'blocks': health.blocks,
+                    'success_rate': round(health.success_rate, 3),
+                    'latency': round(health.latency, 3),
+                    'block_rate': round(health.block_rate, 3),
+                    'weight': round(health.weight(), 3),
+                    'state': health.state(now),
+                    'quarantine_left': round(max(0.0, health.quarantined_until - now), 1),
+                }
+                for proxy, health in self.health.items()
             }
-            
-        return session
+
+    def summary(self):
+        """
+        Returns:
+            dict: Number of proxies in each state, plus the total
+        """
+        counts = {'total': 0, 'healthy': 0, 'probing': 0, 'quarantined': 0}
+        for proxy_stats in self.stats().values():
+            counts['total'] += 1
+            counts[proxy_stats['state']] += 1
+        return counts
+
+    def get_session(self, sticky=False, allow_direct=False):
+        """Create a requests session that picks a healthy proxy for each request (see ProxySession)."""
+        return ProxySession(self, sticky=sticky, allow_direct=allow_direct)
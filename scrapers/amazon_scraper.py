@@ -1,31 +1,124 @@
 import re  
 import os  
 from .base_scraper import BaseScraper
+from .extraction import ExtractionPlan
+from .parsers import PageRegions, parse_html
+
+# Fallback chains for every field, compiled once into a single-pass plan
+AMAZON_PLAN = ExtractionPlan({
+    'name': ['#productTitle'],
+    'current_price': [
+        '.a-price .a-offscreen',
+        '#priceblock_ourprice',
+        '#priceblock_dealprice',
+        '.a-price-whole'
+    ],
+    'original_price': ['.a-text-price .a-offscreen'],
+    'availability': ['#availability'],
+    'add_to_cart': ['#add-to-cart-button'],
+    'asin': ['input[name="ASIN"], input[name="asin"]'],
+    'rating': ['#acrPopover'],
+    'review_count': ['#acrCustomerReviewText'],
+    'brand': ['#bylineInfo'],
+    'features': ['#feature-bullets li'],
+}, many=('asin', 'features'))
+
+# Only these parts of the page are built when parsing
+AMAZON_REGIONS = PageRegions([
+    '#productTitle',
+    '#corePrice_feature_div',
+    '#corePriceDisplay_desktop_feature_div',
+    '#corePrice_desktop',
+    '#apex_desktop',
+    '#priceblock_ourprice',
+    '#priceblock_dealprice',
+    '#availability',
+    '#add-to-cart-button',
+    'input[name="ASIN"]',
+    'input[name="asin"]',
+    '#acrPopover',
+    '#acrCustomerReviewText',
+    '#bylineInfo',
+    '#feature-bullets'
+])
+
+# JSON-LD has no feature bullets: after a fast path hit only this region is parsed
+FEATURES_PLAN = ExtractionPlan({'features': ['#feature-bullets li']}, many=('features',))
+FEATURES_REGIONS = PageRegions(['#feature-bullets'])
 
 class AmazonScraper(BaseScraper):
     """Amazon-specific scraper implementation"""
     
-    def __init__(self):
-        super().__init__('Amazon', base_delay=10, jitter=3)
+    regions = AMAZON_REGIONS
+    required_fields = ('name', 'current_price')
+    
+    def __init__(self, parser_backend=None, sink=None):
+        super().__init__('Amazon', base_delay=10, jitter=3, parser_backend=parser_backend, sink=sink)
+    
+    def add_discount(self, product_data):
+        """Set discount and discount_percentage from current and original price"""
+        if (
+            product_data['current_price'] 
+            and product_data['original_price'] 
+            and product_data['original_price'] > product_data['current_price']
+        ):
+            discount = product_data['original_price'] - product_data['current_price']
+            discount_pct = (discount / product_data['original_price']) * 100
+            product_data['discount'] = round(discount, 2)
+            product_data['discount_percentage'] = round(discount_pct, 1)
+        else:
+            product_data['discount'] = 0
+            product_data['discount_percentage'] = 0
+    
+    def extract_features(self, found):
+        """Feature bullet texts from an extraction result with a 'features' field"""
+        return [
+            bullet.get_text(strip=True)
+            for bullet in found.candidates('features')
+            if bullet.get_text(strip=True)
+        ]
+    
+    def product_from_structured_data(self, structured, url):
+        """Build product data from Product JSON-LD (features are filled in by complete_structured_product)"""
+        asin_match = re.search(r'/dp/([A-Z0-9]{10})/?', url)
+        product_data = {
+            'name': structured['name'],
+            'current_price': structured['price'],
+            'original_price': structured['original_price'] or structured['price'],
+            'in_stock': structured['in_stock'],
+            'product_id': asin_match.group(1) if asin_match else self.extract_product_id(url),
+            'rating': structured['rating'],
+            'review_count': structured['review_count'] or 0,
+            'brand': structured['brand'],
+            'features': [],
+            'image_url': structured['image_url']
+        }
+        self.add_discount(product_data)
+        return product_data
+    
+    def complete_structured_product(self, product_data, content, url):
+        """Take the feature bullets from a parse of the #feature-bullets region only"""
+        try:
+            soup = parse_html(content, self.parser_backend, FEATURES_REGIONS)
+            product_data['features'] = self.extract_features(FEATURES_PLAN.execute(soup))
+        except Exception as e:
+            self.logger.warning(f"Could not extract features from {url}: {str(e)}")
+        return product_data
     
     def extract_product_data(self, soup, url):
         product_data = {}
+        found = AMAZON_PLAN.execute(soup)
         
         # Product name
         try:
-            product_data['name'] = soup.select_one('#productTitle').get_text(strip=True)  
+            product_data['name'] = found.first('name').get_text(strip=True)  
         except (AttributeError, TypeError):
             self.logger.warning("Could not extract product name")
             product_data['name'] = None
             
         # Current price
         try:
-            price_element = (
-                soup.select_one('.a-price .a-offscreen') or
-                soup.select_one('#priceblock_ourprice') or
-                soup.select_one('#priceblock_dealprice') or
-                soup.select_one('.a-price-whole') 
-            )
+            price_element = found.first('current_price')
             if price_element:
                 product_data['current_price'] = self.clean_price(price_element.text)
             else:
@@ -36,7 +129,7 @@ class AmazonScraper(BaseScraper):
             
         # Original price
         try:
-            original_price_element = soup.select_one('.a-text-price .a-offscreen')
+            original_price_element = found.first('original_price')
             if original_price_element:
                 product_data['original_price'] = self.clean_price(original_price_element.text)
             else:
@@ -45,27 +138,16 @@ class AmazonScraper(BaseScraper):
             product_data['original_price'] = product_data['current_price']
         
         # Discount calculation
-        if (
-            product_data['current_price'] 
-            and product_data['original_price'] 
-            and product_data['original_price'] > product_data['current_price']
-        ):
-            discount = product_data['original_price'] - product_data['current_price']
-            discount_pct = (discount / product_data['original_price']) * 100
-            product_data['discount'] = round(discount, 2)
-            product_data['discount_percentage'] = round(discount_pct, 1)
-        else:
-            product_data['discount'] = 0
-            product_data['discount_percentage'] = 0
+        self.add_discount(product_data)
         
         # Availability
         try:
-            availability_element = soup.select_one('#availability')
+            availability_element = found.first('availability')
             if availability_element:
                 availability_text = availability_element.get_text(strip=True).lower() 
                 product_data['in_stock'] = 'in stock' in availability_text
             else:
-                add_to_cart_button = soup.select_one('#add-to-cart-button')
+                add_to_cart_button = found.first('add_to_cart')
                 product_data['in_stock'] = add_to_cart_button is not None
         except (AttributeError, TypeError):
             product_data['in_stock'] = None
@@ -76,7 +158,7 @@ class AmazonScraper(BaseScraper):
             if asin_match:
                 product_data['product_id'] = asin_match.group(1)
             else:
-                for element in soup.select('input[name="ASIN"], input[name="asin"]'):
+                for element in found.candidates('asin'):
                     product_data['product_id'] = element.get('value')
                     break
         except Exception as e:
@@ -88,7 +170,7 @@ class AmazonScraper(BaseScraper):
         
         # Ratings
         try:
-            rating_element = soup.select_one('#acrPopover')
+            rating_element = found.first('rating')
             if rating_element:
                 rating_text = rating_element.get('title', '')
                 rating_match = re.search(r'(\d+\.\d+)', rating_text)
@@ -96,7 +178,7 @@ class AmazonScraper(BaseScraper):
             else:
                 product_data['rating'] = None
 
-            review_count_element = soup.select_one('#acrCustomerReviewText')
+            review_count_element = found.first('review_count')
             if review_count_element:
                 review_text = review_count_element.get_text(strip=True)
                 count_match = re.search(r'([\d,]+)', review_text)
@@ -109,7 +191,7 @@ class AmazonScraper(BaseScraper):
         
         # Brand
         try:
-            brand_element = soup.select_one('#bylineInfo')
+            brand_element = found.first('brand')
             if brand_element:
                 brand_text = brand_element.get_text(strip=True) 
                 brand_match = re.search(r'(?:by|brand:)[:\s]*(.*)', brand_text, re.IGNORECASE)  
@@ -121,12 +203,7 @@ class AmazonScraper(BaseScraper):
         
         # Product features
         try:
-            feature_bullets = soup.select('#feature-bullets li')
-            product_data['features'] = [
-                bullet.get_text(strip=True)
-                for bullet in feature_bullets
-                if bullet.get_text(strip=True)  
-            ]
+            product_data['features'] = self.extract_features(found)
         except Exception as e:
             self.logger.exception("Failed to extract features")  
             product_data['features'] = []
@@ -1,5 +1,4 @@
 import requests
-from bs4 import BeautifulSoup
 import time
 import random
 import logging
@@ -8,6 +7,11 @@ import json
 from datetime import datetime
 from urllib.parse import urlparse
 from abc import ABC, abstractmethod
+from .rate_limiter import shared_rate_limiter
+from .http_cache import get_shared_cache
+from .response_cache import ResponseCache
+from .parsers import parse_html, parse_and_extract
+from .structured_data import structured_fast_path
 
 # Configure logging - quite important
 logging.basicConfig(
@@ -19,22 +23,40 @@ logging.basicConfig(
     ]
 )
 
+# Default output directory for JSON files
+DATA_DIR = os.path.join(os.getcwd(), "data")
+
 class BaseScraper(ABC):
     """Base scraper class with common functionality"""
     
-    def __init__(self, retailer_name, base_delay=5, jitter=2, save_dir=r"C:\Users\adeda\OneDrive\Desktop\Ecommerce_Scraping\data"):
-       """
+    # Page regions the extractor reads; when set, pages are parsed partially
+    # and re-parsed in full if any of the required fields comes back empty
+    regions = None
+    required_fields = ('name',)
+    
+    def __init__(self, retailer_name, base_delay=5, jitter=2, save_dir=None, session=None, rate_limiter=None, http_cache=None, cache_max_bytes=64 * 1024 * 1024, parser_backend=None, sink=None):
+        """
         Args:
             retailer_name (str): Name of the retailer
             base_delay (int): Base delay between requests in seconds
             jitter (int): Random jitter to add to delay in seconds
+            save_dir (str): Directory for JSON output, defaults to ./data
+            session (requests.Session): Session to use, e.g. a proxied one from ProxyManager
+            rate_limiter (RateLimiter): Per-host limiter, defaults to the one shared by all scrapers
+            http_cache (HttpCache): Persistent response cache, defaults to the one shared by all scrapers
+            cache_max_bytes (int): Memory budget for compressed pages in the in-memory cache
+            parser_backend (str): HTML parser ('lxml', 'html.parser' or 'selectolax'), defaults to lxml
+            sink (SegmentWriter): Append products to this segment store instead of one JSON file each
         """
         self.retailer_name = retailer_name
         self.base_delay = base_delay
         self.jitter = jitter
-        self.save_dir = save_dir  # ✅ Set save_dir here
-        os.makedirs(save_dir, exist_ok=True)  # ✅ Create the folder if it doesn't exist
-        self.session = requests.Session()
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        self.parser_backend = parser_backend
+        self.sink = sink
+        self.save_dir = save_dir or DATA_DIR  # ✅ Set save_dir here
+        os.makedirs(self.save_dir, exist_ok=True)  # ✅ Create the folder if it doesn't exist
+        self.session = session or requests.Session()
         self.logger = logging.getLogger(f"{retailer_name}Scraper")
         
         # Set common headers
@@ -45,55 +67,96 @@ class BaseScraper(ABC):
         })
         
         # Cache to avoid re-scraping the same URL frequently
-        self.cache = {}
         self.cache_expiry = 3600  # 1 hour in seconds
+        self.cache = ResponseCache(max_bytes=cache_max_bytes, ttl=self.cache_expiry)
+        
+        # Persistent cache that survives between cycles and revalidates stale pages
+        self.http_cache = http_cache or get_shared_cache()
     
-    def get_page(self, url, use_cache=True):
+    def fetch_content(self, url, use_cache=True):
         """
+        Fetch the raw page body, going through the in-memory and persistent caches
+        
         Args:
             url (str): URL to fetch
             use_cache (bool): Whether to use cached response if available
             
         Returns:
-            BeautifulSoup object or None if failed
+            tuple: (content, changed) - content is None if the fetch failed, changed is
+            False when the body is identical to the one stored for this URL
         """
         try:
             # Check cache first
-            now = time.time()
-            if use_cache and url in self.cache and now - self.cache[url]['timestamp'] < self.cache_expiry:
+            content = self.cache.get(url) if use_cache else None
+            if content is not None:
                 self.logger.info(f"Using cached response for {url}")
-                return BeautifulSoup(self.cache[url]['content'], 'html.parser')
+                return content, False
             
-            # Add jitter to delay to avoid detection
-            delay = self.base_delay + random.uniform(0, self.jitter)
+            if use_cache:
+                content = self.http_cache.get_fresh(url, self.cache_expiry)
+                if content is not None:
+                    self.logger.info(f"Using stored response for {url}")
+                    self.cache.put(url, content)
+                    return content, False
+            
+            # Wait for this host's next slot (base delay plus jitter to avoid detection)
+            host = urlparse(url).netloc
+            delay = self.rate_limiter.acquire(host, interval=self.base_delay, jitter=self.jitter)
             self.logger.info(f"Fetching {url} (delay: {delay:.2f}s)")
             
-            # Wait before making request
-            time.sleep(delay)
+            # Make request, revalidating any stored copy
+            headers = self.request_headers()
+            if use_cache:
+                headers.update(self.http_cache.revalidation_headers(url))
+            response = self.session.get(url, headers=headers, timeout=(5, 30))
             
-            # Make request
-            response = self.session.get(url, timeout=(5, 30))
+            if response.status_code == 200 and self.is_blocked(response):
+                self.logger.error(f"Detected anti-bot protection for {url}")
+                return None, None
             
             # Check response status
-            if response.status_code == 200:
+            if response.status_code in (200, 304):
+                content, changed = self.http_cache.update(url, response)
+                if content is None:
+                    self.logger.error(f"Got 304 for {url} but nothing is stored for it")
+                    return None, None
                 # Update cache
-                self.cache[url] = {
-                    'content': response.content,
-                    'timestamp': now
-                }
-                return BeautifulSoup(response.content, 'html.parser')
+                self.cache.put(url, content)
+                return content, changed
             elif response.status_code == 429:
-                # Too many requests - back off significantly
+                # Too many requests - back off this host only, honouring Retry-After
                 self.logger.warning(f"Rate limited (429) for {url}. Backing off.")
-                time.sleep(60)  # 1 minute backoff
-                return None
+                self.rate_limiter.penalize_response(host, response, default=60)
+                return None, None
             else:
                 self.logger.error(f"Failed to fetch {url}, status code: {response.status_code}")
-                return None
+                return None, None
                 
         except Exception as e:
             self.logger.error(f"Error fetching {url}: {str(e)}")
+            return None, None
+    
+    def request_headers(self):
+        """Extra headers for the next request, on top of the session headers"""
+        return {}
+    
+    def is_blocked(self, response):
+        """Check whether a 200 response is really an anti-bot page"""
+        return False
+    
+    def get_page(self, url, use_cache=True):
+        """
+        Args:
+            url (str): URL to fetch
+            use_cache (bool): Whether to use cached response if available
+            
+        Returns:
+            BeautifulSoup object (or selectolax equivalent) or None if failed
+        """
+        content, _ = self.fetch_content(url, use_cache)
+        if content is None:
             return None
+        return parse_html(content, self.parser_backend)
     
     def clean_price(self, price_str):
         """
@@ -157,6 +220,33 @@ class BaseScraper(ABC):
             dict: Extracted product data
         """
         pass
+    
+    def product_from_structured_data(self, structured, url):
+        """
+        Build product data from the page's JSON-LD / embedded state, skipping the DOM
+        
+        Args:
+            structured (dict): Fields found by structured_data.extract_structured_product
+            url (str): Product URL
+            
+        Returns:
+            dict: Product data, or None to parse the page instead
+        """
+        return None
+        
+    def complete_structured_product(self, product_data, content, url):
+        """
+        Fill in fields structured data does not carry, after a fast path hit
+        
+        Args:
+            product_data (dict): Product built by product_from_structured_data
+            content (bytes): Raw page
+            url (str): Product URL
+            
+        Returns:
+            dict: Product data
+        """
+        return product_data
         
     def get_product(self, url):
         """
@@ -168,12 +258,33 @@ class BaseScraper(ABC):
         Returns:
             dict: Product data or None if failed
         """
-        soup = self.get_page(url)
-        if not soup:
+        content, changed = self.fetch_content(url)
+        if content is None:
             return None
             
         try:
-            product_data = self.extract_product_data(soup, url)
+            # Unchanged page - reuse the product extracted last time instead of parsing again
+            cached_product = None if changed else self.http_cache.get_product(url)
+            if cached_product:
+                cached_product['timestamp'] = datetime.now().isoformat()
+                return cached_product
+            
+            # JSON-LD / embedded state first, the DOM only if that is incomplete
+            product_data = structured_fast_path(
+                content, url, self.retailer_name, self.product_from_structured_data
+            )
+            if product_data is not None:
+                product_data = self.complete_structured_product(product_data, content, url)
+            else:
+                product_data = parse_and_extract(
+                    content,
+                    url,
+                    self.extract_product_data,
+                    backend=self.parser_backend,
+                    regions=self.regions,
+                    required_fields=self.required_fields,
+                    retailer=self.retailer_name
+                )
             
             # Add metadata
             product_data.update({
@@ -183,6 +294,7 @@ class BaseScraper(ABC):
                 'product_id': product_data.get('product_id') or self.extract_product_id(url)
             })
             
+            self.http_cache.put_product(url, product_data)
             return product_data
             
         except Exception as e:
@@ -191,14 +303,33 @@ class BaseScraper(ABC):
             self.logger.error(traceback.format_exc())
             return None
             
+    def fetch_product(self, url):
+        """
+        Get product data from URL and save it
+        
+        Args:
+            url (str): Product URL
+            
+        Returns:
+            dict: Product data or None if failed
+        """
+        product_data = self.get_product(url)
+        if product_data:
+            self.save_to_json(product_data)
+        return product_data
+            
     def save_to_json(self, product_data, filename=None):
         """
-        Save product data to JSON file
+        Save product data to JSON file, or append it to the segment store when the scraper has a sink
         
         Args:
             product_data (dict): Product data to save
             filename (str): Optional filename, defaults to retailer_productid.json
         """
+        if self.sink is not None and not filename:
+            self.sink.append(product_data)
+            return
+            
         if not filename:
             product_id = product_data.get('product_id', 'unknown')
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -0,0 +1,153 @@
+import logging
+import soupsieve
+from bs4 import Tag
+
+logger = logging.getLogger("Extraction")
+
+
+class ExtractionPlan:
+    """Declarative selector spec compiled into a single-pass extraction plan.
+
+    The spec maps each field to its fallback chain of CSS selectors, highest
+    priority first. Instead of one `select_one` tree walk per selector, the
+    plan walks the document once. Every selector is indexed by the most
+    selective part of its rightmost compound (id, class, attribute or tag
+    name), so each element is only tested against the few selectors that can
+    possibly match it.
+    """
+
+    def __init__(self, fields, many=()):
+        """
+        Args:
+            fields (dict): Field name -> list of CSS selectors in priority order
+            many (tuple): Fields that collect every match (like `select`)
+                instead of the first match per selector (like `select_one`)
+        """
+        self.fields = {field: list(selectors) for field, selectors in fields.items()}
+        self.many = set(many)
+
+        # (field, priority, selector string, compiled selector)
+        self.rules = []
+        self.by_id = {}
+        self.by_class = {}
+        self.by_attribute = {}
+        self.by_tag = {}
+        self.universal = []
+
+        for field, selectors in self.fields.items():
+            for priority, selector in enumerate(selectors):
+                self.rules.append((field, priority, selector, soupsieve.compile(selector)))
+
+        # The index reads soupsieve's compiled selector internals, which are
+        # not a public API. If they change, query selector by selector instead.
+        try:
+            for rule, (_, _, _, compiled) in enumerate(self.rules):
+                self._index(rule, compiled)
+            self.indexed = True
+        except (AttributeError, TypeError) as e:
+            logger.warning(f"Cannot index selectors, falling back to per-selector queries: {str(e)}")
+            self.indexed = False
+
+    def _index(self, rule, compiled):
+        """Register a rule under the key every element it matches must have"""
+        for selector in compiled.selectors:
+            if selector.ids:
+                self.by_id.setdefault(selector.ids[0], []).append(rule)
+            elif selector.classes:
+                self.by_class.setdefault(selector.classes[0], []).append(rule)
+            elif selector.attributes:
+                self.by_attribute.setdefault(selector.attributes[0].attribute.lower(), []).append(rule)
+            elif selector.tag and selector.tag.name not in (None, '*'):
+                self.by_tag.setdefault(selector.tag.name.lower(), []).append(rule)
+            else:
+                self.universal.append(rule)
+
+    def _candidate_rules(self, element):
+        """Rules that might match an element, based on its id, classes, attributes and name"""
+        rules = set(self.universal)
+        rules.update(self.by_tag.get(element.name, ()))
+
+        for attribute, value in element.attrs.items():
+            rules.update(self.by_attribute.get(attribute, ()))
+            if attribute == 'id':
+                rules.update(self.by_id.get(value, ()))
+            elif attribute == 'class':
+                for class_name in value:
+                    rules.update(self.by_class.get(class_name, ()))
+        return rules
+
+    def execute(self, soup):
+        """
+        Collect every field's candidates from a parsed page
+
+        Both paths return the same candidates: first matches in fallback
+        priority order, and every match of a "many" field in document order.
+
+        Args:
+            soup: BeautifulSoup object, or any object with select_one/select
+                (e.g. a SelectolaxNode), which falls back to one query per selector
+
+        Returns:
+            ExtractionResult: Candidates per field in fallback priority order
+        """
+        if not self.indexed or not isinstance(soup, Tag):
+            return self._execute_per_selector(soup)
+
+        first_match = {}  # rule -> first matching element in document order
+        all_matches = {}  # many-field -> matching elements in document order
+        pending = set(range(len(self.rules)))
+
+        for element in soup.descendants:
+            if not isinstance(element, Tag):
+                continue
+
+            for rule in self._candidate_rules(element):
+                field, _, _, compiled = self.rules[rule]
+                if field in self.many:
+                    matches = all_matches.setdefault(field, [])
+                    if (not matches or matches[-1] is not element) and compiled.match(element):
+                        matches.append(element)
+                elif rule in pending and compiled.match(element):
+                    first_match[rule] = element
+                    pending.discard(rule)
+
+        candidates = {}
+        for rule, (field, priority, _, _) in enumerate(self.rules):
+            if field not in self.many and rule in first_match:
+                candidates.setdefault(field, []).append(first_match[rule])
+        for field, matches in all_matches.items():
+            candidates[field] = matches
+
+        return ExtractionResult(candidates)
+
+    def _execute_per_selector(self, soup):
+        """Fallback for non-BeautifulSoup documents or an unindexed plan: one query per selector"""
+        candidates = {}
+        for field, selectors in self.fields.items():
+            if field in self.many:
+                # One selector list query returns each match once, in document order
+                candidates[field] = soup.select(', '.join(selectors))
+                continue
+            matches = []
+            for selector in selectors:
+                element = soup.select_one(selector)
+                if element is not None:
+                    matches.append(element)
+            candidates[field] = matches
+        return ExtractionResult(candidates)
+
+
+class ExtractionResult:
+    """Elements found for each field of an ExtractionPlan"""
+
+    def __init__(self, candidates):
+        self._candidates = candidates
+
+    def candidates(self, field):
+        """All candidate elements for a field, highest priority first"""
+        return self._candidates.get(field, [])
+
+    def first(self, field):
+        """The highest-priority element for a field, or None"""
+        matches = self._candidates.get(field)
+        return matches[0] if matches else None
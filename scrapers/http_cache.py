@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+# Cache configuration
+CACHE_DIR = os.path.join(os.getcwd(), "cache")
+HTTP_CACHE_PATH = os.path.join(CACHE_DIR, "http_cache.db")
+
+# Entries not fetched or revalidated for this long are dropped
+HTTP_CACHE_MAX_AGE = 7 * 24 * 3600
+# Most responses kept; the least recently fetched go first
+HTTP_CACHE_MAX_ROWS = 20000
+
+
+class HttpCache:
+    """Persistent HTTP response cache shared by all scrapers.
+
+    Stores the body, headers and validators (ETag / Last-Modified) of every
+    200 response in SQLite, together with the product extracted from it. Stale
+    entries are revalidated with If-None-Match / If-Modified-Since so an
+    unchanged page comes back as a 304 and its stored product can be reused
+    without parsing the page again.
+
+    The table is pruned when opened and every `prune_every` stored responses:
+    entries older than `max_age` are dropped, then the least recently fetched
+    ones beyond `max_rows`.
+    """
+
+    def __init__(self, path=HTTP_CACHE_PATH, max_age=HTTP_CACHE_MAX_AGE, max_rows=HTTP_CACHE_MAX_ROWS,
+                 prune_every=500, clock=time.time):
+        """
+        Args:
+            path (str): SQLite file to store responses in
+            max_age (float): Seconds an entry is kept after it was last fetched or revalidated
+            max_rows (int): Maximum number of stored responses
+            prune_every (int): Number of stored responses between two prunes
+            clock (callable): Returns the current time in seconds
+        """
+        self.path = path
+        self.max_age = max_age
+        self.max_rows = max_rows
+        self.prune_every = max(1, int(prune_every))
+        self.clock = clock
+        self.writes = 0
+        self.logger = logging.getLogger('HttpCache')
+        self.lock = threading.Lock()
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY,
+            body BLOB,
+            headers TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at REAL,
+            product TEXT
+        )
+        ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_fetched_at ON responses (fetched_at)")
+        self.conn.commit()
+        self.prune()
+
+    def get(self, url):
+        """
+        Get the stored entry for a URL
+
+        Returns:
+            dict: Entry with body, headers, etag, last_modified, fetched_at and product, or None
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body, headers, etag, last_modified, fetched_at, product FROM responses WHERE url = ?",
+                (url,)
+            ).fetchone()
+
+        if not row:
+            return None
+
+        return {
+            'body': row[0],
+            'headers': json.loads(row[1]) if row[1] else {},
+            'etag': row[2],
+            'last_modified': row[3],
+            'fetched_at': row[4],
+            'product': json.loads(row[5]) if row[5] else None
+        }
+
+    def get_fresh(self, url, max_age):
+        """
+        Get the stored body if it was fetched or revalidated less than max_age seconds ago
+
+        Returns:
+            bytes: Cached body or None
+        """
+        entry = self.get(url)
+        if entry and self.clock() - entry['fetched_at'] < max_age:
+            return entry['body']
+        return None
+
+    def revalidation_headers(self, url):
+        """Build If-None-Match / If-Modified-Since headers for a stored URL"""
+        entry = self.get(url)
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def update(self, url, response):
+        """
+        Record a response to a (possibly conditional) request
+
+        Args:
+            url (str): Requested URL
+            response (requests.Response): Response received
+
+        Returns:
+            tuple: (body, changed) - changed is False for a 304, and (None, None)
+            is returned for any other non-200 status
+        """
+        now = self.clock()
+
+        if response.status_code == 304:
+            entry = self.get(url)
+            if not entry:
+                return None, None
+            with self.lock:
+                self.conn.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (now, url))
+                self.conn.commit()
+            self.logger.info(f"Not modified (304): {url}")
+            return entry['body'], False
+
+        if response.status_code != 200:
+            return None, None
+
+        headers = dict(response.headers)
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO responses
+                (url, body, headers, etag, last_modified, fetched_at, product)
+                VALUES (?, ?, ?, ?, ?, ?, NULL)
+                """,
+                (
+                    url,
+                    response.content,
+                    json.dumps(headers),
+                    response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'),
+                    now
+                )
+            )
+            self.conn.commit()
+            self.writes += 1
+            prune = self.writes % self.prune_every == 0
+        if prune:
+            self.prune()
+        return response.content, True
+
+    def get_product(self, url):
+        """Get the product previously extracted from the stored body, or None"""
+        entry = self.get(url)
+        return entry['product'] if entry else None
+
+    def put_product(self, url, product_data):
+        """Store the product extracted from the current body of a URL"""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE responses SET product = ? WHERE url = ?",
+                (json.dumps(product_data), url)
+            )
+            self.conn.commit()
+
+    def prune(self):
+        """
+        Drop entries older than max_age, then the least recently fetched beyond max_rows
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self.lock:
+            removed = self.conn.execute(
+                "DELETE FROM responses WHERE fetched_at < ?", (self.clock() - self.max_age,)
+            ).rowcount
+            removed += self.conn.execute(
+                """
+                DELETE FROM responses WHERE url IN (
+                    SELECT url FROM responses ORDER BY fetched_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_rows,)
+            ).rowcount
+            self.conn.commit()
+
+        if removed:
+            self.logger.info(f"Pruned {removed} cached responses")
+        return removed
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """Get the process-wide HttpCache, opening it on first use"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = HttpCache()
+        return _shared_cache
@@ -1,21 +1,72 @@
-import os
 import re
-import time
-import json
 import random
-import logging
-import requests
-import datetime
 import string
-from bs4 import BeautifulSoup
-DATA_DIR = r"C:\Users\adeda\OneDrive\Desktop\Ecommerce_Scraping\data"
+from .base_scraper import BaseScraper
+from .extraction import ExtractionPlan
+from .parsers import PageRegions
 
-class NeweggScraper:
-    def __init__(self, session, base_delay=5.0, delay_variance=2.0):
-        self.session = session
-        self.base_delay = base_delay
-        self.delay_variance = delay_variance
-        self.logger = logging.getLogger('NeweggScraper')
+# Fallback chains for every field, compiled once into a single-pass plan
+NEWEGG_PLAN = ExtractionPlan({
+    'name': [
+        'h1.product-title',
+        'h1[itemprop="name"]',
+        'h1.product-name'
+    ],
+    'price': [
+        'li.price-current',
+        'span.price-current-label + span.price-current-value',
+        'li.price-current strong',
+        'span[data-testid="item-price"]'
+    ],
+    'stock': [
+        'div.product-inventory strong',
+        'div.product-inventory',
+        'div.product-buy'
+    ],
+    'image': [
+        'div.mainSlide img',
+        'div.swiper-zoom-container img',
+        'div.product-view-img-original img'
+    ],
+    'add_to_cart': [
+        'button.btn-primary'
+    ]
+}, many=('add_to_cart',))
+
+# Only these parts of the page are built when parsing
+NEWEGG_REGIONS = PageRegions([
+    'h1.product-title',
+    'h1[itemprop="name"]',
+    'h1.product-name',
+    'li.price-current',
+    'span.price-current-label',
+    'span.price-current-value',
+    'span[data-testid="item-price"]',
+    'div.product-inventory',
+    'div.product-buy',
+    'button.btn-primary',
+    'div.mainSlide',
+    'div.swiper-zoom-container',
+    'div.product-view-img-original'
+])
+
+
+class NeweggScraper(BaseScraper):
+    """Newegg-specific scraper implementation"""
+    
+    regions = NEWEGG_REGIONS
+    required_fields = ('name', 'price')
+    
+    def __init__(self, session=None, base_delay=5.0, delay_variance=2.0, parser_backend=None, sink=None):
+        # The extra 1-3s on top of the usual delay mimics human behavior
+        super().__init__(
+            'Newegg',
+            base_delay=base_delay + 1,
+            jitter=delay_variance + 2,
+            session=session,
+            parser_backend=parser_backend,
+            sink=sink
+        )
         
         # Rotate user agents to avoid detection
         self.user_agents = [
@@ -46,133 +97,96 @@ class NeweggScraper:
             'Cookie': 'NID=511=' + ''.join(random.choices(string.ascii_lowercase + string.digits, k=72))
         }
     
-    def fetch_product(self, url):
-        """Fetch and parse product data from Newegg with anti-blocking measures."""
-        try:
-            delay = self.base_delay + random.uniform(0, self.delay_variance)
-            self.logger.info(f"Fetching {url} (delay: {delay:.2f}s)")
-            time.sleep(delay)
-            
-            # Add more randomized delay to mimic human behavior
-            time.sleep(random.uniform(1, 3))
-            
-            # Use rotating headers
-            headers = self.get_random_headers()
-            
-            # Use a session with cookies to maintain state
-            response = self.session.get(url, headers=headers, timeout=30)
-            
-            if response.status_code != 200:
-                self.logger.error(f"Failed to fetch {url}, status code: {response.status_code}")
-                return None
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Check for CAPTCHA or anti-bot challenges
-            if 'robot' in response.text.lower() or 'captcha' in response.text.lower():
-                self.logger.error(f"Detected anti-bot protection for {url}")
-                return None
-            
-            # Extract product ID from URL
-            product_id = None
-            if '/p/' in url:
-                product_id = url.split('/p/')[1].split('/')[0]
-            
-            # Product name extraction
-            product_name = None
-            name_selectors = [
-                'h1.product-title',
-                'h1[itemprop="name"]',
-                'h1.product-name'
-            ]
-            
-            for selector in name_selectors:
-                name_element = soup.select_one(selector)
-                if name_element:
-                    product_name = name_element.get_text().strip()
+    def request_headers(self):
+        """Use rotating headers on every request"""
+        return self.get_random_headers()
+    
+    def is_blocked(self, response):
+        """Check for CAPTCHA or anti-bot challenges"""
+        page = response.content.lower()
+        return b'robot' in page or b'captcha' in page
+    
+    def extract_product_id(self, url):
+        """Extract the Newegg product ID from a product URL."""
+        product_id = None
+        if '/p/' in url:
+            product_id = url.split('/p/')[1].split('/')[0]
+        return product_id
+
+    def product_from_structured_data(self, structured, url):
+        """Build product data from the page's JSON-LD / embedded state."""
+        return {
+            'url': url,
+            'source': 'Newegg',
+            'product_id': self.extract_product_id(url),
+            'name': structured['name'],
+            'price': structured['price'],
+            'currency': structured['currency'] or 'USD',
+            'image_url': structured['image_url'],
+            'in_stock': structured['in_stock']
+        }
+
+    def extract_product_data(self, soup, url):
+        """Extract product data from a parsed Newegg product page."""
+        found = NEWEGG_PLAN.execute(soup)
+
+        # Extract product ID from URL
+        product_id = self.extract_product_id(url)
+
+        # Product name extraction
+        product_name = None
+        for name_element in found.candidates('name'):
+            if name_element:
+                product_name = name_element.get_text().strip()
+                break
+
+        # Price extraction
+        price = None
+        for price_element in found.candidates('price'):
+            if price_element:
+                price_text = price_element.get_text().strip()
+                # Remove currency symbols and convert to float
+                price_text = re.sub(r'[^\d.]', '', price_text)
+                try:
+                    price = float(price_text)
                     break
-            
-            # Price extraction
-            price = None
-            price_selectors = [
-                'li.price-current',
-                'span.price-current-label + span.price-current-value',
-                'li.price-current strong',
-                'span[data-testid="item-price"]'
-            ]
-            
-            for selector in price_selectors:
-                price_element = soup.select_one(selector)
-                if price_element:
-                    price_text = price_element.get_text().strip()
-                    # Remove currency symbols and convert to float
-                    price_text = re.sub(r'[^\d.]', '', price_text)
-                    try:
-                        price = float(price_text)
-                        break
-                    except ValueError:
-                        continue
-            
-            # Extract availability
-            in_stock = False
-            stock_selectors = [
-                'div.product-inventory strong',
-                'div.product-inventory',
-                'div.product-buy'
-            ]
-            
-            for selector in stock_selectors:
-                stock_element = soup.select_one(selector)
-                if stock_element:
-                    stock_text = stock_element.get_text().lower()
-                    if 'in stock' in stock_text:
-                        in_stock = True
-                        break
-            
-            # Also check "Add to cart" button
-            add_buttons = soup.select('button.btn-primary')
-            for button in add_buttons:
-                button_text = button.get_text().lower()
-                if 'add to cart' in button_text:
+                except ValueError:
+                    continue
+
+        # Extract availability
+        in_stock = False
+        for stock_element in found.candidates('stock'):
+            if stock_element:
+                stock_text = stock_element.get_text().lower()
+                if 'in stock' in stock_text:
                     in_stock = True
                     break
-            
-            # Extract product image
-            image_url = None
-            img_selectors = [
-                'div.mainSlide img',
-                'div.swiper-zoom-container img',
-                'div.product-view-img-original img'
-            ]
-            
-            for selector in img_selectors:
-                img_element = soup.select_one(selector)
-                if img_element and img_element.get('src'):
-                    image_url = img_element.get('src')
-                    break
-            
-            # Compile product data
-            product_data = {
-                'url': url,
-                'source': 'Newegg',
-                'product_id': product_id,
-                'name': product_name,
-                'price': price,
-                'currency': 'USD',
-                'image_url': image_url,
-                'in_stock': in_stock,
-                'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            # Save product data
-            filename = f"Newegg_{product_id}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            filepath = os.path.join(DATA_DIR, filename)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(product_data, f, indent=2)
-            
-            self.logger.info(f"Saved product data to {filepath}")
-            return product_data
-            
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Error fetching {url}: {str(e)}")
-            return None
\ No newline at end of file
+
+        # Also check "Add to cart" button
+        add_buttons = found.candidates('add_to_cart')
+        for button in add_buttons:
+            button_text = button.get_text().lower()
+            if 'add to cart' in button_text:
+                in_stock = True
+                break
+
+        # Extract product image
+        image_url = None
+        for img_element in found.candidates('image'):
+            if img_element and img_element.get('src'):
+                image_url = img_element.get('src')
+                break
+
+        # Compile product data
+        product_data = {
+            'url': url,
+            'source': 'Newegg',
+            'product_id': product_id,
+            'name': product_name,
+            'price': price,
+            'currency': 'USD',
+            'image_url': image_url,
+            'in_stock': in_stock
+        }
+
+        return product_data
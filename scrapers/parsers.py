@@ -0,0 +1,299 @@
+import re
+import logging
+import threading
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax is optional
+    LexborHTMLParser = None
+
+try:
+    import lxml  # noqa: F401 - only checking that BeautifulSoup can use it
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_PARSER = 'html.parser'
+
+PARSER_BACKENDS = ('lxml', 'html.parser', 'selectolax')
+
+logger = logging.getLogger('Parsers')
+
+# Every this many partial parses per retailer the page is also parsed in full,
+# to check that the regions still cover every field the extractor reads
+AUDIT_INTERVAL = 50
+
+# Extracted values that count as "not found"
+EMPTY_VALUES = (None, '', [])
+
+
+class PartialParseStats:
+    """Per-retailer counters of partial parses and of the fields they left empty"""
+
+    def __init__(self, audit_interval=AUDIT_INTERVAL):
+        """
+        Args:
+            audit_interval (int): Fully parse every Nth partially parsed page
+                to compare the two, 0 to never do it
+        """
+        self.audit_interval = audit_interval
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def _counts(self, retailer):
+        return self.counts.setdefault(
+            retailer, {'partial': 0, 'fallbacks': 0, 'audits': 0, 'empty': {}, 'missed': {}}
+        )
+
+    def record(self, retailer, empty, fallback):
+        """
+        Count a partial parse and decide whether to audit it
+
+        Args:
+            retailer (str): Retailer name
+            empty (list): Fields the partial parse left empty
+            fallback (bool): Whether a required field was missing
+
+        Returns:
+            bool: True if the page should also be parsed in full
+        """
+        with self.lock:
+            counts = self._counts(retailer)
+            counts['partial'] += 1
+            for field in empty:
+                counts['empty'][field] = counts['empty'].get(field, 0) + 1
+            if fallback:
+                counts['fallbacks'] += 1
+                return True
+            if self.audit_interval and counts['partial'] % self.audit_interval == 0:
+                counts['audits'] += 1
+                return True
+            return False
+
+    def record_missed(self, retailer, fields):
+        """Count fields a full parse found but the partial parse did not"""
+        with self.lock:
+            missed = self._counts(retailer)['missed']
+            for field in fields:
+                missed[field] = missed.get(field, 0) + 1
+
+    def summary(self):
+        """
+        Returns:
+            dict: Retailer -> partial parses, fallbacks, audits, and per-field
+            counts of empty fields and of fields the regions missed
+        """
+        with self.lock:
+            return {
+                retailer: dict(counts, empty=dict(counts['empty']), missed=dict(counts['missed']))
+                for retailer, counts in self.counts.items()
+            }
+
+
+partial_parse_stats = PartialParseStats()
+
+
+def available_backends():
+    """Backends that can actually be used in this environment"""
+    backends = ['html.parser']
+    if DEFAULT_PARSER == 'lxml':
+        backends.insert(0, 'lxml')
+    if LexborHTMLParser is not None:
+        backends.append('selectolax')
+    return backends
+
+
+def parse_html(content, backend=None, regions=None):
+    """
+    Parse a page with the requested backend
+
+    Args:
+        content (bytes or str): Raw HTML
+        backend (str): 'lxml', 'html.parser' or 'selectolax'; defaults to lxml when installed
+        regions (PageRegions): Only build the subtrees matching these regions.
+            Ignored by selectolax, which always parses the whole page.
+
+    Returns:
+        A BeautifulSoup object, or a SelectolaxNode exposing the same
+        select_one / select / get_text / get subset the extractors use
+    """
+    backend = backend or DEFAULT_PARSER
+
+    if backend == 'selectolax':
+        if LexborHTMLParser is not None:
+            return SelectolaxNode(LexborHTMLParser(content).root)
+        logger.warning("selectolax is not installed, falling back to %s", DEFAULT_PARSER)
+        backend = DEFAULT_PARSER
+
+    if backend == 'lxml' and DEFAULT_PARSER != 'lxml':
+        logger.warning("lxml is not installed, falling back to html.parser")
+        backend = 'html.parser'
+
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend: {backend}")
+
+    if regions is not None:
+        return BeautifulSoup(content, backend, parse_only=regions.strainer)
+    return BeautifulSoup(content, backend)
+
+
+def parse_and_extract(content, url, extract, backend=None, regions=None, required_fields=(), retailer=None):
+    """
+    Parse a page and run an extractor on it, parsing only the needed regions when possible
+
+    The page is parsed in full as well when the partial parse misses a
+    required field, and every AUDIT_INTERVAL-th partial parse. Any field the
+    full parse finds but the partial parse left empty is logged and counted
+    in partial_parse_stats, as it means the regions no longer cover it.
+
+    Args:
+        content (bytes): Raw HTML
+        url (str): Page URL, passed through to the extractor
+        extract (callable): Function taking (soup, url) and returning a product dict
+        backend (str): Parser backend, see parse_html
+        regions (PageRegions): Regions for a partial parse, or None for a full parse
+        required_fields (tuple): Fields that must be extracted for the partial parse to count
+        retailer (str): Retailer name the stats are counted under
+
+    Returns:
+        dict: Extracted product data
+    """
+    if regions is None or backend == 'selectolax':
+        return extract(parse_html(content, backend), url)
+
+    product_data = extract(parse_html(content, backend, regions), url)
+    empty = [field for field, value in product_data.items() if value in EMPTY_VALUES]
+    missing = [field for field in required_fields if product_data.get(field) is None]
+    if not partial_parse_stats.record(retailer or 'unknown', empty, bool(missing)):
+        return product_data
+
+    if missing:
+        logger.info(f"Partial parse missed {', '.join(missing)} for {url}, parsing the full page")
+    full_data = extract(parse_html(content, backend), url)
+
+    missed = [
+        field for field, value in full_data.items()
+        if value not in EMPTY_VALUES and product_data.get(field) in EMPTY_VALUES
+    ]
+    if missed:
+        partial_parse_stats.record_missed(retailer or 'unknown', missed)
+        logger.warning(f"Page regions missed {', '.join(missed)} for {url}")
+    return full_data
+
+
+class PageRegions:
+    """The parts of a page an extractor needs, for partial (SoupStrainer) parsing.
+
+    Regions are simple selectors without combinators: a tag name, #id,
+    .class and [attribute] / [attribute="value"] parts, e.g. '#productTitle',
+    'span.price-characteristic' or 'script[type="application/ld+json"]'.
+    Any element matching a region is kept together with its whole subtree;
+    everything else on the page is skipped while parsing.
+    """
+
+    REGION_PATTERN = re.compile(
+        r'^(?P<tag>[\w-]+)?'
+        r'(?P<parts>(?:#[\w-]+|\.[\w-]+|\[[\w-]+(?:="[^"]*")?\])*)$'
+    )
+    PART_PATTERN = re.compile(r'#([\w-]+)|\.([\w-]+)|\[([\w-]+)(?:="([^"]*)")?\]')
+
+    def __init__(self, regions):
+        """
+        Args:
+            regions (list): Region selectors to keep
+        """
+        self.regions = [self._compile(region) for region in regions]
+        self.strainer = SoupStrainer(self.matches)
+
+    def _compile(self, region):
+        """Turn a region selector into (tag, id, classes, {attribute: value or None})"""
+        match = self.REGION_PATTERN.match(region.strip())
+        if not match:
+            raise ValueError(f"Unsupported region selector: {region}")
+
+        element_id, classes, attributes = None, set(), {}
+        for id_part, class_part, attribute, value in self.PART_PATTERN.findall(match.group('parts')):
+            if id_part:
+                element_id = id_part
+            elif class_part:
+                classes.add(class_part)
+            else:
+                attributes[attribute.lower()] = value if value else None
+        tag = match.group('tag')
+        return (tag.lower() if tag else None, element_id, classes, attributes)
+
+    def matches(self, name, attrs):
+        """SoupStrainer callback: should the tag with this name and these raw attributes be kept?"""
+        for tag, element_id, classes, attributes in self.regions:
+            if tag and tag != name:
+                continue
+            if element_id and attrs.get('id') != element_id:
+                continue
+            if classes:
+                tag_classes = attrs.get('class') or ''
+                if isinstance(tag_classes, str):
+                    tag_classes = tag_classes.split()
+                if not classes.issubset(tag_classes):
+                    continue
+            if any(
+                attribute not in attrs or (value is not None and attrs[attribute] != value)
+                for attribute, value in attributes.items()
+            ):
+                continue
+            return True
+        return False
+
+
+class SelectolaxNode:
+    """Wraps a selectolax node with the BeautifulSoup calls used by the extractors"""
+
+    # Attributes BeautifulSoup returns as lists
+    MULTI_VALUED_ATTRIBUTES = ('class', 'rel', 'rev', 'headers', 'accept-charset', 'accesskey', 'dropzone')
+
+    def __init__(self, node):
+        self.node = node
+
+    def select_one(self, selector):
+        node = self.node.css_first(selector)
+        return SelectolaxNode(node) if node is not None else None
+
+    def select(self, selector):
+        # Lexbor returns an element once per selector of a list that matches it
+        nodes = {node.mem_id: node for node in self.node.css(selector)}
+        return [SelectolaxNode(node) for node in nodes.values()]
+
+    def get_text(self, separator='', strip=False):
+        return self.node.text(deep=True, separator=separator, strip=strip)
+
+    @property
+    def text(self):
+        return self.get_text()
+
+    @property
+    def string(self):
+        return self.get_text()
+
+    @property
+    def name(self):
+        return self.node.tag
+
+    @property
+    def attrs(self):
+        return {key: self.get(key) for key in self.node.attributes}
+
+    def get(self, key, default=None):
+        value = self.node.attributes.get(key)
+        if value is None:
+            # Valueless attributes (e.g. <button disabled>) come back as None but are present
+            return '' if key in self.node.attributes else default
+        if key in self.MULTI_VALUED_ATTRIBUTES:
+            return value.split()
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __bool__(self):
+        return True
@@ -0,0 +1,174 @@
+import asyncio
+import random
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+
+class TokenBucket:
+    """Token bucket for a single host, refilled at one token per interval"""
+
+    def __init__(self, interval, burst=1, jitter=0.0, now=None):
+        """
+        Args:
+            interval (float): Seconds between requests at the steady rate
+            burst (int): Number of requests that may go out back to back
+            jitter (float): Random extra delay (0..jitter seconds) added to every wait
+            now (float): Current time, defaults to time.monotonic()
+        """
+        self.interval = max(float(interval), 0.001)
+        self.burst = max(1, int(burst))
+        self.jitter = jitter
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic() if now is None else now
+
+    def reserve(self, now):
+        """
+        Take one token and return how long the caller must wait for it.
+
+        Tokens may go negative: concurrent callers queue up behind each other
+        instead of all being released at the same moment. While the host is
+        penalized `updated` lies in the future and no tokens are refilled.
+        """
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+            self.updated = now
+        self.tokens -= 1
+
+        wait = self.updated - now
+        if self.tokens < 0:
+            wait -= self.tokens * self.interval
+        if self.jitter:
+            wait += random.uniform(0, self.jitter)
+        return wait
+
+    def penalize(self, now, seconds):
+        """
+        Block the host for at least `seconds` from now
+
+        The bucket is emptied and starts refilling when the block ends, so the
+        requests queued during the block resume one interval apart instead of
+        all at once.
+        """
+        self.updated = max(self.updated, now + seconds)
+        self.tokens = min(self.tokens, 0)
+
+
+class RateLimiter:
+    """Per-host rate limiter shared by all scrapers.
+
+    The lock is only held while a slot is reserved, never while waiting, so a
+    slow or penalized host does not delay requests to any other host.
+    """
+
+    def __init__(self, default_interval=5.0, default_burst=1, default_jitter=0.0, clock=time.monotonic):
+        self.default_interval = default_interval
+        self.default_burst = default_burst
+        self.default_jitter = default_jitter
+        self.clock = clock
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger('RateLimiter')
+
+    def configure(self, host, interval=None, burst=None, jitter=None):
+        """Create or replace the bucket for a host"""
+        with self.lock:
+            self.buckets[host] = TokenBucket(
+                interval if interval is not None else self.default_interval,
+                burst if burst is not None else self.default_burst,
+                jitter if jitter is not None else self.default_jitter,
+                self.clock(),
+            )
+
+    def _bucket(self, host, interval=None, burst=None, jitter=None):
+        """Get the bucket for a host, creating it from the given settings if needed (lock held)"""
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(
+                interval if interval is not None else self.default_interval,
+                burst if burst is not None else self.default_burst,
+                jitter if jitter is not None else self.default_jitter,
+                self.clock(),
+            )
+            self.buckets[host] = bucket
+        return bucket
+
+    def reserve(self, host, interval=None, burst=None, jitter=None):
+        """
+        Reserve the next request slot for a host without waiting
+
+        Args:
+            host (str): Host name, e.g. 'www.walmart.com'
+            interval, burst, jitter: Bucket settings, only used the first time the host is seen
+
+        Returns:
+            float: Seconds the caller must wait before sending the request
+        """
+        with self.lock:
+            return self._bucket(host, interval, burst, jitter).reserve(self.clock())
+
+    def acquire(self, host, **bucket_settings):
+        """Block the calling thread until a request to host may go out"""
+        delay = self.reserve(host, **bucket_settings)
+        if delay > 0:
+            self.logger.info(f"Waiting {delay:.2f}s for {host}")
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, host, **bucket_settings):
+        """Coroutine version of acquire() that only suspends the calling task"""
+        delay = self.reserve(host, **bucket_settings)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def penalize(self, host, seconds):
+        """Hold back every request to host for the given number of seconds"""
+        with self.lock:
+            self._bucket(host).penalize(self.clock(), seconds)
+        self.logger.warning(f"Backing off {host} for {seconds:.0f}s")
+
+    def penalize_response(self, host, response, default=60):
+        """
+        Apply a penalty for a throttled response (e.g. 429), honouring Retry-After
+
+        Returns:
+            float: Penalty applied in seconds
+        """
+        seconds = parse_retry_after(response.headers.get('Retry-After'))
+        if seconds is None:
+            seconds = default
+        self.penalize(host, seconds)
+        return seconds
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header value
+
+    Args:
+        value (str): Either a number of seconds or an HTTP date
+
+    Returns:
+        float: Seconds to wait, or None if the value is missing or invalid
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+# One limiter for the whole process, so every scraper hitting a host shares its budget
+shared_rate_limiter = RateLimiter()
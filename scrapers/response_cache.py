@@ -0,0 +1,156 @@
+import time
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+
+class ResponseCache:
+    """In-memory response cache bounded by a byte budget.
+
+    Bodies are stored compressed (zstd when the zstandard package is
+    installed, zlib otherwise). Entries expire after `ttl` seconds and the
+    least recently used entries are evicted once the compressed size of the
+    cache exceeds `max_bytes`.
+
+    zstd compressor objects are not thread-safe, so each thread that uses the
+    cache gets its own pair.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=3600, compression_level=3, clock=time.time):
+        """
+        Args:
+            max_bytes (int): Budget for the compressed bodies held in memory
+            ttl (int): Seconds an entry stays valid
+            compression_level (int): zstd / zlib compression level
+            clock (callable): Returns the current time in seconds
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.compression_level = compression_level
+        self.clock = clock
+        self.entries = OrderedDict()  # url -> (compressed body, stored_at)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.logger = logging.getLogger('ResponseCache')
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _compress(self, data):
+        if zstandard is None:
+            return zlib.compress(data, self.compression_level)
+        compressor = getattr(self.local, 'compressor', None)
+        if compressor is None:
+            compressor = self.local.compressor = zstandard.ZstdCompressor(level=self.compression_level)
+        return compressor.compress(data)
+
+    def _decompress(self, data):
+        if zstandard is None:
+            return zlib.decompress(data)
+        decompressor = getattr(self.local, 'decompressor', None)
+        if decompressor is None:
+            decompressor = self.local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor.decompress(data)
+
+    def get(self, url):
+        """
+        Get a cached body
+
+        Returns:
+            bytes: Body, or None if missing or expired
+        """
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            compressed, stored_at = entry
+            if self.clock() - stored_at >= self.ttl:
+                self._remove(url)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(url)
+            self.hits += 1
+
+        return self._decompress(compressed)
+
+    def put(self, url, content):
+        """
+        Store a body, evicting least recently used entries to stay within budget
+
+        Expired entries are dropped first, so they never push live ones out.
+        """
+        compressed = self._compress(content)
+        if len(compressed) > self.max_bytes:
+            self.logger.warning(f"Not caching {url}: {len(compressed)} bytes exceeds the cache budget")
+            return
+
+        with self.lock:
+            if url in self.entries:
+                self._remove(url)
+            now = self.clock()
+            self.entries[url] = (compressed, now)
+            self.size += len(compressed)
+
+            if self.size > self.max_bytes:
+                self._purge_expired(now)
+            while self.size > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def purge_expired(self):
+        """Drop every expired entry, returning how many were removed"""
+        with self.lock:
+            return self._purge_expired(self.clock())
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Get cache counters for sizing the budget
+
+        Returns:
+            dict: hits, misses, evictions, expirations, entries, bytes and max_bytes
+        """
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes
+            }
+
+    def _purge_expired(self, now):
+        """Drop the entries expired at `now` (lock held)"""
+        expired = [url for url, (_, stored_at) in self.entries.items() if now - stored_at >= self.ttl]
+        for url in expired:
+            self._remove(url)
+        self.expirations += len(expired)
+        return len(expired)
+
+    def _remove(self, url):
+        """Remove an entry and release its bytes (lock held)"""
+        compressed, _ = self.entries.pop(url)
+        self.size -= len(compressed)
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,226 @@
+import re
+import json
+import logging
+import threading
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # orjson is optional, the standard library works too
+    _loads = json.loads
+
+logger = logging.getLogger('StructuredData')
+
+# Script blocks are found in the raw bytes, before (and usually instead of) any DOM parsing
+LD_JSON_PATTERN = re.compile(
+    rb'<script[^>]*type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+NEXT_DATA_PATTERN = re.compile(
+    rb'<script[^>]*id\s*=\s*["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Fields the fast path must find for DOM parsing to be skipped
+REQUIRED_FIELDS = ('name', 'price', 'in_stock', 'image_url')
+
+
+class FastPathStats:
+    """Per-retailer counters of how often structured data made DOM parsing unnecessary"""
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def record(self, retailer, hit):
+        with self.lock:
+            counts = self.counts.setdefault(retailer, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+
+    def summary(self):
+        """
+        Returns:
+            dict: Retailer -> hits, misses and hit_rate
+        """
+        with self.lock:
+            return {
+                retailer: dict(counts, hit_rate=counts['hits'] / ((counts['hits'] + counts['misses']) or 1))
+                for retailer, counts in self.counts.items()
+            }
+
+
+fast_path_stats = FastPathStats()
+
+
+def _decode(raw):
+    """Decode a JSON script body, returning None if it is not valid JSON"""
+    try:
+        return _loads(raw.strip())
+    except ValueError:
+        return None
+
+
+def find_json_ld(content):
+    """
+    Decode every JSON-LD block in a raw page
+
+    Returns:
+        list: Top-level JSON-LD objects, with lists and @graph containers flattened
+    """
+    objects = []
+    for match in LD_JSON_PATTERN.finditer(content):
+        data = _decode(match.group(1))
+        pending = data if isinstance(data, list) else [data]
+        while pending:
+            item = pending.pop(0)
+            if isinstance(item, dict):
+                if isinstance(item.get('@graph'), list):
+                    pending.extend(item['@graph'])
+                else:
+                    objects.append(item)
+            elif isinstance(item, list):
+                pending.extend(item)
+    return objects
+
+
+def find_embedded_state(content):
+    """Decode the __NEXT_DATA__ state blob of a raw page, or None"""
+    match = NEXT_DATA_PATTERN.search(content)
+    return _decode(match.group(1)) if match else None
+
+
+def _dig(data, *path):
+    """Follow a path of keys through nested dicts, returning None when any step is missing"""
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _to_float(value):
+    try:
+        return float(str(value).replace(',', '').replace('$', '').strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_product(item):
+    item_type = item.get('@type')
+    if isinstance(item_type, list):
+        return 'Product' in item_type
+    return item_type == 'Product'
+
+
+def _from_json_ld(item):
+    """Map a schema.org Product object onto our field names"""
+    offers = item.get('offers')
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    offers = offers if isinstance(offers, dict) else {}
+
+    price = _to_float(offers.get('price', offers.get('lowPrice')))
+    availability = offers.get('availability')
+
+    image = item.get('image')
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get('url')
+
+    brand = item.get('brand')
+    if isinstance(brand, dict):
+        brand = brand.get('name')
+
+    rating = item.get('aggregateRating')
+    rating = rating if isinstance(rating, dict) else {}
+    review_count = _to_float(rating.get('reviewCount', rating.get('ratingCount')))
+
+    return {
+        'name': item.get('name'),
+        'price': price,
+        'currency': offers.get('priceCurrency'),
+        'in_stock': 'InStock' in availability if isinstance(availability, str) else None,
+        'image_url': image,
+        'brand': brand,
+        'rating': _to_float(rating.get('ratingValue')),
+        'review_count': int(review_count) if review_count is not None else None,
+    }
+
+
+def _from_next_data(state):
+    """Map a Walmart-style __NEXT_DATA__ product onto our field names"""
+    data = _dig(state, 'props', 'pageProps', 'initialData', 'data')
+    product = _dig(data, 'product')
+    if not isinstance(product, dict):
+        return {}
+
+    availability = product.get('availabilityStatus')
+    brand = product.get('brand')
+    return {
+        'name': product.get('name'),
+        'price': _to_float(_dig(product, 'priceInfo', 'currentPrice', 'price')),
+        'original_price': _to_float(_dig(product, 'priceInfo', 'wasPrice', 'price')),
+        'currency': _dig(product, 'priceInfo', 'currentPrice', 'currencyUnit'),
+        'in_stock': availability == 'IN_STOCK' if availability else None,
+        'image_url': _dig(product, 'imageInfo', 'thumbnailUrl'),
+        'brand': brand.get('name') if isinstance(brand, dict) else brand,
+        'rating': _to_float(_dig(data, 'reviews', 'averageOverallRating')),
+        'review_count': _dig(data, 'reviews', 'totalReviewCount'),
+    }
+
+
+def extract_structured_product(content):
+    """
+    Pull product fields out of JSON-LD and embedded state without parsing the DOM
+
+    Args:
+        content (bytes): Raw page
+
+    Returns:
+        dict: name, price, original_price, currency, in_stock, image_url, brand,
+        rating and review_count (None where not found)
+    """
+    product = dict.fromkeys(
+        ('name', 'price', 'original_price', 'currency', 'in_stock', 'image_url', 'brand', 'rating', 'review_count')
+    )
+
+    sources = [_from_json_ld(item) for item in find_json_ld(content) if _is_product(item)]
+    if b'__NEXT_DATA__' in content:
+        sources.append(_from_next_data(find_embedded_state(content)))
+
+    for source in sources:
+        for field, value in source.items():
+            if product.get(field) is None and value is not None:
+                product[field] = value
+    return product
+
+
+def structured_fast_path(content, url, retailer, build_product):
+    """
+    Build a product straight from structured data when it has every required field
+
+    Args:
+        content (bytes): Raw page
+        url (str): Page URL
+        retailer (str): Retailer name, for the hit statistics
+        build_product (callable): Scraper hook taking (structured fields, url)
+            and returning the scraper's product dict, or None to fall back to the DOM
+
+    Returns:
+        dict: Product data, or None when the page still needs DOM parsing
+    """
+    try:
+        structured = extract_structured_product(content)
+    except Exception as e:
+        logger.warning(f"Error reading structured data from {url}: {str(e)}")
+        structured = {}
+
+    product_data = None
+    if all(structured.get(field) is not None for field in REQUIRED_FIELDS):
+        product_data = build_product(structured, url)
+
+    fast_path_stats.record(retailer, product_data is not None)
+    if product_data is not None:
+        logger.info(f"Structured data fast path for {url}")
+    return product_data
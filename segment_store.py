@@ -0,0 +1,383 @@
+import os
+import gzip
+import json
+import time
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:  # orjson is optional, the standard library works too
+    _dumps = lambda record: json.dumps(record, default=str).encode('utf-8')
+    _loads = json.loads
+
+INDEX_FILE = "index.json"
+OPEN_SUFFIX = ".ndjson"
+SEALED_SUFFIX = ".ndjson.gz"
+LOCK_SUFFIX = ".lock"
+
+logger = logging.getLogger('SegmentStore')
+
+
+def _record_time(record):
+    """The snapshot time of a record (its 'timestamp'), falling back to now"""
+    timestamp = record.get('timestamp') if isinstance(record, dict) else None
+    return timestamp if isinstance(timestamp, str) and timestamp else datetime.now().isoformat()
+
+
+def _lock(f, blocking=True):
+    """
+    Take an exclusive lock on an open file; the OS releases it if the process dies
+
+    Returns:
+        bool: False if blocking is off and another writer holds the lock
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        if blocking:
+            raise
+        return False
+    return True
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _acquire_lock_file(path, blocking=True):
+    """
+    Open and lock a segment's lock file
+
+    Returns:
+        file: The locked file, or None if blocking is off and another writer holds it
+    """
+    while True:
+        f = open(path, 'a+b')
+        if not _lock(f, blocking):
+            f.close()
+            return None
+        # Recovery may have removed the file between open and lock: lock the new one instead
+        if os.path.exists(path) and os.path.samestat(os.fstat(f.fileno()), os.stat(path)):
+            return f
+        f.close()
+
+
+def _release_lock_file(f, path):
+    """Remove a segment's lock file, then unlock and close it"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # Windows does not remove files another process has open
+    _unlock(f)
+    f.close()
+
+
+@contextmanager
+def _index_lock(directory):
+    """Serialize index updates between writers sharing a directory"""
+    with open(os.path.join(directory, INDEX_FILE + LOCK_SUFFIX), 'a+b') as f:
+        _lock(f)
+        try:
+            yield
+        finally:
+            _unlock(f)
+
+
+class SegmentWriter:
+    """Append-only store for scraped records, written as NDJSON segments.
+
+    Records are appended, one JSON document per line, to the open segment.
+    The segment is sealed once it reaches `max_bytes` or `max_age` seconds:
+    it is gzip-compressed and its time range and record count are added to
+    index.json. One writer can be shared by all scrapers of a process.
+
+    Each open segment has a lock file that its writer holds until it is
+    sealed. Several processes can write to the same directory: a new writer
+    only recovers the segments whose lock is free, i.e. those left behind by
+    a process that stopped without closing them.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, max_age=3600, compress=True):
+        """
+        Args:
+            directory (str): Directory holding the segments and their index
+            max_bytes (int): Uncompressed size at which a segment is sealed
+            max_age (int): Seconds after which a segment is sealed
+            compress (bool): gzip segments when sealing them
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compress = compress
+        self.lock = threading.Lock()
+
+        self.file = None
+        self.path = None
+        self.lock_file = None
+        self.opened_at = None
+        self.size = 0
+        self.count = 0
+        self.start = None
+        self.end = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+    def append(self, record):
+        """Append one record, sealing the open segment first if it is full or too old"""
+        line = _dumps(record) + b'\n'
+        record_time = _record_time(record)
+
+        with self.lock:
+            if self.file is not None and (
+                self.size >= self.max_bytes or time.time() - self.opened_at >= self.max_age
+            ):
+                self._seal()
+            if self.file is None:
+                self._open()
+
+            self.file.write(line)
+            self.file.flush()
+            self.size += len(line)
+            self.count += 1
+            self.start = min(self.start, record_time) if self.start else record_time
+            self.end = max(self.end, record_time) if self.end else record_time
+
+    def rotate(self):
+        """Seal the open segment now, e.g. at the end of a scraping cycle"""
+        with self.lock:
+            if self.file is not None:
+                self._seal()
+
+    def close(self):
+        self.rotate()
+
+    def _open(self):
+        """Start a new segment (lock held)"""
+        name = f"segment-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+        self.path = os.path.join(self.directory, name + OPEN_SUFFIX)
+        self.lock_file = _acquire_lock_file(os.path.join(self.directory, name + LOCK_SUFFIX))
+        self.file = open(self.path, 'ab')
+        self.opened_at = time.time()
+        self.size = 0
+        self.count = 0
+        self.start = None
+        self.end = None
+
+    def _seal(self):
+        """Close, compress and index the open segment (lock held)"""
+        self.file.close()
+        self.file = None
+        self._seal_file(self.path, self.count, self.start, self.end)
+        _release_lock_file(self.lock_file, self.path[:-len(OPEN_SUFFIX)] + LOCK_SUFFIX)
+        self.lock_file = None
+
+    def _seal_file(self, path, count, start, end):
+        """
+        Compress a closed segment file and add it to the index
+
+        The open file is only removed once the index lists its compressed copy,
+        so a crash at any point leaves the records in a file recovery finds.
+        """
+        sealed_path = path
+        if self.compress:
+            sealed_path = path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX
+            with open(path, 'rb') as source, gzip.open(sealed_path + '.tmp', 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.replace(sealed_path + '.tmp', sealed_path)
+
+        with _index_lock(self.directory):
+            index = read_index(self.directory)
+            index.append({
+                'file': os.path.basename(sealed_path),
+                'start': start,
+                'end': end,
+                'records': count,
+                'bytes': os.path.getsize(sealed_path)
+            })
+            _write_index(self.directory, index)
+
+        if sealed_path != path:
+            os.remove(path)
+        logger.info(f"Sealed segment {os.path.basename(sealed_path)}: {count} records, {start} to {end}")
+
+    def _recover(self):
+        """
+        Seal the segments left open by writers that stopped without closing them
+
+        Segments whose lock is still held belong to a live writer and are left
+        alone. Empty segments, leftover temporary files and lock files without
+        a segment are removed.
+        """
+        indexed = {entry['file'] for entry in read_index(self.directory)}
+        for name in sorted(os.listdir(self.directory)):
+            base = None
+            if name.endswith(OPEN_SUFFIX) and name not in indexed:
+                base = name[:-len(OPEN_SUFFIX)]
+            elif name.endswith(LOCK_SUFFIX) and name != INDEX_FILE + LOCK_SUFFIX:
+                base = name[:-len(LOCK_SUFFIX)]
+                if os.path.exists(os.path.join(self.directory, base + OPEN_SUFFIX)):
+                    continue  # Handled together with its segment
+            if base is None:
+                continue
+
+            lock_path = os.path.join(self.directory, base + LOCK_SUFFIX)
+            lock_file = _acquire_lock_file(lock_path, blocking=False)
+            if lock_file is None:
+                continue  # Another writer is still appending to it
+            try:
+                self._recover_segment(base)
+            finally:
+                _release_lock_file(lock_file, lock_path)
+
+    def _recover_segment(self, base):
+        """Seal or remove one abandoned segment (its lock held)"""
+        path = os.path.join(self.directory, base + OPEN_SUFFIX)
+        temp_path = os.path.join(self.directory, base + SEALED_SUFFIX + '.tmp')
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        if not os.path.exists(path):
+            return
+
+        # Sealed and indexed, but stopped before the open file was removed
+        indexed = {entry['file'] for entry in read_index(self.directory)}
+        if base + SEALED_SUFFIX in indexed:
+            os.remove(path)
+            return
+        if base + OPEN_SUFFIX in indexed:
+            return
+
+        with open(path, 'rb+') as f:
+            # Drop a line torn by the crash
+            f.truncate(f.read().rfind(b'\n') + 1)
+
+        count, start, end = 0, None, None
+        for record in _read_file(path):
+            record_time = _record_time(record)
+            count += 1
+            start = min(start, record_time) if start else record_time
+            end = max(end, record_time) if end else record_time
+        if count:
+            logger.info(f"Recovering segment {base}{OPEN_SUFFIX} left open by a stopped writer")
+            self._seal_file(path, count, start, end)
+        else:
+            os.remove(path)
+
+
+def read_index(directory):
+    """
+    Get the sealed segments of a store
+
+    Returns:
+        list: Dicts with file, start, end, records and bytes, oldest first
+    """
+    path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_index(directory, index):
+    path = os.path.join(directory, INDEX_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _read_file(path):
+    """Yield the records of one segment file, skipping a torn last line"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield _loads(line)
+            except ValueError:
+                logger.warning(f"Skipping unreadable line in {path}")
+
+
+def list_segments(directory, start=None, end=None, include_open=False):
+    """
+    Get the segment files whose time range overlaps [start, end]
+
+    Args:
+        directory (str): Segment store directory
+        start (str): ISO timestamp lower bound, or None
+        end (str): ISO timestamp upper bound, or None
+        include_open (bool): Also list the segment still being written
+
+    Returns:
+        list: Segment file paths, oldest first
+    """
+    paths = [
+        os.path.join(directory, entry['file'])
+        for entry in read_index(directory)
+        if (start is None or entry['end'] >= start) and (end is None or entry['start'] <= end)
+    ]
+    if include_open:
+        indexed = {entry['file'] for entry in read_index(directory)}
+        paths.extend(
+            os.path.join(directory, name)
+            for name in sorted(os.listdir(directory))
+            if name.endswith(OPEN_SUFFIX) and name not in indexed
+            # Already sealed, only waiting to be removed
+            and name[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX not in indexed
+        )
+    return paths
+
+
+def read_segment(path, start=None, end=None):
+    """
+    Stream the records of one segment file
+
+    Args:
+        path (str): Segment file, sealed (.ndjson.gz) or open (.ndjson)
+        start (str): ISO timestamp lower bound, or None
+        end (str): ISO timestamp upper bound, or None
+
+    Yields:
+        dict: Records in the order they were appended
+    """
+    for record in _read_file(path):
+        record_time = _record_time(record)
+        if (start is None or record_time >= start) and (end is None or record_time <= end):
+            yield record
+
+
+def read_segments(directory, start=None, end=None, include_open=False):
+    """
+    Stream the records of a segment store, using the index to skip segments outside the time range
+
+    Args:
+        directory (str): Segment store directory
+        start (str): ISO timestamp lower bound, or None
+        end (str): ISO timestamp upper bound, or None
+        include_open (bool): Also read the segment still being written
+
+    Yields:
+        dict: Records in the order they were appended
+    """
+    for path in list_segments(directory, start, end, include_open):
+        yield from read_segment(path, start, end)
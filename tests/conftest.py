@@ -0,0 +1,136 @@
+import socket
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path of a fresh database file, with the schema-ready cache left clean"""
+    path = str(tmp_path / 'products.db')
+    yield path
+    database._schema_ready.discard(path)
+
+
+@pytest.fixture
+def raw_product():
+    """A scraped product as the scrapers write it"""
+    return {
+        'product_id': 'B0TEST0001',
+        'retailer': 'Amazon',
+        'name': 'Acme Wireless Headphones',
+        'brand': 'Acme',
+        'url': 'https://www.amazon.com/dp/B0TEST0001',
+        'current_price': '$199.99',
+        'original_price': '$249.99',
+        'in_stock': True,
+        'rating': 4.6,
+        'review_count': '12,345',
+        'timestamp': '2025-05-20T17:43:35.123456',
+    }
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class _TargetHandler(_QuietHandler):
+    """Stands in for a retailer (and the proxy check URL): /captcha serves an anti-bot page"""
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        body = b'<html><body>Enter the characters you see below (CAPTCHA)</body></html>' \
+            if path == '/captcha' else b'<html><body>ok</body></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _ForwardingHandler(_QuietHandler):
+    """Plain-HTTP forward proxy: fetches the absolute URL of the request line and relays the answer"""
+
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+    def do_GET(self):
+        self.server.hits += 1
+        try:
+            with self.opener.open(self.path, timeout=5) as upstream:
+                status, body = upstream.status, upstream.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _serve(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.hits = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def target_url():
+    """Base URL of a local target site"""
+    server = _serve(_TargetHandler)
+    yield _url(server)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def start_proxy():
+    """Start local forwarding proxies; returns (proxy URL, server with a hits counter)"""
+    servers = []
+
+    def start():
+        server = _serve(_ForwardingHandler)
+        servers.append(server)
+        return _url(server), server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def dead_proxy():
+    """URL of a proxy that refuses connections"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+class FakeClock:
+    """Manually advanced replacement for time.monotonic"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from scrapers.amazon_scraper import AmazonScraper
+
+PRODUCT_LD = {
+    '@context': 'https://schema.org',
+    '@type': 'Product',
+    'name': 'Acme Wireless Headphones',
+    'image': 'https://m.media-amazon.com/images/I/acme.jpg',
+    'brand': {'@type': 'Brand', 'name': 'Acme'},
+    'offers': {
+        '@type': 'Offer',
+        'price': '199.99',
+        'priceCurrency': 'USD',
+        'availability': 'https://schema.org/InStock',
+    },
+}
+
+PAGE = f"""
+<html><head>
+<script type="application/ld+json">{json.dumps(PRODUCT_LD)}</script>
+</head><body>
+  <span id="productTitle">Acme Wireless Headphones</span>
+  <div id="feature-bullets"><ul>
+    <li><span>30 hour battery</span></li>
+    <li><span> </span></li>
+    <li><span>Active noise cancelling</span></li>
+  </ul></div>
+</body></html>
+""".encode('utf-8')
+
+
+class MemoryCache:
+    def get_product(self, url):
+        return None
+
+    def put_product(self, url, product_data):
+        pass
+
+
+@pytest.mark.parametrize('backend', ['lxml', 'html.parser', 'selectolax'])
+def test_structured_fast_path_keeps_feature_bullets(backend, monkeypatch):
+    scraper = AmazonScraper(parser_backend=backend)
+    scraper.http_cache = MemoryCache()
+    monkeypatch.setattr(scraper, 'fetch_content', lambda url: (PAGE, True))
+    monkeypatch.setattr(scraper, 'extract_product_data', lambda soup, url: pytest.fail("DOM extractor ran"))
+
+    product = scraper.get_product('https://www.amazon.com/dp/B0TEST0001')
+    assert product['name'] == 'Acme Wireless Headphones'
+    assert product['current_price'] == 199.99
+    assert product['features'] == ['30 hour battery', 'Active noise cancelling']
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import defaultdict
+
+from crawl_engine import CrawlEngine, RetailerJob
+
+
+class StubFetch:
+    """Fetch callable recording how many of its calls are in flight at once"""
+
+    def __init__(self, name, delay=0.05, barrier=None):
+        self.name = name
+        self.delay = delay
+        self.barrier = barrier
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, url):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.barrier is not None:
+                # Only passes if the other retailer is fetching at the same time
+                self.barrier.wait(timeout=5)
+            time.sleep(self.delay)
+            return {'retailer': self.name, 'url': url}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def _urls(name, count):
+    return [f"https://{name.lower()}.example/{i}" for i in range(count)]
+
+
+def test_retailers_run_concurrently():
+    barrier = threading.Barrier(2)
+    amazon = StubFetch('Amazon', barrier=barrier)
+    walmart = StubFetch('Walmart', barrier=barrier)
+
+    results = CrawlEngine([
+        RetailerJob('Amazon', amazon, _urls('Amazon', 1)),
+        RetailerJob('Walmart', walmart, _urls('Walmart', 1)),
+    ]).run()
+
+    assert results == {
+        'Amazon': [{'retailer': 'Amazon', 'url': 'https://amazon.example/0'}],
+        'Walmart': [{'retailer': 'Walmart', 'url': 'https://walmart.example/0'}],
+    }
+
+
+def test_concurrency_caps_in_flight_fetches_per_retailer():
+    fetches = {name: StubFetch(name) for name in ('Amazon', 'Target', 'Newegg')}
+    caps = {'Amazon': 1, 'Target': 2, 'Newegg': 3}
+
+    results = CrawlEngine([
+        RetailerJob(name, fetch, _urls(name, 8), concurrency=caps[name])
+        for name, fetch in fetches.items()
+    ]).run()
+
+    for name, fetch in fetches.items():
+        assert fetch.max_in_flight == caps[name]
+        # Results keep URL order whatever order the fetches finished in
+        assert [product['url'] for product in results[name]] == _urls(name, 8)
+
+
+def test_failing_fetches_do_not_cancel_other_jobs():
+    calls = defaultdict(int)
+
+    def broken(url):
+        calls[url] += 1
+        raise ConnectionError("host unreachable")
+
+    def flaky(url):
+        if url.endswith('/1'):
+            raise ValueError("unparseable page")
+        return {'url': url}
+
+    results = CrawlEngine([
+        RetailerJob('Walmart', broken, _urls('Walmart', 3)),
+        RetailerJob('Target', flaky, _urls('Target', 3)),
+        RetailerJob('Amazon', StubFetch('Amazon'), _urls('Amazon', 3), concurrency=2),
+    ]).run()
+
+    assert results['Walmart'] == []
+    assert len(calls) == 3
+    assert [product['url'] for product in results['Target']] == ['https://target.example/0', 'https://target.example/2']
+    assert len(results['Amazon']) == 3
@@ -0,0 +1,64 @@
+import database
+from database import ConnectionManager, _connect, _ensure_schema
+from etl import ProductETL
+
+
+def test_failed_migration_is_retried(db_path, monkeypatch):
+    calls = []
+
+    def failing_migration(conn):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("disk full")
+
+    monkeypatch.setattr(database, 'MIGRATIONS', database.MIGRATIONS[:1] + [failing_migration])
+
+    conn = _connect(db_path)
+    _ensure_schema(conn, db_path)
+    assert db_path not in database._schema_ready
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+
+    _ensure_schema(conn, db_path)
+    assert db_path in database._schema_ready
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+    assert len(calls) == 2
+    conn.close()
+
+
+def test_etl_flushes_through_connection_manager(db_path, raw_product):
+    manager = ConnectionManager(db_path)
+    try:
+        etl = ProductETL(connection_manager=manager)
+        etl.process_raw_data(raw_product, bulk=True)
+        etl.process_raw_data(dict(raw_product, product_id='B0TEST0002', name='Acme Speaker'), bulk=True)
+        assert etl.flush() == 2
+        assert manager.writer_thread is not None
+
+        reader = manager.reader()
+        assert reader.execute("SELECT count(*) FROM products").fetchone()[0] == 2
+        assert reader.execute("SELECT count(*) FROM prices").fetchone()[0] == 2
+    finally:
+        manager.close()
+
+
+def test_bad_record_only_loses_itself(db_path, raw_product, tmp_path):
+    conn = _connect(db_path)
+    _ensure_schema(conn, db_path)
+    etl = ProductETL(db_connection=conn, batch_size=10)
+
+    directory = str(tmp_path / 'data')
+    for i, product_id in enumerate(['B0TEST0001', 'B0BAD00001', 'B0TEST0002']):
+        record = etl.transform_product_data(dict(raw_product, product_id=product_id))
+        if product_id == 'B0BAD00001':
+            record['current_price'] = {'amount': 199.99}  # Cannot be bound as an SQL value
+        etl.buffer(record, (f"{directory}/{product_id}.json", 100, 1000.0 + i, f"hash{i}"))
+    assert etl.flush() == 2
+
+    loaded = [row[0] for row in conn.execute("SELECT product_id FROM products ORDER BY id")]
+    assert loaded == ['B0TEST0001', 'B0TEST0002']
+    assert conn.execute("SELECT count(*) FROM prices").fetchone()[0] == 2
+    # The bad record's file stays out of the manifest, so the next incremental run retries it
+    assert sorted(database.get_manifest(conn, directory)) == [
+        f"{directory}/B0TEST0001.json", f"{directory}/B0TEST0002.json"
+    ]
+    conn.close()
@@ -0,0 +1,211 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import etl as etl_module
+from database import _connect, _ensure_schema
+from etl import ProductETL
+
+
+def _write_snapshots(directory, raw_product, count):
+    os.makedirs(directory, exist_ok=True)
+    for i in range(count):
+        record = dict(
+            raw_product,
+            product_id=f'B0TEST{i % 7:04d}',
+            name=f'Acme Product {i % 7}',
+            current_price=f'${100 + i}.99',
+            timestamp=f'2025-05-{1 + i // 7:02d}T10:00:{i % 60:02d}',
+        )
+        path = os.path.join(directory, f'product_{i:03d}.json')
+        with open(path, 'w') as f:
+            json.dump(record, f)
+        # mtimes follow scrape order, which the ETL loads oldest first
+        os.utime(path, (1_700_000_000 + i, 1_700_000_000 + i))
+    # One file the transform rejects
+    with open(os.path.join(directory, 'broken.json'), 'w') as f:
+        f.write('{"name": "no price, no retailer"')
+
+
+def _snapshot(path):
+    conn = _connect(path)
+    _ensure_schema(conn, path)
+    tables = {
+        'products': conn.execute("SELECT product_id, retailer, name FROM products ORDER BY id").fetchall(),
+        'prices': conn.execute(
+            "SELECT p.product_id, current_price, timestamp, last_seen FROM prices "
+            "JOIN products p ON p.id = prices.product_id ORDER BY prices.id"
+        ).fetchall(),
+        'product_latest': conn.execute(
+            "SELECT p.product_id, current_price, last_seen FROM product_latest l "
+            "JOIN products p ON p.id = l.product_id ORDER BY p.product_id"
+        ).fetchall(),
+    }
+    conn.close()
+    return {table: [tuple(row) for row in rows] for table, rows in tables.items()}
+
+
+@pytest.fixture
+def snapshots(tmp_path, raw_product):
+    directory = str(tmp_path / 'data')
+    _write_snapshots(directory, raw_product, 40)
+    return directory
+
+
+def _load(tmp_path, name, directory, **options):
+    path = str(tmp_path / f'{name}.db')
+    conn = _connect(path)
+    _ensure_schema(conn, path)
+    count = ProductETL(db_connection=conn, batch_size=8).process_directory(directory, **options)
+    conn.close()
+    return count, _snapshot(path)
+
+
+@pytest.mark.parametrize('incremental', [False, True])
+def test_parallel_matches_serial(tmp_path, snapshots, incremental):
+    serial = _load(tmp_path, 'serial', snapshots, bulk=True, incremental=incremental)
+    parallel = _load(tmp_path, 'parallel', snapshots, workers=2, chunk_size=3, incremental=incremental)
+
+    assert serial[0] == parallel[0] == 40
+    assert parallel[1] == serial[1]
+    assert len(serial[1]['prices']) == 40
+
+
+def test_parallel_respects_max_in_flight(tmp_path, snapshots, monkeypatch):
+    submitted = []
+    loaded = []
+    high_water = []
+
+    class CountingPool(ProcessPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            submitted.append(args[0])
+            high_water.append(len(submitted) - len(loaded))
+            return super().submit(fn, *args, **kwargs)
+
+    load_results = ProductETL._load_results
+
+    def counting_load_results(self, future, chunk, *args):
+        loaded.append(chunk)
+        return load_results(self, future, chunk, *args)
+
+    monkeypatch.setattr(etl_module, 'ProcessPoolExecutor', CountingPool)
+    monkeypatch.setattr(ProductETL, '_load_results', counting_load_results)
+
+    count, _ = _load(tmp_path, 'parallel', snapshots, workers=2, chunk_size=2, max_in_flight=3)
+    assert count == 40
+    assert len(submitted) == len(loaded) == 21
+    assert max(high_water) == 3
+    # Chunks are loaded in submission order
+    assert [path for chunk in loaded for path, _, _, _ in chunk] == [path for chunk in submitted for path in chunk]
+
+
+@pytest.fixture
+def make_etl(tmp_path):
+    connections = []
+
+    def make(name='incremental'):
+        path = str(tmp_path / f'{name}.db')
+        conn = _connect(path)
+        _ensure_schema(conn, path)
+        connections.append(conn)
+        return ProductETL(db_connection=conn, batch_size=8)
+
+    yield make
+    for conn in connections:
+        conn.close()
+
+
+def _count(etl, table):
+    return etl.db_connection.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+
+def test_second_run_over_unchanged_files_is_a_no_op(make_etl, snapshots, monkeypatch):
+    etl = make_etl()
+    assert etl.process_directory(snapshots, incremental=True) == 40
+    assert _count(etl, 'prices') == 40
+
+    # Everything is below the high-water mark: no manifest lookup, no file is read
+    def fail(*args):
+        raise AssertionError("unchanged directory was scanned past the high-water mark")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(etl_module, 'get_manifest', fail)
+        patch.setattr(etl_module, '_read_and_transform', fail)
+        assert etl.process_directory(snapshots, incremental=True) == 0
+    assert _count(etl, 'prices') == 40
+
+
+def test_touched_and_changed_files(make_etl, snapshots, raw_product):
+    etl = make_etl()
+    etl.process_directory(snapshots, incremental=True)
+
+    # Touched only: hashed, found unchanged, not loaded again
+    touched = os.path.join(snapshots, 'product_000.json')
+    os.utime(touched, (1_800_000_000, 1_800_000_000))
+    assert etl.process_directory(snapshots, incremental=True) == 0
+
+    # New content is loaded
+    with open(touched, 'w') as f:
+        json.dump(dict(raw_product, current_price='$5.00', timestamp='2025-06-01T10:00:00'), f)
+    os.utime(touched, (1_800_000_100, 1_800_000_100))
+    assert etl.process_directory(snapshots, incremental=True) == 1
+    assert _count(etl, 'prices') == 41
+
+
+def test_file_added_below_the_watermark_is_found(make_etl, snapshots, raw_product):
+    etl = make_etl()
+    etl.process_directory(snapshots, incremental=True)
+
+    # Copied in with its original, older mtime
+    late = os.path.join(snapshots, 'late.json')
+    with open(late, 'w') as f:
+        json.dump(dict(raw_product, product_id='B0LATE0001', timestamp='2025-04-01T10:00:00'), f)
+    os.utime(late, (1_600_000_000, 1_600_000_000))
+    assert etl.process_directory(snapshots, incremental=True) == 1
+    assert etl.process_directory(snapshots, incremental=True) == 0
+
+
+def test_unreadable_file_holds_the_watermark_back(make_etl, snapshots, monkeypatch):
+    etl = make_etl()
+    read_and_transform = etl_module._read_and_transform
+    flaky = os.path.join(snapshots, 'product_005.json')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(
+            etl_module, '_read_and_transform',
+            lambda etl, path: (None, None) if path == flaky else read_and_transform(etl, path)
+        )
+        assert etl.process_directory(snapshots, incremental=True) == 39
+
+    assert etl.process_directory(snapshots, incremental=True) == 1
+    assert _count(etl, 'prices') == 40
+
+
+def test_interrupted_run_resumes_without_duplicates(tmp_path, make_etl, snapshots, monkeypatch):
+    _, expected = _load(tmp_path, 'clean', snapshots, incremental=True)
+
+    # The process dies while loading its third batch, which is never committed
+    etl = make_etl()
+    flush = ProductETL.flush
+    calls = []
+
+    def crashing_flush(self, commit=True):
+        calls.append(1)
+        if len(calls) >= 3:
+            raise KeyboardInterrupt
+        return flush(self, commit)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ProductETL, 'flush', crashing_flush)
+        with pytest.raises(KeyboardInterrupt):
+            etl.process_directory(snapshots, incremental=True)
+    etl.db_connection.rollback()
+    assert _count(etl, 'prices') == 16
+
+    # A new process picks up where the last committed batch left off
+    etl = make_etl()
+    assert etl.process_directory(snapshots, incremental=True) == 24
+    assert etl.process_directory(snapshots, incremental=True) == 0
+    assert _snapshot(str(tmp_path / 'incremental.db')) == expected
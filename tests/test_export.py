@@ -0,0 +1,93 @@
+import os
+
+import pyarrow.parquet as pq
+import pytest
+
+from database import _connect, _ensure_schema, insert_batch
+from export import ParquetExporter
+
+
+def _record(product_id, retailer, timestamp, price=99.99):
+    return {
+        'product_id': product_id, 'retailer': retailer, 'name': f'{retailer} {product_id}',
+        'current_price': price, 'original_price': 129.99, 'discount_percentage': 23.1, 'in_stock': True,
+        'rating': 4.5, 'review_count': 10, 'timestamp': timestamp,
+    }
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = _connect(db_path)
+    _ensure_schema(conn, db_path)
+    insert_batch(conn, [
+        _record('A1', 'Amazon', '2025-05-01T10:00:00'),
+        _record('A1', 'Amazon', '2025-05-02T10:00:00', price=89.99),
+        _record('W1', 'Walmart', '2025-05-01T11:00:00'),
+        _record('W1', 'Walmart', '2025-05-02T11:00:00', price=79.99),
+    ], change_only=True)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _partitions(root, table):
+    """Partition directory -> modification time of its file"""
+    files = {}
+    for directory, _, names in os.walk(os.path.join(root, table)):
+        for name in names:
+            files[os.path.relpath(directory, root)] = os.stat(os.path.join(directory, name)).st_mtime_ns
+    return files
+
+
+def test_round_trip(conn, tmp_path):
+    root = str(tmp_path / 'exports')
+    assert ParquetExporter(conn, root).export() == {'products': 2, 'prices': 4, 'reviews': 2}
+
+    prices = pq.read_table(os.path.join(root, 'prices')).to_pandas()
+    assert len(prices) == 4
+    rows = sorted(
+        (str(row.retailer), str(row.date), str(row.product_id), row.current_price, row.timestamp.isoformat())
+        for row in prices.itertuples()
+    )
+    assert rows == [
+        ('Amazon', '2025-05-01', 'A1', 99.99, '2025-05-01T10:00:00'),
+        ('Amazon', '2025-05-02', 'A1', 89.99, '2025-05-02T10:00:00'),
+        ('Walmart', '2025-05-01', 'W1', 99.99, '2025-05-01T11:00:00'),
+        ('Walmart', '2025-05-02', 'W1', 79.99, '2025-05-02T11:00:00'),
+    ]
+    assert prices['in_stock'].all()
+
+    products = pq.read_table(os.path.join(root, 'products')).to_pandas()
+    assert sorted(zip(products['retailer'].astype(str), products['product_id'])) == [('Amazon', 'A1'), ('Walmart', 'W1')]
+    # Ratings did not change: one change-only review row per product
+    assert len(pq.read_table(os.path.join(root, 'reviews'))) == 2
+
+
+def test_second_export_without_changes_writes_nothing(conn, tmp_path):
+    root = str(tmp_path / 'exports')
+    ParquetExporter(conn, root).export()
+    before = {table: _partitions(root, table) for table in ('products', 'prices', 'reviews')}
+
+    assert ParquetExporter(conn, root).export() == {'products': 0, 'prices': 0, 'reviews': 0}
+    assert {table: _partitions(root, table) for table in before} == before
+
+
+def test_last_seen_extension_rewrites_only_its_partition(conn, tmp_path):
+    root = str(tmp_path / 'exports')
+    ParquetExporter(conn, root).export()
+    before = _partitions(root, 'prices')
+
+    # Same values a day later: the 2025-05-02 Walmart row is extended, no row is added
+    insert_batch(conn, [_record('W1', 'Walmart', '2025-05-03T11:00:00', price=79.99)], change_only=True)
+    conn.commit()
+    written = ParquetExporter(conn, root).export()
+    assert (written['prices'], written['reviews']) == (1, 1)
+
+    after = _partitions(root, 'prices')
+    assert set(after) == set(before)
+    changed = {partition for partition in after if after[partition] != before[partition]}
+    assert changed == {os.path.join('prices', 'retailer=Walmart', 'date=2025-05-02')}
+
+    prices = pq.read_table(os.path.join(root, 'prices'), filters=[('retailer', '=', 'Walmart')]).to_pandas()
+    last_seen = sorted(value.isoformat() for value in prices['last_seen'])
+    assert last_seen == ['2025-05-01T11:00:00', '2025-05-03T11:00:00']
@@ -0,0 +1,68 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from scrapers import extraction
+from scrapers.extraction import ExtractionPlan
+from scrapers.parsers import parse_html
+
+PAGE = b"""
+<html><body>
+  <div id="main">
+    <h1 class="title">Primary title</h1>
+    <ul class="bullets">
+      <li class="a">one</li>
+      <li class="b">two</li>
+      <li class="a b">three</li>
+    </ul>
+    <span data-price="1">$10.00</span>
+    <p class="b">four</p>
+  </div>
+  <h2 class="alt-title">Fallback title</h2>
+</body></html>
+"""
+
+PLAN_SPEC = {
+    'title': ['h2.alt-title', 'h1.title', '#missing'],
+    'price': ['span[data-price]'],
+    'items': ['.b', 'li.a'],
+}
+
+
+def _texts(result, field):
+    return [element.get_text(strip=True) for element in result.candidates(field)]
+
+
+def _extract(plan, soup):
+    result = plan.execute(soup)
+    return {field: _texts(result, field) for field in PLAN_SPEC}
+
+
+@pytest.fixture
+def expected():
+    return {
+        'title': ['Fallback title', 'Primary title'],
+        'price': ['$10.00'],
+        'items': ['one', 'two', 'three', 'four'],
+    }
+
+
+def test_single_pass_plan(expected):
+    plan = ExtractionPlan(PLAN_SPEC, many=('items',))
+    assert plan.indexed
+    assert _extract(plan, BeautifulSoup(PAGE, 'html.parser')) == expected
+
+
+@pytest.mark.parametrize('backend', ['html.parser', 'lxml', 'selectolax'])
+def test_backends_agree(backend, expected):
+    plan = ExtractionPlan(PLAN_SPEC, many=('items',))
+    assert _extract(plan, parse_html(PAGE, backend=backend)) == expected
+
+
+def test_fallback_when_soupsieve_internals_change(monkeypatch, expected):
+    def broken_index(self, rule, compiled):
+        raise AttributeError("'SelectorList' object has no attribute 'selectors'")
+
+    monkeypatch.setattr(extraction.ExtractionPlan, '_index', broken_index)
+    plan = ExtractionPlan(PLAN_SPEC, many=('items',))
+    assert not plan.indexed
+    assert _extract(plan, BeautifulSoup(PAGE, 'html.parser')) == expected
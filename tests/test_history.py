@@ -0,0 +1,185 @@
+from datetime import datetime
+
+import pytest
+
+from database import (
+    _connect, _ensure_schema, compact_history, get_catalogue, get_price_history, get_product_latest,
+    insert_batch, insert_price, insert_product, insert_reviews, normalize_timestamp
+)
+from etl import ProductETL
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = _connect(db_path)
+    _ensure_schema(conn, db_path)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def product_row(conn):
+    return insert_product(conn, {'product_id': 'B0TEST0001', 'retailer': 'Amazon', 'name': 'Acme Headphones'})
+
+
+def _price(product_row, timestamp, price=199.99):
+    return {
+        'product_id': product_row, 'current_price': price, 'original_price': 249.99,
+        'discount_percentage': 20.0, 'in_stock': True, 'timestamp': timestamp,
+    }
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2025-05-20T17:43:35.148305', '2025-05-20T17:43:35.148305'),
+    ('2025-05-20 17:43:35.148305', '2025-05-20T17:43:35.148305'),
+    ('2025-05-20 17:43:35', '2025-05-20T17:43:35'),
+])
+def test_normalize_timestamp(value, expected):
+    assert normalize_timestamp(value) == expected
+
+
+def test_unparseable_timestamp_falls_back_to_now():
+    before = datetime.now().isoformat()
+    assert before <= normalize_timestamp('not a timestamp') <= datetime.now().isoformat()
+
+
+def test_malformed_timestamp_is_stored(conn, product_row):
+    insert_price(conn, _price(product_row, '20/05/2025 10:00'))
+    insert_price(conn, _price(product_row, 'yesterday', price=189.99))
+    assert len(get_price_history(conn, product_row)) == 2
+    assert conn.execute("SELECT sum(row_count) FROM price_rollups WHERE resolution = 'day'").fetchone()[0] == 2
+
+
+def test_malformed_timestamp_keeps_batch(conn):
+    record = {
+        'product_id': 'B0TEST0003', 'retailer': 'Amazon', 'name': 'Acme Lamp',
+        'current_price': 19.99, 'in_stock': True, 'rating': 4.0, 'review_count': 3,
+    }
+    written = insert_batch(conn, [
+        dict(record, timestamp='2025-05-20T10:00:00'),
+        dict(record, product_id='B0TEST0004', timestamp='not a timestamp'),
+    ])
+    conn.commit()
+    assert written == 2
+    assert conn.execute("SELECT count(*) FROM prices").fetchone()[0] == 2
+
+
+def test_change_only_is_opt_in():
+    assert ProductETL().change_only is False
+
+
+def test_change_only_with_mixed_separators(conn, product_row):
+    # ' ' sorts before 'T': unnormalized, the later snapshot would look older than the first row
+    insert_price(conn, _price(product_row, '2025-05-20T10:00:00'), change_only=True)
+    insert_price(conn, _price(product_row, '2025-05-20 11:00:00'), change_only=True)
+    insert_price(conn, _price(product_row, '2025-05-20 12:00:00', price=189.99), change_only=True)
+
+    rows = [(row['timestamp'], row['last_seen'], row['current_price']) for row in get_price_history(conn, product_row)]
+    assert rows == [
+        ('2025-05-20T12:00:00', '2025-05-20T12:00:00', 189.99),
+        ('2025-05-20T10:00:00', '2025-05-20T11:00:00', 199.99),
+    ]
+
+
+def test_batch_normalizes_timestamps(conn):
+    record = {
+        'product_id': 'B0TEST0002', 'retailer': 'Amazon', 'name': 'Acme Speaker',
+        'current_price': 49.99, 'in_stock': True, 'rating': 4.1, 'review_count': 10,
+    }
+    insert_batch(conn, [dict(record, timestamp='2025-05-20 10:00:00'), dict(record, timestamp='2025-05-20T11:00:00')], True)
+    conn.commit()
+    rows = conn.execute("SELECT timestamp, last_seen FROM prices").fetchall()
+    assert [tuple(row) for row in rows] == [('2025-05-20T10:00:00', '2025-05-20T11:00:00')]
+
+
+def _review(product_row, timestamp, rating=4.5, review_count=120):
+    return {'product_id': product_row, 'rating': rating, 'review_count': review_count, 'timestamp': timestamp}
+
+
+def _direct_latest(conn, product_id):
+    """The latest state of a product, queried from the history tables directly"""
+    price = conn.execute(
+        "SELECT current_price, original_price, discount_percentage, in_stock, coalesce(last_seen, timestamp) "
+        "FROM prices WHERE product_id = ? ORDER BY timestamp DESC, id DESC LIMIT 1", (product_id,)
+    ).fetchone() or (None,) * 5
+    review = conn.execute(
+        "SELECT rating, review_count, coalesce(last_seen, timestamp) "
+        "FROM reviews WHERE product_id = ? ORDER BY timestamp DESC, id DESC LIMIT 1", (product_id,)
+    ).fetchone() or (None,) * 3
+    last_seen = max(value for value in (price[4], review[2]) if value is not None)
+    return tuple(price[:4]) + tuple(review[:2]) + (last_seen,)
+
+
+def test_latest_tracks_inserts(conn, product_row):
+    assert get_product_latest(conn, product_row) is None
+
+    insert_price(conn, _price(product_row, '2025-05-20T10:00:00'))
+    assert tuple(get_product_latest(conn, product_row)) == (
+        199.99, 249.99, 20.0, 1, None, None, '2025-05-20T10:00:00'
+    )
+
+    insert_price(conn, _price(product_row, '2025-05-21T10:00:00', price=179.99))
+    # An older snapshot loaded late does not replace the latest state
+    insert_price(conn, _price(product_row, '2025-05-19T10:00:00', price=159.99))
+    insert_reviews(conn, _review(product_row, '2025-05-21T12:00:00'))
+    assert tuple(get_product_latest(conn, product_row)) == (
+        179.99, 249.99, 20.0, 1, 4.5, 120, '2025-05-21T12:00:00'
+    )
+    assert tuple(get_product_latest(conn, product_row)) == _direct_latest(conn, product_row)
+
+
+def test_latest_follows_change_only_extension(conn, product_row):
+    insert_price(conn, _price(product_row, '2025-05-20T10:00:00'), change_only=True)
+    insert_reviews(conn, _review(product_row, '2025-05-20T10:00:00'), change_only=True)
+    insert_price(conn, _price(product_row, '2025-05-22T10:00:00'), change_only=True)
+
+    assert conn.execute("SELECT count(*) FROM prices").fetchone()[0] == 1
+    latest = get_product_latest(conn, product_row)
+    assert (latest['current_price'], latest['rating'], latest['last_seen']) == (199.99, 4.5, '2025-05-22T10:00:00')
+
+    insert_reviews(conn, _review(product_row, '2025-05-23T10:00:00'), change_only=True)
+    assert get_product_latest(conn, product_row)['last_seen'] == '2025-05-23T10:00:00'
+
+
+def test_latest_follows_review_updates(conn, product_row):
+    insert_reviews(conn, _review(product_row, '2025-05-20T10:00:00'), change_only=True)
+    insert_reviews(conn, _review(product_row, '2025-05-21T10:00:00', rating=4.3, review_count=150), change_only=True)
+
+    latest = get_product_latest(conn, product_row)
+    assert (latest['current_price'], latest['rating'], latest['review_count']) == (None, 4.3, 150)
+    assert tuple(latest) == _direct_latest(conn, product_row)
+
+
+def test_latest_matches_history_after_compaction(conn):
+    products = [
+        ('B0CAT00001', 'Amazon', [(99.99, True), (99.99, True), (89.99, True), (89.99, True)]),
+        ('B0CAT00002', 'Walmart', [(19.99, True), (19.99, False), (19.99, False)]),
+        ('B0CAT00003', 'Walmart', [(5.49, True), (5.49, True), (5.49, True)]),
+    ]
+    for day in range(4):
+        insert_batch(conn, [
+            {
+                'product_id': product_id, 'retailer': retailer, 'name': product_id,
+                'current_price': snapshots[day][0], 'in_stock': snapshots[day][1],
+                'rating': 4.0, 'review_count': 10 + day // 2,
+                'timestamp': f'2025-05-2{day}T10:00:00',
+            }
+            for product_id, retailer, snapshots in products if day < len(snapshots)
+        ])
+    conn.commit()
+
+    assert compact_history(conn, 'prices') == 5
+    assert compact_history(conn, 'reviews') == 4
+
+    row_ids = [row[0] for row in conn.execute("SELECT id FROM products ORDER BY id")]
+    for row_id in row_ids:
+        assert tuple(get_product_latest(conn, row_id)) == _direct_latest(conn, row_id)
+
+    catalogue = get_catalogue(conn)
+    assert [row['id'] for row in catalogue] == row_ids
+    assert [(row['product_id'], row['current_price'], row['last_seen']) for row in catalogue] == [
+        ('B0CAT00001', 89.99, '2025-05-23T10:00:00'),
+        ('B0CAT00002', 19.99, '2025-05-22T10:00:00'),
+        ('B0CAT00003', 5.49, '2025-05-22T10:00:00'),
+    ]
+    assert [row['product_id'] for row in get_catalogue(conn, retailer='Walmart', in_stock_only=True)] == ['B0CAT00003']
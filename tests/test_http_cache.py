@@ -0,0 +1,142 @@
+import pytest
+import requests
+
+from scrapers.base_scraper import BaseScraper
+from scrapers.http_cache import HttpCache
+from scrapers.rate_limiter import RateLimiter
+
+URL = 'https://shop.example/item/ABC123456'
+
+
+def _response(status, body=b'', **headers):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.headers.update(headers)
+    return response
+
+
+class StubSession:
+    """Session returning queued responses and recording the headers of each request"""
+
+    def __init__(self, *responses):
+        self.headers = {}
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers or {})
+        return self.responses.pop(0)
+
+
+class StubScraper(BaseScraper):
+    def __init__(self, **kwargs):
+        super().__init__('Stub', base_delay=0, jitter=0, **kwargs)
+        self.extractions = 0
+
+    def extract_product_data(self, soup, url):
+        self.extractions += 1
+        return {'name': soup.select_one('h1').get_text(strip=True)}
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = HttpCache(str(tmp_path / 'http_cache.db'), clock=clock)
+    yield cache
+    cache.close()
+
+
+def test_not_modified_returns_stored_body(cache, clock):
+    body, changed = cache.update(URL, _response(200, b'<h1>v1</h1>', ETag='"v1"', **{'Last-Modified': 'Tue, 20 May 2025 17:00:00 GMT'}))
+    assert (body, changed) == (b'<h1>v1</h1>', True)
+    assert cache.revalidation_headers(URL) == {
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': 'Tue, 20 May 2025 17:00:00 GMT',
+    }
+
+    clock.advance(7200)
+    assert cache.get_fresh(URL, 3600) is None
+    assert cache.update(URL, _response(304)) == (b'<h1>v1</h1>', False)
+    # Revalidation makes the stored body fresh again
+    assert cache.get_fresh(URL, 3600) == b'<h1>v1</h1>'
+
+
+def test_not_modified_without_stored_entry(cache):
+    assert cache.update(URL, _response(304)) == (None, None)
+    assert cache.update(URL, _response(500, b'oops')) == (None, None)
+    assert cache.get(URL) is None
+
+
+def test_new_body_clears_stored_product(cache):
+    cache.update(URL, _response(200, b'<h1>v1</h1>'))
+    cache.put_product(URL, {'name': 'v1'})
+    assert cache.get_product(URL) == {'name': 'v1'}
+
+    cache.update(URL, _response(200, b'<h1>v2</h1>'))
+    assert cache.get_product(URL) is None
+
+
+def test_scraper_reuses_product_for_unchanged_page(tmp_path, cache, clock):
+    session = StubSession(
+        _response(200, b'<html><h1>Acme Kettle</h1></html>', ETag='"v1"'),
+        _response(304),
+        _response(200, b'<html><h1>Acme Kettle 2</h1></html>', ETag='"v2"'),
+    )
+    scraper = StubScraper(
+        save_dir=str(tmp_path), session=session, http_cache=cache, rate_limiter=RateLimiter(clock=clock)
+    )
+
+    assert scraper.get_product(URL)['name'] == 'Acme Kettle'
+    assert session.requests[0].get('If-None-Match') is None
+
+    # Stale everywhere: the page is revalidated, comes back 304 and is not parsed again
+    scraper.cache.clear()
+    clock.advance(scraper.cache_expiry)
+    product = scraper.get_product(URL)
+    assert product['name'] == 'Acme Kettle'
+    assert session.requests[1]['If-None-Match'] == '"v1"'
+    assert scraper.extractions == 1
+
+    scraper.cache.clear()
+    clock.advance(scraper.cache_expiry)
+    assert scraper.get_product(URL)['name'] == 'Acme Kettle 2'
+    assert scraper.extractions == 2
+
+
+def test_prune_drops_old_entries(tmp_path, clock):
+    cache = HttpCache(str(tmp_path / 'http_cache.db'), max_age=3600, clock=clock)
+    cache.update('https://shop.example/old', _response(200, b'old'))
+    clock.advance(1800)
+    cache.update('https://shop.example/new', _response(200, b'new'))
+    clock.advance(1801)
+
+    assert cache.prune() == 1
+    assert cache.get('https://shop.example/old') is None
+    assert cache.get('https://shop.example/new')['body'] == b'new'
+    cache.close()
+
+
+def test_prune_caps_rows_every_few_writes(tmp_path, clock):
+    cache = HttpCache(str(tmp_path / 'http_cache.db'), max_rows=3, prune_every=5, clock=clock)
+    for i in range(4):
+        cache.update(f"https://shop.example/{i}", _response(200, b'page'))
+        clock.advance(1)
+    # Not pruned yet: only four responses were stored
+    assert cache.conn.execute("SELECT count(*) FROM responses").fetchone()[0] == 4
+
+    cache.update('https://shop.example/4', _response(200, b'page'))
+    urls = [row[0] for row in cache.conn.execute("SELECT url FROM responses ORDER BY fetched_at")]
+    assert urls == ['https://shop.example/2', 'https://shop.example/3', 'https://shop.example/4']
+    cache.close()
+
+
+def test_prune_on_open(tmp_path, clock):
+    path = str(tmp_path / 'http_cache.db')
+    cache = HttpCache(path, clock=clock)
+    cache.update(URL, _response(200, b'page'))
+    cache.close()
+
+    clock.advance(8 * 24 * 3600)
+    cache = HttpCache(path, clock=clock)
+    assert cache.get(URL) is None
+    cache.close()
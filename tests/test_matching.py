@@ -0,0 +1,77 @@
+import itertools
+
+import pytest
+
+from database import _connect, _ensure_schema, insert_product
+from matching import normalize_brand, rebuild_matches
+
+IPHONES = [
+    {'product_id': 'W256', 'retailer': 'Walmart', 'name': 'Apple iPhone 16 Pro Max 256GB Desert Titanium', 'brand': 'Apple'},
+    {'product_id': 'T128', 'retailer': 'Target', 'name': 'Apple iPhone 16 Pro Max 128GB Desert Titanium', 'brand': 'Apple'},
+    {'product_id': 'NPLAIN', 'retailer': 'Newegg', 'name': 'Apple iPhone 16 Pro Max Desert Titanium', 'brand': 'Apple'},
+]
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = _connect(db_path)
+    _ensure_schema(conn, db_path)
+    yield conn
+    conn.close()
+
+
+def _groups(conn):
+    """Sets of retailer product ids that ended up in the same group"""
+    groups = {}
+    for product_id, group_id in conn.execute(
+        "SELECT p.product_id, m.group_id FROM product_matches m JOIN products p ON p.id = m.product_id"
+    ):
+        groups.setdefault(group_id, set()).add(product_id)
+    return sorted(groups.values(), key=sorted)
+
+
+def _assert_variants_apart(groups):
+    for group in groups:
+        assert not {'W256', 'T128'} <= group
+
+
+@pytest.mark.parametrize('order', list(itertools.permutations(range(len(IPHONES)))))
+def test_groups_never_join_conflicting_variants(conn, order):
+    for position in order:
+        insert_product(conn, IPHONES[position])
+
+    groups = _groups(conn)
+    _assert_variants_apart(groups)
+    # The listing without a storage size joins one of the two variants
+    assert len(groups) == 2
+
+    rebuild_matches(conn)
+    _assert_variants_apart(_groups(conn))
+
+
+def test_matching_listings_are_grouped(conn):
+    insert_product(conn, {'product_id': 'A1', 'retailer': 'Amazon', 'name': 'Sony WH-1000XM5 Wireless Headphones, Black', 'brand': 'Sony'})
+    insert_product(conn, {'product_id': 'B1', 'retailer': 'Walmart', 'name': 'Sony WH1000XM5 Wireless Noise Canceling Headphones Black', 'brand': 'SONY'})
+    insert_product(conn, {'product_id': 'C1', 'retailer': 'Target', 'name': 'Sony WH-1000XM4 Wireless Headphones, Black', 'brand': 'Sony'})
+    assert _groups(conn) == [{'A1', 'B1'}, {'C1'}]
+
+
+@pytest.mark.parametrize('brand, expected', [
+    ('Visit the Apple Store', 'apple'),     # Amazon #bylineInfo
+    ('Brand: SAMSUNG', 'samsung'),          # Amazon #bylineInfo, older layout
+    ('Visit the Hewlett-Packard Store', 'hp'),
+    ('SAMSUNG Electronics, Inc.', 'samsung'),
+    ('Apple', 'apple'),                     # Walmart / Target JSON-LD
+    ('by Sony', 'sony'),
+    ('Store Brand Co', 'store brand'),
+    (None, ''),
+])
+def test_normalize_brand(brand, expected):
+    assert normalize_brand(brand) == expected
+
+
+def test_amazon_byline_brands_match_other_retailers(conn):
+    insert_product(conn, {'product_id': 'B0DGHZ1MC2', 'retailer': 'Amazon', 'name': 'Apple iPhone 16 Pro Max 256GB Desert Titanium', 'brand': 'Visit the Apple Store'})
+    insert_product(conn, {'product_id': '5689919121', 'retailer': 'Walmart', 'name': 'Apple iPhone 16 Pro Max, 256GB, Desert Titanium', 'brand': 'Apple'})
+    insert_product(conn, {'product_id': 'A-93179365', 'retailer': 'Target', 'name': 'iPhone 16 Pro Max 256GB Desert Titanium', 'brand': 'Brand: Apple'})
+    assert _groups(conn) == [{'B0DGHZ1MC2', '5689919121', 'A-93179365'}]
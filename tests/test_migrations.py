@@ -0,0 +1,159 @@
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import database
+from database import MIGRATIONS, _connect, _ensure_schema
+from matching import get_matches
+
+BUNDLED_DB = Path(__file__).resolve().parent.parent / 'database' / 'amazon_products.db'
+
+# The schema as it was before any migration: product_id alone is UNIQUE, no last_seen,
+# no rollup, latest-state, search or matching tables, and ' '-separated timestamps
+BASELINE_SCHEMA = '''
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id TEXT UNIQUE,
+    retailer TEXT,
+    name TEXT,
+    brand TEXT,
+    category TEXT,
+    url TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE prices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id INTEGER,
+    current_price REAL,
+    original_price REAL,
+    discount_percentage REAL,
+    in_stock BOOLEAN,
+    timestamp TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_id) REFERENCES products (id)
+);
+CREATE TABLE reviews (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id INTEGER,
+    rating REAL,
+    review_count INTEGER,
+    timestamp TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_id) REFERENCES products (id)
+);
+'''
+
+BASELINE_PRODUCTS = [
+    (1, 'B0IPHONE16', 'Amazon', 'Apple iPhone 16 128GB Black', 'Visit the Apple Store'),
+    (2, '320145', 'Currys', 'APPLE iPhone 16 - 128 GB, Black', 'APPLE'),
+    (3, 'B0IPHONE16L', 'Amazon', 'Apple iPhone 16 256GB Black', 'Visit the Apple Store'),
+]
+
+BASELINE_PRICES = [
+    (1, 799.0, 799.0, 0.0, 1, '2025-05-19 09:00:00'),
+    (1, 749.0, 799.0, 6.3, 1, '2025-05-20 09:00:00.123456'),
+    (2, 779.0, 799.0, 2.5, 0, '2025-05-20T10:00:00'),
+    (3, 999.0, 999.0, 0.0, 1, '2025-05-20 11:00:00'),
+]
+
+
+@pytest.fixture
+def baseline_db(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany("INSERT INTO products (id, product_id, retailer, name, brand) VALUES (?, ?, ?, ?, ?)", BASELINE_PRODUCTS)
+    conn.executemany(
+        "INSERT INTO prices (product_id, current_price, original_price, discount_percentage, in_stock, timestamp) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        BASELINE_PRICES
+    )
+    conn.execute("INSERT INTO reviews (product_id, rating, review_count, timestamp) VALUES (1, 4.6, 120, '2025-05-20 09:00:00')")
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def _migrated(path):
+    conn = _connect(path)
+    _ensure_schema(conn, path)
+    assert path in database._schema_ready
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+    return conn
+
+
+def test_baseline_database_migrates(baseline_db):
+    conn = _migrated(baseline_db)
+
+    # user-013: products are keyed on (product_id, retailer) with their row ids kept
+    assert [tuple(row) for row in conn.execute("SELECT id, product_id, retailer FROM products ORDER BY id")] == [
+        product[:3] for product in BASELINE_PRODUCTS
+    ]
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(prices)")}
+    assert 'idx_prices_product_timestamp' in indexes
+
+    # user-015 and the timestamp fix: last_seen is filled and every timestamp uses 'T'
+    rows = conn.execute("SELECT timestamp, last_seen FROM prices ORDER BY id").fetchall()
+    assert [row[0] for row in rows] == [
+        '2025-05-19T09:00:00', '2025-05-20T09:00:00.123456', '2025-05-20T10:00:00', '2025-05-20T11:00:00'
+    ]
+    assert all(row[0] == row[1] for row in rows)
+    assert conn.execute("SELECT timestamp, last_seen FROM reviews").fetchone()[0] == '2025-05-20T09:00:00'
+
+    # user-020: daily rollups are built from the existing history
+    days = conn.execute(
+        "SELECT bucket_start, open, close FROM price_rollups WHERE product_id = 1 AND resolution = 'day' ORDER BY bucket_start"
+    ).fetchall()
+    assert [(row[1], row[2]) for row in days] == [(799.0, 799.0), (749.0, 749.0)]
+
+    # user-021: product_latest holds the newest price and review of each product
+    latest = database.get_product_latest(conn, 1)
+    assert (latest['current_price'], latest['rating'], latest['last_seen']) == (749.0, 4.6, '2025-05-20T09:00:00.123456')
+    assert database.get_product_latest(conn, 2)['in_stock'] == 0
+
+    # user-022: existing products are in the full-text index
+    assert [row['id'] for row in database.search_products(conn, '256GB')] == [3]
+
+    # user-023: the two 128GB listings match; the 256GB one stays apart
+    assert [row['id'] for row in get_matches(conn, 1)] == [2]
+    assert get_matches(conn, 3) == []
+
+    # user-013: the same retailer product id at another retailer is another product
+    product_id = database.insert_product(conn, {'product_id': 'B0IPHONE16', 'retailer': 'Currys', 'name': 'Acme Speaker'})
+    assert product_id not in (1, 2, 3)
+    conn.close()
+
+
+def test_migrations_are_idempotent(baseline_db):
+    conn = _migrated(baseline_db)
+    before = {
+        table: conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall()
+        for table in ('products', 'prices', 'reviews', 'price_rollups', 'product_latest', 'product_matches')
+    }
+
+    for migration in MIGRATIONS:
+        migration(conn)
+    conn.commit()
+    database._schema_ready.discard(baseline_db)
+    _ensure_schema(conn, baseline_db)
+
+    for table, rows in before.items():
+        assert conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall() == rows, table
+    conn.close()
+
+
+def test_bundled_database_migrates(tmp_path):
+    path = str(tmp_path / 'amazon_products.db')
+    shutil.copyfile(BUNDLED_DB, path)
+    try:
+        conn = _migrated(path)
+        products = conn.execute("SELECT count(*) FROM products").fetchone()[0]
+        for table in ('product_latest', 'product_matches', 'product_signatures'):
+            assert conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] == products, table
+        assert conn.execute("SELECT count(*) FROM products_fts").fetchone()[0] == products
+        assert conn.execute("SELECT count(*) FROM prices WHERE last_seen IS NULL OR timestamp LIKE '____-__-__ %'").fetchone()[0] == 0
+        conn.close()
+    finally:
+        database._schema_ready.discard(path)
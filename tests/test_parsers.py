@@ -0,0 +1,101 @@
+import pytest
+
+from scrapers import TargetScraper, WalmartScraper, parsers
+from scrapers.parsers import PageRegions, PartialParseStats, parse_and_extract
+
+PAGE = b"""
+<html><body>
+  <h1 id="title">Widget</h1>
+  <div class="price">$5.00</div>
+  <div class="rating">4.5</div>
+</body></html>
+"""
+
+
+def extract(soup, url):
+    def text(selector):
+        element = soup.select_one(selector)
+        return element.get_text(strip=True) if element else None
+
+    return {'name': text('#title'), 'price': text('div.price'), 'rating': text('div.rating')}
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = PartialParseStats(audit_interval=2)
+    monkeypatch.setattr(parsers, 'partial_parse_stats', stats)
+    return stats
+
+
+def test_partial_parse_covering_every_field(stats):
+    regions = PageRegions(['#title', 'div.price', 'div.rating'])
+    for _ in range(2):
+        product = parse_and_extract(PAGE, 'u', extract, backend='html.parser', regions=regions)
+        assert product == {'name': 'Widget', 'price': '$5.00', 'rating': '4.5'}
+
+    summary = stats.summary()['unknown']
+    assert (summary['partial'], summary['fallbacks'], summary['audits']) == (2, 0, 1)
+    assert summary['missed'] == {}
+
+
+def test_missing_required_field_falls_back_to_full_parse(stats):
+    regions = PageRegions(['#title', 'div.rating'])
+    product = parse_and_extract(
+        PAGE, 'u', extract, backend='html.parser', regions=regions, required_fields=('price',), retailer='Shop'
+    )
+    assert product['price'] == '$5.00'
+    summary = stats.summary()['Shop']
+    assert summary['fallbacks'] == 1
+    assert summary['missed'] == {'price': 1}
+
+
+def test_audit_catches_fields_outside_the_regions(stats):
+    regions = PageRegions(['#title', 'div.price'])
+    first = parse_and_extract(PAGE, 'u', extract, backend='html.parser', regions=regions, required_fields=('name',))
+    assert first['rating'] is None
+
+    # The second partial parse is audited against a full parse
+    second = parse_and_extract(PAGE, 'u', extract, backend='html.parser', regions=regions, required_fields=('name',))
+    assert second['rating'] == '4.5'
+    summary = stats.summary()['unknown']
+    assert summary['empty'] == {'rating': 2}
+    assert summary['missed'] == {'rating': 1}
+
+
+# Product block surrounded by the data-testid / data-test markup modern retailer pages are full of
+NOISE = ''.join(
+    f'<div data-testid="carousel-{i}" data-test="tile-{i}"><h1 class="promo">Deal {i}</h1>'
+    f'<span data-test="tile-price">$1.00</span><button data-test="add-{i}">Add</button>'
+    f'<img data-testid="tile-image" src="{i}.jpg"></div>'
+    for i in range(50)
+)
+
+RETAILER_PAGES = {
+    'Walmart': f"""<html><body>{NOISE}
+      <h1 data-automation="product-title">Acme Kettle</h1>
+      <span itemprop="price">$24.99</span>
+      <img data-testid="primary-image" src="kettle.jpg">
+      <button data-testid="add-to-cart-button" class="btn">Add to cart</button>
+    {NOISE}</body></html>""",
+    'Target': f"""<html><body>{NOISE}
+      <h1 data-test="product-title">Acme Kettle</h1>
+      <span data-test="product-price">$24.99</span>
+      <img data-test="product-image" src="kettle.jpg">
+      <button data-test="shipItButton">Ship it</button>
+    {NOISE}</body></html>""",
+}
+
+
+@pytest.mark.parametrize('retailer', sorted(RETAILER_PAGES))
+def test_retailer_regions_skip_page_noise(retailer):
+    scraper = {'Walmart': WalmartScraper, 'Target': TargetScraper}[retailer](None, parser_backend='lxml')
+    page = RETAILER_PAGES[retailer].encode('utf-8')
+
+    partial = parsers.parse_html(page, 'lxml', scraper.regions)
+    assert len(partial.find_all(True)) == 4
+
+    product = scraper.extract_product_data(partial, 'https://shop.example/p')
+    assert product == scraper.extract_product_data(parsers.parse_html(page, 'lxml'), 'https://shop.example/p')
+    assert (product['name'], product['price'], product['image_url'], product['in_stock']) == (
+        'Acme Kettle', 24.99, 'kettle.jpg', True
+    )
@@ -0,0 +1,40 @@
+import time
+
+from database import ConnectionManager
+from etl import ProductETL
+from pipeline import StreamingPipeline
+
+
+def _records(raw_product, count):
+    return [dict(raw_product, product_id=f'B0TEST{i:04d}', name=f'Acme Product {i}') for i in range(count)]
+
+
+def test_close_loads_everything_queued(db_path, raw_product):
+    manager = ConnectionManager(db_path)
+    try:
+        pipeline = StreamingPipeline(ProductETL(batch_size=4, connection_manager=manager), flush_interval=60).start()
+        for record in _records(raw_product, 10):
+            pipeline.append(record)
+        pipeline.append({'name': 'No price or retailer'})
+        pipeline.close()
+
+        assert pipeline.stats() == {'received': 11, 'loaded': 10, 'rejected': 1, 'queued': 0}
+        assert manager.reader().execute("SELECT count(*) FROM products").fetchone()[0] == 10
+    finally:
+        manager.close()
+
+
+def test_records_are_committed_after_flush_interval(db_path, raw_product):
+    manager = ConnectionManager(db_path)
+    try:
+        pipeline = StreamingPipeline(ProductETL(batch_size=100, connection_manager=manager), flush_interval=0.2).start()
+        for record in _records(raw_product, 3):
+            pipeline.append(record)
+
+        deadline = time.monotonic() + 10
+        while pipeline.stats()['loaded'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert pipeline.stats()['loaded'] == 3
+        pipeline.close()
+    finally:
+        manager.close()
@@ -0,0 +1,164 @@
+import pytest
+import requests
+
+from proxy_manager import PROXY_ERRORS, NoProxyAvailable, ProxyManager
+
+
+@pytest.fixture
+def make_manager(clock):
+    managers = []
+
+    def make(proxies, **options):
+        options.setdefault('failure_threshold', 3)
+        manager = ProxyManager(proxy_list=proxies, base_cooldown=60, max_cooldown=600, clock=clock, **options)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.close()
+
+
+def test_breaker_trips_after_threshold(make_manager, clock):
+    manager = make_manager(['http://p1'])
+    for _ in range(2):
+        manager.report('http://p1', False)
+    assert manager.is_available('http://p1')
+
+    manager.report('http://p1', False)
+    assert not manager.is_available('http://p1')
+    assert manager.stats()['http://p1']['state'] == 'quarantined'
+    assert manager.get_proxy() is None
+
+    clock.advance(59)
+    assert not manager.is_available('http://p1')
+    clock.advance(1)
+    assert manager.is_available('http://p1')
+    assert manager.stats()['http://p1']['state'] == 'probing'
+
+
+def test_half_open_failure_retrips_with_doubled_cooldown(make_manager, clock):
+    manager = make_manager(['http://p1'])
+    cooldowns = []
+    for _ in range(3):
+        manager.report('http://p1', False)
+    cooldowns.append(manager.stats()['http://p1']['quarantine_left'])
+
+    for _ in range(4):
+        clock.advance(cooldowns[-1])
+        assert manager.is_available('http://p1')
+        # Half-open: a single failure is enough to go back into quarantine
+        manager.report('http://p1', False)
+        assert not manager.is_available('http://p1')
+        cooldowns.append(manager.stats()['http://p1']['quarantine_left'])
+
+    assert cooldowns == [60, 120, 240, 480, 600]
+
+
+def test_success_closes_the_breaker(make_manager, clock):
+    manager = make_manager(['http://p1'])
+    for _ in range(3):
+        manager.report('http://p1', False)
+    clock.advance(60)
+    manager.report('http://p1', True, latency=0.2)
+    assert manager.stats()['http://p1']['state'] == 'healthy'
+
+    # Closed again: it takes the full threshold to trip, and the cool-down starts over
+    for _ in range(2):
+        manager.report('http://p1', False)
+    assert manager.is_available('http://p1')
+    manager.report('http://p1', False)
+    assert manager.stats()['http://p1']['quarantine_left'] == 60
+
+
+def test_quarantined_proxies_are_not_handed_out(make_manager):
+    manager = make_manager(['http://p1', 'http://p2'])
+    for _ in range(3):
+        manager.report('http://p1', False)
+    assert {manager.get_proxy() for _ in range(50)} == {'http://p2'}
+    assert manager.summary() == {'total': 2, 'healthy': 1, 'probing': 0, 'quarantined': 1}
+
+
+def test_connection_failure_retries_through_another_proxy(make_manager, target_url, start_proxy, dead_proxy):
+    live, server = start_proxy()
+    manager = make_manager([dead_proxy, live])
+    session = manager.get_session(sticky=True)
+    session.proxy = dead_proxy  # Make the dead proxy the first one tried
+
+    response = session.get(f"{target_url}/ok", timeout=5)
+    assert response.status_code == 200
+    assert server.hits == 1
+    assert session.proxy == live
+
+    stats = manager.stats()
+    assert (stats[dead_proxy]['failures'], stats[live]['successes']) == (1, 1)
+
+
+def test_retries_give_up_after_max_attempts(make_manager, target_url, dead_proxy):
+    manager = make_manager([dead_proxy, dead_proxy.replace('http://', 'http://localhost.')])
+    with pytest.raises(PROXY_ERRORS):
+        manager.get_session().get(f"{target_url}/ok", timeout=5)
+
+
+def test_no_proxy_available_raises_instead_of_going_direct(make_manager, target_url, start_proxy):
+    live, server = start_proxy()
+    manager = make_manager([live])
+    for _ in range(3):
+        manager.report(live, False)
+
+    with pytest.raises(NoProxyAvailable):
+        manager.get_session().get(f"{target_url}/ok", timeout=5)
+    assert server.hits == 0
+
+
+def test_failed_proxy_is_not_replaced_by_direct_request(make_manager, target_url, dead_proxy):
+    manager = make_manager([dead_proxy])
+    with pytest.raises(PROXY_ERRORS) as error:
+        manager.get_session().get(f"{target_url}/ok", timeout=5)
+    assert not isinstance(error.value, NoProxyAvailable)
+
+
+def test_direct_fallback_is_opt_in_and_logged(make_manager, target_url, caplog):
+    manager = make_manager([])
+    response = manager.get_session(allow_direct=True).get(f"{target_url}/ok", timeout=5)
+    assert response.status_code == 200
+    assert "without a proxy" in caplog.text
+
+
+def test_session_waits_for_first_refresh(make_manager, target_url, start_proxy):
+    live, server = start_proxy()
+    manager = make_manager([], sources=[lambda: [live]], check_url=f"{target_url}/ok")
+
+    response = manager.get_session().get(f"{target_url}/ok", timeout=5)
+    assert response.status_code == 200
+    # One hit for the check, one for the request
+    assert server.hits == 2
+
+
+def test_captcha_pages_count_as_blocks(make_manager, target_url, start_proxy):
+    live, server = start_proxy()
+    manager = make_manager([live])
+    session = manager.get_session()
+
+    for _ in range(3):
+        response = session.get(f"{target_url}/captcha", timeout=5)
+        assert response.status_code == 200
+    assert server.hits == 3
+
+    stats = manager.stats()[live]
+    assert stats['blocks'] == 3
+    assert stats['state'] == 'quarantined'
+
+
+@pytest.mark.parametrize('status, body, blocked', [
+    (429, b'', True),
+    (403, b'', True),
+    (200, b'<html>Robot or human?</html>', True),
+    (200, b'<html>Apple iPhone 16</html>', False),
+    (404, b'captcha', False),
+])
+def test_is_blocked(make_manager, status, body, blocked):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    assert make_manager(['http://p1']).is_blocked(response) is blocked
@@ -0,0 +1,91 @@
+import pytest
+import requests
+
+import proxy_manager
+from proxy_manager import ProxyManager
+
+
+@pytest.fixture
+def make_manager(target_url):
+    managers = []
+
+    def make(sources, **options):
+        options.setdefault('auto_refresh', False)
+        manager = ProxyManager(sources=sources, check_url=f"{target_url}/ip", check_timeout=2, **options)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.close()
+
+
+def test_only_responsive_proxies_are_promoted(make_manager, start_proxy, dead_proxy):
+    live, server = start_proxy()
+    manager = make_manager([lambda: [dead_proxy, live]])
+    assert manager.proxy_list == []
+
+    assert manager.refresh_proxies() == 1
+    assert manager.proxy_list == [live]
+    assert server.hits == 1
+    assert manager.get_proxy() == live
+
+
+def test_proxies_that_stop_answering_are_dropped(make_manager, start_proxy):
+    live, server = start_proxy()
+    candidates = [live]
+    manager = make_manager([lambda: list(candidates)])
+    assert manager.refresh_proxies() == 1
+
+    server.shutdown()
+    server.server_close()
+    candidates.clear()
+    assert manager.refresh_proxies() == 0
+    assert manager.proxy_list == []
+
+
+def test_pinned_proxies_survive(make_manager, start_proxy, dead_proxy):
+    live, _ = start_proxy()
+    manager = make_manager([lambda: [live]], proxy_list=[dead_proxy])
+    assert manager.proxy_list == [dead_proxy]
+
+    assert manager.refresh_proxies() == 1
+    assert manager.proxy_list == [dead_proxy, live]
+
+
+def test_failing_source_is_skipped(make_manager, start_proxy):
+    live, _ = start_proxy()
+
+    def broken_source():
+        raise requests.exceptions.ConnectionError("proxy list is down")
+
+    manager = make_manager([broken_source, lambda: [live]])
+    assert manager.refresh_proxies() == 1
+    assert manager.proxy_list == [live]
+
+
+def test_construction_does_no_network_io(make_manager, start_proxy, monkeypatch):
+    live, server = start_proxy()
+    calls = []
+
+    def source():
+        calls.append('source')
+        return [live]
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("network I/O during construction")
+
+    monkeypatch.setattr(proxy_manager.requests, 'get', no_network)
+    manager = make_manager([source])
+    assert manager.thread is None
+    assert calls == []
+    assert server.hits == 0
+
+
+def test_background_refresh(make_manager, start_proxy, dead_proxy):
+    live, _ = start_proxy()
+    manager = make_manager([lambda: [dead_proxy, live]], auto_refresh=True)
+    assert manager.wait_ready(timeout=10)
+    assert manager.proxy_list == [live]
+    manager.close()
+    assert manager.thread is None
@@ -0,0 +1,67 @@
+import pytest
+
+from scrapers.rate_limiter import RateLimiter, TokenBucket, parse_retry_after
+
+
+@pytest.fixture
+def limiter(clock):
+    return RateLimiter(default_interval=2.0, clock=clock)
+
+
+def test_requests_are_spaced_by_interval(limiter, clock):
+    assert [limiter.reserve('a.example') for _ in range(3)] == [0.0, 2.0, 4.0]
+    clock.advance(4.0)
+    assert limiter.reserve('a.example') == 2.0
+
+
+def test_burst_then_steady_rate(clock):
+    bucket = TokenBucket(1.0, burst=3, now=clock())
+    assert [bucket.reserve(clock()) for _ in range(4)] == [0.0, 0.0, 0.0, 1.0]
+    clock.advance(10)
+    # Refill is capped at the burst size
+    assert [bucket.reserve(clock()) for _ in range(4)] == [0.0, 0.0, 0.0, 1.0]
+
+
+def test_hosts_do_not_share_budgets(limiter):
+    assert limiter.reserve('a.example') == 0.0
+    assert limiter.reserve('b.example') == 0.0
+    assert limiter.reserve('a.example', interval=10) == 2.0
+
+
+def test_penalty_releases_queue_one_interval_apart(limiter, clock):
+    limiter.configure('a.example', burst=3)
+    limiter.reserve('a.example')
+    limiter.penalize('a.example', 60)
+
+    # Requests queued during the block go out one interval apart once it ends
+    clock.advance(10)
+    waits = [limiter.reserve('a.example') for _ in range(3)]
+    assert waits == [52.0, 54.0, 56.0]
+
+    # Waiting out the block does not refill the burst either
+    clock.advance(50)
+    assert limiter.reserve('a.example') == 8.0
+
+
+def test_penalty_never_shortens_a_block(limiter, clock):
+    limiter.penalize('a.example', 60)
+    limiter.penalize('a.example', 5)
+    assert limiter.reserve('a.example') == 62.0
+
+
+def test_refill_resumes_after_block(limiter, clock):
+    limiter.configure('a.example', burst=2)
+    limiter.penalize('a.example', 30)
+    clock.advance(30 + 2 * 2.0)
+    assert [limiter.reserve('a.example') for _ in range(3)] == [0.0, 0.0, 2.0]
+
+
+@pytest.mark.parametrize('value, seconds', [
+    ('120', 120.0),
+    (' 5 ', 5.0),
+    ('Wed, 21 Oct 2015 07:28:00 GMT', 0.0),
+    ('soon', None),
+    (None, None),
+])
+def test_parse_retry_after(value, seconds):
+    assert parse_retry_after(value) == seconds
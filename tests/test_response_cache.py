@@ -0,0 +1,111 @@
+import os
+import threading
+
+import pytest
+
+from scrapers.response_cache import ResponseCache
+
+
+def _page(size=1000):
+    # Random bytes do not compress, so every entry costs about `size` bytes
+    return os.urandom(size)
+
+
+@pytest.fixture
+def cache(clock):
+    return ResponseCache(max_bytes=3500, ttl=60, clock=clock)
+
+
+def test_round_trip(cache):
+    body = b'<html>' + b'a' * 10000 + b'</html>'
+    cache.put('u', body)
+    assert cache.get('u') == body
+    assert cache.stats()['bytes'] < len(body)
+
+
+def test_lru_eviction_by_byte_budget(cache):
+    pages = {url: _page() for url in 'abcd'}
+    for url in 'abc':
+        cache.put(url, pages[url])
+    assert len(cache) == 3
+
+    # Reading 'a' makes 'b' the least recently used
+    assert cache.get('a') == pages['a']
+    cache.put('d', pages['d'])
+    assert cache.get('b') is None
+    assert [cache.get(url) for url in 'acd'] == [pages['a'], pages['c'], pages['d']]
+
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['bytes'] <= stats['max_bytes']
+
+
+def test_replacing_an_entry_releases_its_bytes(cache):
+    cache.put('a', _page())
+    size = cache.stats()['bytes']
+    cache.put('a', _page())
+    assert cache.stats()['bytes'] == size
+    assert len(cache) == 1
+
+
+def test_oversized_body_is_not_cached(cache):
+    cache.put('big', _page(5000))
+    assert cache.get('big') is None
+    assert cache.stats()['bytes'] == 0
+
+
+def test_entries_expire_after_ttl(cache, clock):
+    cache.put('a', b'page')
+    clock.advance(59)
+    assert cache.get('a') == b'page'
+    clock.advance(1)
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+    assert cache.stats()['bytes'] == 0
+
+
+def test_expired_entries_go_before_live_ones(cache, clock):
+    cache.put('old', _page())
+    clock.advance(30)
+    cache.put('b', _page())
+    cache.put('c', _page())
+    clock.advance(30)
+
+    # 'old' is the LRU entry anyway, but it is dropped as expired, not evicted
+    cache.put('old2', _page())
+    cache.put('d', _page())
+    stats = cache.stats()
+    assert (stats['expirations'], stats['evictions']) == (1, 1)
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+
+
+def test_purge_expired(cache, clock):
+    cache.put('a', b'page')
+    clock.advance(30)
+    cache.put('b', b'page')
+    clock.advance(30)
+    assert cache.purge_expired() == 1
+    assert len(cache) == 1
+
+
+def test_threads_share_the_cache():
+    cache = ResponseCache(max_bytes=10 * 1024 * 1024)
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(200):
+                body = f"<html>{n}-{i}</html>".encode() * 50
+                cache.put(f"{n}/{i}", body)
+                assert cache.get(f"{n}/{i}") == body
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(cache) == 1600
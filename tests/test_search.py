@@ -0,0 +1,41 @@
+import pytest
+
+from database import _connect, _ensure_schema, get_product, insert_product, search_products
+
+PRODUCTS = [
+    {'product_id': 'B0S24', 'retailer': 'Amazon', 'name': 'Samsung Galaxy S24 Smartphone', 'brand': 'Visit the Samsung Store'},
+    {'product_id': 'P0PIX', 'retailer': 'Target', 'name': 'Google Pixel 9 Pro', 'brand': 'Google Store', 'category': 'Phones'},
+    {'product_id': 'W0POT', 'retailer': 'Walmart', 'name': 'Instant Pot Duo', 'brand': 'Instant', 'category': 'Store Exclusive'},
+]
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = _connect(db_path)
+    _ensure_schema(conn, db_path)
+    for product in PRODUCTS:
+        insert_product(conn, product)
+    yield conn
+    conn.close()
+
+
+def _names(rows):
+    return sorted(row['name'] for row in rows)
+
+
+def test_get_product_matches_the_name_only(conn):
+    assert _names(get_product(conn, name='Store')) == []
+    assert _names(get_product(conn, name='sams gal')) == ['Samsung Galaxy S24 Smartphone']
+    assert _names(get_product(conn, name='pixel', retailer='Target')) == ['Google Pixel 9 Pro']
+    assert _names(get_product(conn, name='pixel', retailer='Amazon')) == []
+
+
+def test_get_product_has_no_infix_matches(conn):
+    assert _names(get_product(conn, name='hone')) == []
+
+
+def test_search_products_covers_brand_and_category(conn):
+    assert _names(search_products(conn, 'store')) == [
+        'Google Pixel 9 Pro', 'Instant Pot Duo', 'Samsung Galaxy S24 Smartphone'
+    ]
+    assert search_products(conn, 'phone')[0]['name'] == 'Google Pixel 9 Pro'
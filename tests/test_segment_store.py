@@ -0,0 +1,132 @@
+import os
+import shutil
+
+import pytest
+
+import segment_store
+from segment_store import SegmentWriter, list_segments, read_index, read_segments
+
+
+def _record(i, day=1):
+    return {'product_id': f'P{i}', 'timestamp': f'2025-05-{day:02d}T12:00:{i % 60:02d}'}
+
+
+def _files(directory, suffix):
+    return sorted(name for name in os.listdir(directory) if name.endswith(suffix))
+
+
+def _crash(writer):
+    """Stop a writer the way a killed process would: the open segment stays, its lock is released"""
+    writer.file.close()
+    writer.lock_file.close()
+    writer.file = writer.lock_file = None
+
+
+def test_rotate_seals_and_indexes(tmp_path):
+    writer = SegmentWriter(str(tmp_path))
+    for i in range(3):
+        writer.append(_record(i))
+    assert len(_files(tmp_path, segment_store.OPEN_SUFFIX)) == 1
+    writer.rotate()
+
+    index = read_index(str(tmp_path))
+    assert len(index) == 1
+    assert index[0]['file'].endswith(segment_store.SEALED_SUFFIX)
+    assert (index[0]['records'], index[0]['start'], index[0]['end']) == (
+        3, '2025-05-01T12:00:00', '2025-05-01T12:00:02'
+    )
+    assert _files(tmp_path, segment_store.OPEN_SUFFIX) == []
+    assert _files(tmp_path, segment_store.LOCK_SUFFIX) == ['index.json.lock']
+    assert [r['product_id'] for r in read_segments(str(tmp_path))] == ['P0', 'P1', 'P2']
+
+
+def test_size_rotation_and_time_range(tmp_path):
+    writer = SegmentWriter(str(tmp_path), max_bytes=1)
+    for day in (1, 2, 3):
+        writer.append(_record(day, day))
+    writer.close()
+
+    assert [entry['records'] for entry in read_index(str(tmp_path))] == [1, 1, 1]
+    assert len(list_segments(str(tmp_path), start='2025-05-02', end='2025-05-02T23:59')) == 1
+    assert [r['product_id'] for r in read_segments(str(tmp_path), start='2025-05-02')] == ['P2', 'P3']
+
+
+def test_recovers_crashed_writer_and_drops_torn_line(tmp_path):
+    writer = SegmentWriter(str(tmp_path))
+    writer.append(_record(0))
+    writer.append(_record(1))
+    writer.file.write(b'{"product_id": "P2", "timest')
+    _crash(writer)
+
+    # The torn line is skipped when reading the open segment
+    assert [r['product_id'] for r in read_segments(str(tmp_path), include_open=True)] == ['P0', 'P1']
+
+    SegmentWriter(str(tmp_path))
+    index = read_index(str(tmp_path))
+    assert [entry['records'] for entry in index] == [2]
+    assert [r['product_id'] for r in read_segments(str(tmp_path))] == ['P0', 'P1']
+    assert _files(tmp_path, segment_store.OPEN_SUFFIX) == []
+    assert _files(tmp_path, segment_store.LOCK_SUFFIX) == ['index.json.lock']
+
+
+def test_live_writer_segment_is_not_recovered(tmp_path):
+    live = SegmentWriter(str(tmp_path))
+    live.append(_record(0))
+
+    SegmentWriter(str(tmp_path))
+    assert read_index(str(tmp_path)) == []
+    assert len(_files(tmp_path, segment_store.OPEN_SUFFIX)) == 1
+
+    live.append(_record(1))
+    live.rotate()
+    assert [entry['records'] for entry in read_index(str(tmp_path))] == [2]
+
+
+def test_crash_before_index_keeps_records(tmp_path, monkeypatch):
+    writer = SegmentWriter(str(tmp_path))
+    writer.append(_record(0))
+
+    def crash(directory, index):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(segment_store, '_write_index', crash)
+    with pytest.raises(OSError):
+        writer.rotate()
+    monkeypatch.undo()
+    writer.lock_file.close()
+
+    # The compressed copy exists but is not indexed; the open file is still there
+    assert len(_files(tmp_path, segment_store.SEALED_SUFFIX)) == 1
+    assert len(_files(tmp_path, segment_store.OPEN_SUFFIX)) == 1
+
+    SegmentWriter(str(tmp_path))
+    assert [entry['records'] for entry in read_index(str(tmp_path))] == [1]
+    assert [r['product_id'] for r in read_segments(str(tmp_path))] == ['P0']
+    assert _files(tmp_path, segment_store.OPEN_SUFFIX) == []
+
+
+def test_crash_after_index_does_not_duplicate(tmp_path):
+    writer = SegmentWriter(str(tmp_path))
+    writer.append(_record(0))
+    open_path = writer.path
+    shutil.copy(open_path, str(tmp_path / 'kept'))
+    writer.rotate()
+    # Stopped after indexing, before removing the open file
+    os.replace(str(tmp_path / 'kept'), open_path)
+
+    assert [r['product_id'] for r in read_segments(str(tmp_path), include_open=True)] == ['P0']
+
+    SegmentWriter(str(tmp_path))
+    assert len(read_index(str(tmp_path))) == 1
+    assert _files(tmp_path, segment_store.OPEN_SUFFIX) == []
+
+
+def test_removes_empty_leftovers(tmp_path):
+    (tmp_path / 'segment-20250501T000000000000-1.ndjson').write_bytes(b'')
+    (tmp_path / 'segment-20250501T000001000000-1.ndjson').write_bytes(b'{"product_id": "P0", "ti')
+    (tmp_path / 'segment-20250501T000001000000-1.ndjson.gz.tmp').write_bytes(b'partial')
+    (tmp_path / 'segment-20250501T000002000000-1.lock').write_bytes(b'')
+
+    SegmentWriter(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == []
+    assert read_index(str(tmp_path)) == []
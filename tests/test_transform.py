@@ -0,0 +1,74 @@
+import math
+import random
+
+import pytest
+
+from etl import ProductETL
+
+RETAILERS = ('Amazon', 'Walmart', 'Newegg', 'Target')
+
+
+def _price(rng):
+    value = round(rng.uniform(5, 2500), 2)
+    return rng.choice((value, int(value), f"${value:,.2f}", f"{value:.2f}", f"£{value:,.2f}", None))
+
+
+def _record(rng, number):
+    record = {
+        'product_id': rng.choice((f"P{number:06d}", None)),
+        'retailer': rng.choice(RETAILERS),
+        'name': f"Product {number}",
+        'url': f"https://example.com/p/{number}",
+        rng.choice(('current_price', 'price', 'sale_price')): _price(rng),
+        'timestamp': f"2025-05-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00",
+    }
+    if rng.random() < 0.6:
+        record[rng.choice(('original_price', 'listPrice', 'msrp'))] = _price(rng)
+    if rng.random() < 0.2:
+        record['discount_percentage'] = 10.0
+    if rng.random() < 0.9:
+        record[rng.choice(('in_stock', 'availability'))] = rng.choice((True, False, 'In Stock', 'yes', 'Out of stock'))
+    if rng.random() < 0.8:
+        rating = round(rng.uniform(1, 5), 1)
+        record[rng.choice(('rating', 'stars'))] = rng.choice((rating, f"{rating} out of 5 stars", 'unrated'))
+    if rng.random() < 0.8:
+        count = rng.randint(0, 50000)
+        record['review_count'] = rng.choice((count, f"{count:,} ratings", 'no reviews'))
+    if rng.random() < 0.2:
+        record['breadcrumbs'] = ['Home', rng.choice(('Electronics', 'Kitchen')), 'More']
+    if rng.random() < 0.05:
+        del record[rng.choice(('name', 'retailer', 'url'))]
+    return record
+
+
+@pytest.fixture
+def records():
+    rng = random.Random(20240501)
+    return [_record(rng, number) for number in range(2000)] + [{}, None]
+
+
+def _same(left, right):
+    if isinstance(left, float) and isinstance(right, float) and math.isnan(left) and math.isnan(right):
+        return True
+    return left == right and type(left) is type(right)
+
+
+def test_raw_batch_matches_per_record(records):
+    etl = ProductETL()
+    expected = [etl.transform_product_data(record) for record in records]
+    assert any(record is None for record in expected)
+
+    batch = etl.process_raw_batch(records, save_to_db=False)
+    assert len(batch) == len(expected)
+    for got, want in zip(batch, expected):
+        assert (got is None) == (want is None)
+        if want is not None:
+            assert got.keys() == want.keys()
+            assert all(_same(got[field], want[field]) for field in want)
+    assert etl.pending == []
+
+
+def test_raw_batch_buffers_kept_records(records):
+    etl = ProductETL(batch_size=len(records) + 1)
+    batch = etl.process_raw_batch(records)
+    assert [record for record, _ in etl.pending] == [record for record in batch if record]